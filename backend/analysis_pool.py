@@ -0,0 +1,223 @@
+"""
+后端常驻分析 worker 池
+
+Analyses used to run as one ``python main.py`` subprocess per request, paying
+interpreter start-up, the akshare/pandas/tiktoken imports, config parsing and
+MCP setup every time. The pool imports the analysis code once and runs a fixed
+number of asyncio worker tasks inside the server process; requests beyond
+that wait in a FIFO queue. Console output printed by an analysis (the rich
+visualizer and plain print calls) and the structured progress events from
+the agents are published on the event bus topic of the session that produced
+them, so concurrent analyses never see each other's output.
+"""
+
+import asyncio
+import io
+import os
+import re
+import sys
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Deque, Dict, Optional
+
+from src.events import EventType, bind_topic, current_topic, event_bus, reset_topic
+from src.logger import logger
+
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+_ANSI_ESCAPE = re.compile(r"\x1b\[[0-9;?]*[A-Za-z]")
+
+
+class SessionStdout(io.TextIOBase):
+    """sys.stdout replacement that publishes writes from an analysis to its topic.
+
+    Output is forwarded line by line, so a print call becomes one event
+    instead of one per written fragment.
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._partial: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def write(self, text: str) -> int:
+        topic = current_topic()
+        if topic is None:
+            return self._stream.write(text)
+        with self._lock:
+            buffered = self._partial.pop(topic, "") + text
+            lines, sep, rest = buffered.rpartition("\n")
+            if rest:
+                self._partial[topic] = rest
+        if sep:
+            self._publish(topic, lines + sep)
+        return len(text)
+
+    @staticmethod
+    def _publish(topic: str, text: str) -> None:
+        event_bus.publish(topic, EventType.OUTPUT, content=_ANSI_ESCAPE.sub("", text))
+
+    def flush_topic(self, topic: str) -> None:
+        """Publish any unterminated line left over when an analysis finishes."""
+        with self._lock:
+            rest = self._partial.pop(topic, "")
+        if rest:
+            self._publish(topic, rest)
+
+    def flush(self) -> None:
+        if current_topic() is None:
+            self._stream.flush()
+
+    def isatty(self) -> bool:
+        # Session output goes to a browser, not a terminal
+        return current_topic() is None and self._stream.isatty()
+
+    @property
+    def encoding(self) -> str:
+        return getattr(self._stream, "encoding", "utf-8")
+
+    def fileno(self) -> int:
+        return self._stream.fileno()
+
+
+class AnalysisWorkerPool:
+    """Fixed set of in-process workers consuming a FIFO queue of sessions."""
+
+    def __init__(self, workers: int = 2):
+        self.workers = max(1, workers)
+        self._queue: Optional[asyncio.Queue] = None
+        # Sessions waiting for a worker, in dispatch order (for queue positions)
+        self._waiting: Deque = deque()
+        self._tasks: list = []
+        self._running = 0
+
+    @property
+    def started(self) -> bool:
+        return bool(self._tasks)
+
+    @property
+    def pending(self) -> int:
+        return len(self._waiting)
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    async def start(self) -> None:
+        """Import the analysis code and start the workers; called at server startup."""
+        if self.started:
+            return
+
+        # main.py writes reports relative to the project root, as on the command line
+        os.chdir(PROJECT_ROOT)
+        if not isinstance(sys.stdout, SessionStdout):
+            sys.stdout = SessionStdout(sys.stdout)
+
+        # Warm the heavy imports once instead of on every request
+        import main  # noqa: F401
+
+        self._queue = asyncio.Queue()
+        self._tasks = [
+            asyncio.create_task(self._worker(i), name=f"analysis-worker-{i}")
+            for i in range(self.workers)
+        ]
+        logger.info(f"Analysis worker pool started with {self.workers} workers")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        while self._waiting:
+            self._waiting.popleft().emit(EventType.ERROR, message="分析服务已停止")
+
+    async def submit(self, session) -> int:
+        """Queue a session for analysis.
+
+        Returns its 1-based position in the wait queue, or 0 when a worker is
+        free to start it right away.
+        """
+        await self.start()
+        self._waiting.append(session)
+        self._queue.put_nowait(session)
+        position = len(self._waiting)
+        if self._running + position <= self.workers:
+            return 0
+        self._announce_position(session, position)
+        return position
+
+    def _announce_position(self, session, position: int) -> None:
+        session.emit(
+            EventType.QUEUED,
+            position=position,
+            queue_depth=len(self._waiting),
+            running=self._running,
+        )
+
+    def _announce_positions(self) -> None:
+        """Tell every waiting session its new position after the queue moved."""
+        for position, session in enumerate(self._waiting, start=1):
+            if self._running + position > self.workers:
+                self._announce_position(session, position)
+
+    async def _worker(self, worker_id: int) -> None:
+        while True:
+            session = await self._queue.get()
+            self._waiting.remove(session)
+            self._running += 1
+            self._announce_positions()
+            try:
+                await self._run(session)
+            except asyncio.CancelledError:
+                session.emit(EventType.ERROR, message="分析服务已停止")
+                raise
+            finally:
+                self._running -= 1
+                self._queue.task_done()
+
+    async def _run(self, session) -> None:
+        from main import (
+            EnhancedFinGeniusAnalyzer,
+            announce_result_with_tts,
+            display_results,
+        )
+
+        options = session.options
+        token = bind_topic(session.session_id)
+        session.mark_started()
+        try:
+            analyzer = EnhancedFinGeniusAnalyzer(interactive=False)
+            results = await analyzer.analyze_stock(
+                session.stock_code,
+                int(options.get("max_steps") or 3),
+                int(options.get("debate_rounds") or 2),
+            )
+            display_results(
+                results, options.get("format") or "text", options.get("output")
+            )
+            if options.get("tts"):
+                os.makedirs("results", exist_ok=True)
+                await announce_result_with_tts(results)
+            self._flush_output(session)
+
+            if "error" in results:
+                session.emit(EventType.ERROR, message=f"分析失败: {results['error']}")
+            else:
+                report = event_bus.last(session.session_id, EventType.REPORT_READY)
+                report_path = (
+                    report.data["report_path"] if report else session.find_report_file()
+                )
+                session.emit(EventType.COMPLETE, report_path=report_path)
+        except Exception as e:
+            self._flush_output(session)
+            logger.error(f"Analysis of {session.stock_code} failed: {str(e)}")
+            session.emit(EventType.ERROR, message=f"分析过程中发生错误: {str(e)}")
+        finally:
+            reset_topic(token)
+
+    @staticmethod
+    def _flush_output(session) -> None:
+        if isinstance(sys.stdout, SessionStdout):
+            sys.stdout.flush_topic(session.session_id)
@@ -1,10 +1,7 @@
-import asyncio
 import json
-import os
-import subprocess
-import sys
+import time
 import uuid
-from datetime import datetime
+from contextlib import asynccontextmanager
 from pathlib import Path
 from typing import Dict, Any
 
@@ -12,94 +9,80 @@ import uvicorn
 from starlette.applications import Starlette
 from starlette.middleware import Middleware
 from starlette.middleware.cors import CORSMiddleware
-from starlette.responses import JSONResponse, StreamingResponse, FileResponse, HTMLResponse
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.responses import JSONResponse, StreamingResponse, FileResponse, HTMLResponse, Response
 from starlette.routing import Route, Mount
 from starlette.staticfiles import StaticFiles
 from starlette.requests import Request
-import queue
-import threading
 
 # 导入聊天处理器
 from chat_handler import handle_single_chat, handle_group_chat, get_available_models
+from analysis_pool import AnalysisWorkerPool
+from session_manager import QueueFullError, SessionManager
+from src.config import config
+from src.events import EventType, TERMINAL_EVENTS, event_bus
+from src.utils.report_catalog import report_catalog
+from src.utils.report_storage import report_storage
 
-# 全局会话存储
-active_sessions: Dict[str, Dict[str, Any]] = {}
+# 全局会话管理器（常驻分析 worker 池 + 会话过期清理）
+session_manager = SessionManager(
+    AnalysisWorkerPool(workers=config.backend_config.analysis_workers),
+    max_queued=config.backend_config.max_queued,
+    session_ttl=config.backend_config.session_ttl,
+)
 
 class AnalysisSession:
     def __init__(self, session_id: str, stock_code: str, options: Dict[str, Any] = None):
         self.session_id = session_id
         self.stock_code = stock_code
         self.options = options or {}
-        self.process = None
-        self.output_queue = queue.Queue()
         self.is_complete = False
         self.error = None
         self.report_path = None
-        
-    async def start_analysis(self):
-        """启动股票分析进程"""
-        try:
-            # 构建命令，包含可选参数
-            cmd = [sys.executable, "main.py", self.stock_code]
-            
-            # 添加可选参数
-            if self.options.get('format'):
-                cmd.extend(['-f', self.options['format']])
-            if self.options.get('output'):
-                cmd.extend(['-o', self.options['output']])
-            if self.options.get('tts'):
-                cmd.append('--tts')
-            if self.options.get('max_steps'):
-                cmd.extend(['--max-steps', str(self.options['max_steps'])])
-            if self.options.get('debate_rounds'):
-                cmd.extend(['--debate-rounds', str(self.options['debate_rounds'])])
-            
-            # 启动进程
-            self.process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                bufsize=1,
-                universal_newlines=True,
-                encoding='utf-8',
-                errors='replace',
-                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-            )
-            
-            # 在后台线程中读取输出
-            def read_output():
-                try:
-                    for line in iter(self.process.stdout.readline, ''):
-                        if line:
-                            self.output_queue.put(('output', line))
-                    
-                    # 等待进程完成
-                    return_code = self.process.wait()
-                    
-                    if return_code == 0:
-                        # 查找生成的报告文件
-                        report_path = self.find_report_file()
-                        self.report_path = report_path
-                        self.output_queue.put(('complete', {'report_path': report_path}))
-                    else:
-                        self.output_queue.put(('error', {'message': f'分析进程异常退出，返回码: {return_code}'}))
-                    
-                    self.is_complete = True
-                    
-                except Exception as e:
-                    self.output_queue.put(('error', {'message': f'读取输出时发生错误: {str(e)}'}))
-                    self.is_complete = True
-            
-            # 启动输出读取线程
-            output_thread = threading.Thread(target=read_output)
-            output_thread.daemon = True
-            output_thread.start()
-            
-        except Exception as e:
-            self.error = str(e)
-            self.output_queue.put(('error', {'message': str(e)}))
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.on_finish = None
+
+    @property
+    def status(self) -> str:
+        if self.finished_at is not None:
+            return 'failed' if self.error else 'completed'
+        return 'running' if self.started_at is not None else 'queued'
+
+    @property
+    def wait_time(self):
+        """排队等待时长（秒）"""
+        if self.started_at is None:
+            return None
+        return self.started_at - self.created_at
+
+    @property
+    def run_time(self):
+        """分析运行时长（秒），运行中时为已运行时长"""
+        if self.started_at is None:
+            return None
+        return (self.finished_at or time.time()) - self.started_at
+
+    def mark_started(self):
+        """worker 开始执行时调用"""
+        self.started_at = time.time()
+        self.emit(EventType.STARTED, wait_time=round(self.wait_time, 1))
+
+    def emit(self, event_type: EventType, **data):
+        """发布会话事件，可在任意线程调用"""
+        if event_type == EventType.COMPLETE:
+            self.report_path = data.get('report_path')
+        elif event_type == EventType.ERROR:
+            self.error = data.get('message')
+        if event_type in TERMINAL_EVENTS and not self.is_complete:
             self.is_complete = True
+            self.finished_at = time.time()
+            if self.run_time is not None:
+                data.setdefault('run_time', round(self.run_time, 1))
+            if self.on_finish:
+                self.on_finish(self)
+        event_bus.publish(self.session_id, event_type, **data)
     
     def find_report_file(self):
         """查找生成的报告文件"""
@@ -117,29 +100,19 @@ class AnalysisSession:
             print(f"查找报告文件时出错: {e}")
             return None
     
-    def get_output_stream(self):
-        """获取输出流生成器"""
-        while not self.is_complete or not self.output_queue.empty():
-            try:
-                # 非阻塞获取队列中的数据
-                event_type, data = self.output_queue.get(timeout=1)
-                
-                if event_type == 'output':
-                    yield f"data: {json.dumps({'type': 'output', 'content': data})}\n\n"
-                elif event_type == 'complete':
-                    yield f"data: {json.dumps({'type': 'complete', **data})}\n\n"
-                    break
-                elif event_type == 'error':
-                    yield f"data: {json.dumps({'type': 'error', **data})}\n\n"
+    async def get_output_stream(self):
+        """订阅会话事件并生成SSE数据，多个客户端可同时订阅同一会话"""
+        with event_bus.subscribe(self.session_id) as subscription:
+            while True:
+                event = await subscription.get(timeout=1)
+                if event is None:
+                    # 发送心跳
+                    yield f"data: {json.dumps({'type': 'heartbeat'})}\n\n"
+                    continue
+
+                yield f"data: {json.dumps(event.to_dict(), default=str)}\n\n"
+                if event.is_terminal:
                     break
-                    
-            except queue.Empty:
-                # 发送心跳
-                yield f"data: {json.dumps({'type': 'heartbeat'})}\n\n"
-                continue
-            except Exception as e:
-                yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
-                break
 
 async def start_analysis(request: Request):
     """启动股票分析"""
@@ -154,15 +127,18 @@ async def start_analysis(request: Request):
         # 创建新的分析会话
         session_id = str(uuid.uuid4())
         session = AnalysisSession(session_id, stock_code, options)
-        active_sessions[session_id] = session
         
-        # 启动分析
-        await session.start_analysis()
+        # 提交到 worker 池，队列已满时拒绝
+        try:
+            position = await session_manager.submit(session)
+        except QueueFullError as e:
+            return JSONResponse({'success': False, 'error': str(e)}, status_code=429)
         
         return JSONResponse({
             'success': True,
             'session_id': session_id,
-            'message': f'开始分析股票 {stock_code}'
+            'queue_position': position,
+            'message': f'开始分析股票 {stock_code}' if not position else f'股票 {stock_code} 已加入分析队列，当前排第 {position} 位'
         })
         
     except Exception as e:
@@ -172,18 +148,15 @@ async def stream_output(request: Request):
     """流式输出分析结果"""
     session_id = request.path_params['session_id']
     
-    if session_id not in active_sessions:
+    session = session_manager.get(session_id)
+    if session is None:
         return JSONResponse({'error': '会话不存在'}, status_code=404)
     
-    session = active_sessions[session_id]
-    
     async def generate():
         yield "data: {\"type\": \"connected\"}\n\n"
         
-        # 使用异步生成器包装同步生成器
-        for chunk in session.get_output_stream():
+        async for chunk in session.get_output_stream():
             yield chunk
-            await asyncio.sleep(0.01)  # 小延迟避免过快输出
     
     return StreamingResponse(
         generate(),
@@ -195,6 +168,10 @@ async def stream_output(request: Request):
         }
     )
 
+async def get_session_metrics(request: Request):
+    """分析队列与会话指标"""
+    return JSONResponse(session_manager.metrics())
+
 async def get_report(request: Request):
     """获取报告内容"""
     report_path = request.path_params['report_path']
@@ -211,8 +188,7 @@ async def get_report(request: Request):
             return JSONResponse({'error': '报告文件不存在'}, status_code=404)
         
         # 读取文件内容
-        with open(full_path, 'r', encoding='utf-8') as f:
-            content = f.read()
+        content = report_storage.read_text(full_path)
         
         return JSONResponse({'content': content})
         
@@ -234,6 +210,14 @@ async def download_report(request: Request):
         if not full_path.exists():
             return JSONResponse({'error': '报告文件不存在'}, status_code=404)
         
+        if report_storage.read_manifest(full_path) is not None:
+            # 压缩存储的报告：还原为原始文件内容下载
+            return Response(
+                report_storage.read_bytes(full_path),
+                media_type='application/octet-stream',
+                headers={'Content-Disposition': f'attachment; filename="{full_path.name}"'}
+            )
+        
         return FileResponse(
             full_path,
             filename=full_path.name,
@@ -259,13 +243,12 @@ async def view_report(request: Request):
             return HTMLResponse('<h1>报告文件不存在</h1>', status_code=404)
         
         # 读取HTML文件
-        with open(full_path, 'r', encoding='utf-8') as f:
-            html_content = f.read()
+        html_content = report_storage.read_text(full_path)
         
         # 检查是否为外部化数据的HTML模板
         if "loadExternalData" in html_content:
-            # 这是外部化数据的HTML模板，直接返回
-            return HTMLResponse(html_content)
+            # 这是外部化数据的HTML模板，直接返回（已压缩存储的直接返回压缩内容）
+            return stored_file_response(full_path, request, html_content)
         
         # 兼容旧版本的内嵌数据HTML文件
         # 尝试从文件名提取股票代码和时间戳
@@ -545,10 +528,9 @@ def load_report_data(stock_code: str, timestamp: str) -> Dict[str, Any]:
         
         if data_path.exists():
             print(f"找到外部化数据文件: {data_path}")
-            with open(data_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                print(f"成功加载外部化数据，包含键: {list(data.keys())}")
-                return data
+            data = report_storage.read_json(data_path)
+            print(f"成功加载外部化数据，包含键: {list(data.keys())}")
+            return data
         
         # 如果外部化数据文件不存在，回退到原有的加载方式
         print(f"外部化数据文件不存在，使用传统方式加载")
@@ -573,9 +555,8 @@ def load_report_data(stock_code: str, timestamp: str) -> Dict[str, Any]:
                 # 选择最新的文件
                 latest_debate = max(debate_files, key=lambda f: f.stat().st_mtime)
                 print(f"加载debate文件: {latest_debate}")
-                with open(latest_debate, 'r', encoding='utf-8') as f:
-                    debate_data = json.load(f)
-                    report_data["battle_results"] = debate_data
+                debate_data = report_storage.read_json(latest_debate)
+                report_data["battle_results"] = debate_data
         
         # 查找对应的vote文件 - 同样使用灵活匹配
         vote_dir = Path("report/vote")
@@ -589,12 +570,11 @@ def load_report_data(stock_code: str, timestamp: str) -> Dict[str, Any]:
             if vote_files:
                 latest_vote = max(vote_files, key=lambda f: f.stat().st_mtime)
                 print(f"加载vote文件: {latest_vote}")
-                with open(latest_vote, 'r', encoding='utf-8') as f:
-                    vote_data = json.load(f)
-                    # 合并vote数据到battle_results
-                    if "battle_results" not in report_data:
-                        report_data["battle_results"] = {}
-                    report_data["battle_results"].update(vote_data)
+                vote_data = report_storage.read_json(latest_vote)
+                # 合并vote数据到battle_results
+                if "battle_results" not in report_data:
+                    report_data["battle_results"] = {}
+                report_data["battle_results"].update(vote_data)
         
         # 从debate数据中提取research_results（如果有的话）
         if "battle_results" in report_data and "research_results" in report_data["battle_results"]:
@@ -608,99 +588,53 @@ def load_report_data(stock_code: str, timestamp: str) -> Dict[str, Any]:
         return {}
 
 async def get_reports_list(request: Request):
-    """获取历史报告列表"""
+    """获取历史报告列表（读取报告目录索引，支持分页和筛选）
+
+    查询参数: page, page_size, stock_code, decision (bullish/bearish),
+    start_date / end_date (YYYYMMDD)；未传 page 时返回全部匹配的报告
+    """
     try:
-        reports = []
+        params = request.query_params
+        if 'page' in params:
+            page = max(1, int(params['page']))
+            page_size = min(max(1, int(params.get('page_size', 50))), 200)
+        else:
+            page, page_size = 1, None
+        
+        rows, total = report_catalog.query(
+            report_type='html',
+            stock_code=params.get('stock_code') or None,
+            final_decision=params.get('decision') or None,
+            start_date=params.get('start_date') or None,
+            end_date=params.get('end_date') or None,
+            page=page,
+            page_size=page_size,
+        )
         
-        # 使用绝对路径确保正确找到文件
         project_root = Path(__file__).parent.parent
-        report_dir = project_root / "report"
+        reports = [
+            {
+                'stockCode': row['stock_code'],
+                'date': report_catalog.format_date(row),
+                'path': str(project_root / row['path']),
+                'summary': row['summary'],
+                'recommendation': row['recommendation'],
+                'filename': Path(row['path']).name,
+                'timestamp': row['timestamp'],
+            }
+            for row in rows
+        ]
         
-        print(f"查找报告目录: {report_dir}")
-        print(f"报告目录是否存在: {report_dir.exists()}")
-        
-        if report_dir.exists():
-            # 获取所有HTML文件，特别是report/html目录下的文件
-            html_dir = report_dir / "html"
-            print(f"HTML目录: {html_dir}")
-            print(f"HTML目录是否存在: {html_dir.exists()}")
-            
-            if html_dir.exists():
-                html_files = list(html_dir.glob("*.html"))
-                print(f"在 {html_dir} 中找到 {len(html_files)} 个HTML文件")
-                for f in html_files:
-                    print(f"  - {f.name}")
-            else:
-                html_files = list(report_dir.glob("**/*.html"))
-                print(f"在整个report目录中找到 {len(html_files)} 个HTML文件")
-            
-            for file_path in html_files:
-                try:
-                    # 从文件名提取股票代码和时间戳
-                    filename = file_path.name
-                    stock_code = "未知"
-                    timestamp = ""
-                    
-                    # 尝试从文件名中提取股票代码和时间戳
-                    # 文件名格式: html_603887_20250808_165058.html
-                    if "_" in filename:
-                        parts = filename.replace(".html", "").split("_")
-                        if len(parts) >= 4:  # html_603887_20250808_165058
-                            # 提取股票代码 (第二部分)
-                            if parts[1].isdigit() and len(parts[1]) == 6:
-                                stock_code = parts[1]
-                            # 提取时间戳 (第三和第四部分组合)
-                            if len(parts) >= 4 and parts[2].isdigit() and parts[3].isdigit():
-                                timestamp = f"{parts[2]}_{parts[3]}"
-                    
-                    # 获取文件修改时间
-                    mtime = file_path.stat().st_mtime
-                    date = datetime.fromtimestamp(mtime).strftime('%Y-%m-%d %H:%M:%S')
-                    
-                    # 加载相关数据获取更准确的信息
-                    report_data = load_report_data(stock_code, timestamp)
-                    
-                    # 从数据中提取摘要和建议
-                    summary = "股票分析报告"
-                    recommendation = "分析中"
-                    
-                    if report_data and "battle_results" in report_data:
-                        battle_results = report_data["battle_results"]
-                        final_decision = battle_results.get("final_decision", "")
-                        vote_count = battle_results.get("vote_count", {})
-                        
-                        if final_decision == "bullish":
-                            recommendation = "看涨"
-                        elif final_decision == "bearish":
-                            recommendation = "看跌"
-                        
-                        # 生成摘要
-                        bullish_count = vote_count.get("bullish", 0)
-                        bearish_count = vote_count.get("bearish", 0)
-                        total_votes = bullish_count + bearish_count
-                        
-                        if total_votes > 0:
-                            summary = f"专家投票: {bullish_count}票看涨, {bearish_count}票看跌"
-                    
-                    reports.append({
-                        'stockCode': stock_code,
-                        'date': date,
-                        'path': str(file_path),
-                        'summary': summary,
-                        'recommendation': recommendation,
-                        'filename': filename,
-                        'timestamp': timestamp
-                    })
-                    
-                except Exception as e:
-                    print(f"处理文件 {file_path} 时出错: {e}")
-                    continue
-            
-            # 按修改时间排序，最新的在前面
-            reports.sort(key=lambda x: x['date'], reverse=True)
-        
-        return JSONResponse({'reports': reports})
+        return JSONResponse({
+            'success': True,
+            'reports': reports,
+            'total': total,
+            'page': page,
+            'page_size': page_size,
+        })
         
+    except ValueError as e:
+        return JSONResponse({'success': False, 'error': f'无效的分页参数: {e}'}, status_code=400)
     except Exception as e:
         return JSONResponse({'error': str(e)}, status_code=500)
 
@@ -742,6 +676,7 @@ async def delete_report(request: Request):
         if full_path.exists():
             full_path.unlink()
             deleted_files.append(str(full_path))
+        report_catalog.remove(full_path)
         
         # 删除对应的meta文件
         meta_path = full_path.with_suffix('.meta.json')
@@ -755,6 +690,7 @@ async def delete_report(request: Request):
             debate_files = list(debate_dir.glob(f"debate_{stock_code}_{timestamp}.*"))
             for debate_file in debate_files:
                 debate_file.unlink()
+                report_catalog.remove(debate_file)
                 deleted_files.append(str(debate_file))
         
         # 删除相关的vote文件
@@ -763,6 +699,7 @@ async def delete_report(request: Request):
             vote_files = list(vote_dir.glob(f"vote_{stock_code}_{timestamp}.*"))
             for vote_file in vote_files:
                 vote_file.unlink()
+                report_catalog.remove(vote_file)
                 deleted_files.append(str(vote_file))
         
         return JSONResponse({
@@ -863,8 +800,7 @@ async def get_debate_data(request: Request):
         
         # 读取辩论数据
         try:
-            with open(latest_file['path'], 'r', encoding='utf-8') as f:
-                debate_data = json.load(f)
+            debate_data = report_storage.read_json(latest_file['path'])
             print(f"成功读取辩论数据，数据键: {list(debate_data.keys())}")
         except Exception as read_error:
             print(f"读取文件失败: {read_error}")
@@ -936,8 +872,7 @@ async def get_report_data(request: Request):
             return JSONResponse({'error': f'数据文件不存在: {data_filename}'}, status_code=404)
         
         # 读取JSON数据文件
-        with open(full_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = report_storage.read_json(full_path)
         
         print(f"成功加载数据文件，数据大小: {len(str(data))} 字符")
         return JSONResponse(data)
@@ -949,6 +884,43 @@ async def get_report_data(request: Request):
         print(f"获取报告数据失败: {e}")
         return JSONResponse({'error': str(e)}, status_code=500)
 
+def accepts_gzip(headers) -> bool:
+    return "gzip" in headers.get("accept-encoding", "").lower()
+
+def stored_file_response(full_path, request: Request, html_content: str | None = None):
+    """返回报告文件；压缩存储的HTML在客户端支持gzip时直接返回压缩数据块"""
+    if accepts_gzip(request.headers):
+        compressed = report_storage.compressed_blob(full_path)
+        if compressed is not None:
+            return Response(
+                compressed,
+                media_type="text/html",
+                headers={"Content-Encoding": "gzip", "Vary": "Accept-Encoding"},
+            )
+    if html_content is None:
+        html_content = report_storage.read_text(full_path)
+    return HTMLResponse(html_content)
+
+# 报告静态文件：压缩存储的报告还原后返回（或直接返回gzip数据）
+class ReportStaticFiles(StaticFiles):
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        manifest = report_storage.read_manifest(full_path)
+        if manifest is None:
+            return super().file_response(full_path, stat_result, scope, status_code)
+        headers = {"Vary": "Accept-Encoding"}
+        media_type = manifest.get("media_type", "application/octet-stream")
+        if accepts_gzip(Request(scope).headers):
+            compressed = report_storage.compressed_blob(full_path)
+            if compressed is not None:
+                headers["Content-Encoding"] = "gzip"
+                return Response(compressed, status_code=status_code, media_type=media_type, headers=headers)
+        return Response(
+            report_storage.read_bytes(full_path),
+            status_code=status_code,
+            media_type=media_type,
+            headers=headers,
+        )
+
 # 自定义静态文件类，为JavaScript文件添加缓存控制
 class NoCacheStaticFiles(StaticFiles):
     def file_response(self, full_path, stat_result, scope, status_code=200):
@@ -963,6 +935,7 @@ class NoCacheStaticFiles(StaticFiles):
 routes = [
     Route('/api/analyze', start_analysis, methods=['POST']),
     Route('/api/stream/{session_id}', stream_output, methods=['GET']),
+    Route('/api/sessions/metrics', get_session_metrics, methods=['GET']),
     Route('/api/report/{report_path:path}', get_report, methods=['GET']),
     Route('/api/download/{report_path:path}', download_report, methods=['GET']),
     Route('/api/view/{report_path:path}', view_report, methods=['GET']),
@@ -976,7 +949,7 @@ routes = [
     Route('/api/chat/group', handle_group_chat, methods=['POST']),
     Route('/api/chat/models', get_available_models, methods=['GET']),
     # 静态文件路由 - 报告文件
-    Mount('/report', StaticFiles(directory=Path(__file__).parent.parent / 'report'), name='reports'),
+    Mount('/report', ReportStaticFiles(directory=Path(__file__).parent.parent / 'report'), name='reports'),
     # 静态文件路由 - 前端文件（使用无缓存版本）
     Mount('/', NoCacheStaticFiles(directory=Path(__file__).parent.parent / 'frontend', html=True), name='static'),
 ]
@@ -989,11 +962,22 @@ middleware = [
         allow_credentials=True,
         allow_methods=['*'],
         allow_headers=['*'],
-    )
+    ),
+    # 压缩JSON等响应；已压缩的报告（带Content-Encoding）和SSE流不会被重复压缩
+    Middleware(GZipMiddleware, minimum_size=1000),
 ]
 
+@asynccontextmanager
+async def lifespan(app):
+    """启动时预热分析 worker 池，关闭时停止"""
+    await session_manager.start()
+    try:
+        yield
+    finally:
+        await session_manager.stop()
+
 # 创建应用
-app = Starlette(debug=True, routes=routes, middleware=middleware)
+app = Starlette(debug=True, routes=routes, middleware=middleware, lifespan=lifespan)
 
 if __name__ == '__main__':
     print("🚀 启动 FinGenius Web 服务器...")
@@ -0,0 +1,139 @@
+"""
+后端分析会话管理
+
+Keeps the analysis sessions of the web backend: admission control in front of
+the worker pool (a burst beyond the wait-queue cap is rejected instead of
+piling up), TTL eviction of finished sessions together with their event
+history, and wait/run time metrics.
+"""
+
+import asyncio
+import statistics
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from src.events import event_bus
+from src.logger import logger
+
+
+class QueueFullError(RuntimeError):
+    """Raised when the wait queue is at its cap."""
+
+
+class SessionManager:
+    """Registry of analysis sessions in front of an AnalysisWorkerPool."""
+
+    def __init__(
+        self,
+        pool,
+        max_queued: int = 20,
+        session_ttl: float = 1800,
+        sweep_interval: float = 60,
+    ):
+        self.pool = pool
+        self.max_queued = max(0, max_queued)
+        self.session_ttl = session_ttl
+        self.sweep_interval = sweep_interval
+        self.sessions: Dict[str, Any] = {}
+        self._sweeper: Optional[asyncio.Task] = None
+
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.evicted = 0
+        # Recent wait and run times, for the metrics endpoint
+        self._wait_times: Deque[float] = deque(maxlen=200)
+        self._run_times: Deque[float] = deque(maxlen=200)
+
+    def get(self, session_id: str):
+        return self.sessions.get(session_id)
+
+    async def submit(self, session) -> int:
+        """Register a session and queue it; returns its queue position (0 = starting).
+
+        Raises:
+            QueueFullError: when max_queued sessions are already waiting.
+        """
+        self.evict_expired()
+        if (
+            self.pool.running >= self.pool.workers
+            and self.pool.pending >= self.max_queued
+        ):
+            self.rejected += 1
+            raise QueueFullError(f"分析队列已满（{self.pool.pending} 个任务排队中），请稍后再试")
+
+        self.sessions[session.session_id] = session
+        session.on_finish = self._record_finish
+        return await self.pool.submit(session)
+
+    def _record_finish(self, session) -> None:
+        if session.error:
+            self.failed += 1
+        else:
+            self.completed += 1
+        if session.wait_time is not None:
+            self._wait_times.append(session.wait_time)
+        if session.run_time is not None:
+            self._run_times.append(session.run_time)
+
+    def evict_expired(self) -> int:
+        """Drop finished sessions older than the TTL, with their event history."""
+        cutoff = time.time() - self.session_ttl
+        expired = [
+            session_id
+            for session_id, session in self.sessions.items()
+            if session.finished_at is not None and session.finished_at < cutoff
+        ]
+        for session_id in expired:
+            del self.sessions[session_id]
+            event_bus.close(session_id)
+        if expired:
+            self.evicted += len(expired)
+            logger.info(f"Evicted {len(expired)} expired analysis sessions")
+        return len(expired)
+
+    async def _sweep(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            self.evict_expired()
+
+    async def start(self) -> None:
+        await self.pool.start()
+        if self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep(), name="session-sweeper")
+
+    async def stop(self) -> None:
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+        await self.pool.stop()
+
+    @staticmethod
+    def _summary(samples: Deque[float]) -> Dict[str, Optional[float]]:
+        if not samples:
+            return {"avg": None, "p50": None, "max": None}
+        return {
+            "avg": round(statistics.fmean(samples), 1),
+            "p50": round(statistics.median(samples), 1),
+            "max": round(max(samples), 1),
+        }
+
+    def metrics(self) -> Dict[str, Any]:
+        statuses: Dict[str, int] = {}
+        for session in self.sessions.values():
+            statuses[session.status] = statuses.get(session.status, 0) + 1
+        return {
+            "workers": self.pool.workers,
+            "running": self.pool.running,
+            "queue_depth": self.pool.pending,
+            "max_queued": self.max_queued,
+            "sessions": len(self.sessions),
+            "sessions_by_status": statuses,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "evicted": self.evicted,
+            "wait_time": self._summary(self._wait_times),
+            "run_time": self._summary(self._run_times),
+        }
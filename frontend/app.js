@@ -94,7 +94,9 @@ createApp({
                 }
             } catch (error) {
                 console.error('分析启动失败:', error);
-                this.output += `错误: ${error.message}\n`;
+                // 队列已满时服务端返回 429 及错误说明
+                const message = (error.response && error.response.data && error.response.data.error) || error.message;
+                this.output += `错误: ${message}\n`;
                 this.isAnalyzing = false;
                 historyItem.status = 'failed';
             }
@@ -110,6 +112,12 @@ createApp({
                 if (data.type === 'output') {
                     this.output += data.content;
                     this.scrollToBottom();
+                } else if (data.type === 'queued') {
+                    this.output += `分析任务排队中，当前第 ${data.position} 位（运行中 ${data.running} 个）...\n`;
+                    this.scrollToBottom();
+                } else if (data.type === 'started' && data.wait_time >= 1) {
+                    this.output += `排队 ${data.wait_time} 秒后开始分析\n`;
+                    this.scrollToBottom();
                 } else if (data.type === 'complete') {
                     this.isAnalyzing = false;
                     this.reportPath = data.report_path;
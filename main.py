@@ -9,8 +9,14 @@ from typing import Any, Dict, List, Optional
 
 from src.environment.battle import BattleEnvironment
 from src.environment.research import ResearchEnvironment
+from src.events import EventType, emit
+from src.llm import reset_token_scope, start_token_scope
 from src.logger import logger
-from src.schema import AgentState
+from src.tool.market_data import (
+    prefetch_market_wide,
+    reset_market_snapshot,
+    set_market_snapshot,
+)
 from src.tool.tts_tool import TTSTool
 from src.agent.report import ReportAgent
 from src.utils.report_manager import report_manager
@@ -23,17 +29,22 @@ console = Console()
 class EnhancedFinGeniusAnalyzer:
     """Enhanced FinGenius analyzer with beautiful visualization"""
     
-    def __init__(self):
+    def __init__(self, interactive: bool = True):
+        # interactive=False: batch mode, no screen clearing or per-stock banners
+        self.interactive = interactive
         self.start_time = time.time()
         self.total_tool_calls = 0
         self.total_llm_calls = 0
+        # 研究阶段的环境（及其专家）保留到辩论阶段复用
+        self.research_env: Optional[ResearchEnvironment] = None
 
-    async def analyze_stock(self, stock_code: str, max_steps: int = 3, debate_rounds: int = 2) -> Dict[str, Any]:
+    async def analyze_stock(self, stock_code: str, max_steps: int = 3, debate_rounds: int = 2, debate_mode: Optional[str] = None) -> Dict[str, Any]:
         """Run complete stock analysis with enhanced visualization"""
         try:
             # Clear screen and show logo
-            clear_screen()
-            visualizer.show_logo()
+            if self.interactive:
+                clear_screen()
+                visualizer.show_logo()
             
             # Show analysis start
             visualizer.show_section_header("开始股票分析", "[START]")
@@ -52,7 +63,7 @@ class EnhancedFinGeniusAnalyzer:
             
             # Battle phase
             visualizer.show_section_header("专家辩论阶段", "[BATTLE]")
-            battle_results = await self._run_battle_phase(research_results, max_steps, debate_rounds)
+            battle_results = await self._run_battle_phase(research_results, max_steps, debate_rounds, debate_mode)
             
             if battle_results:
                 visualizer.show_debate_summary(battle_results)
@@ -65,7 +76,8 @@ class EnhancedFinGeniusAnalyzer:
             
             # Show completion
             total_time = time.time() - self.start_time
-            visualizer.show_completion(total_time)
+            if self.interactive:
+                visualizer.show_completion(total_time)
             
             return final_results
             
@@ -73,6 +85,14 @@ class EnhancedFinGeniusAnalyzer:
             visualizer.show_error(str(e), "股票分析过程中出现错误")
             logger.error(f"Analysis failed: {str(e)}")
             return {"error": str(e), "stock_code": stock_code}
+        finally:
+            await self._cleanup_research_env()
+
+    async def _cleanup_research_env(self) -> None:
+        """Close the research agents' MCP connections once both phases are done"""
+        if self.research_env is not None:
+            research_env, self.research_env = self.research_env, None
+            await research_env.cleanup()
 
     async def _run_research_phase(self, stock_code: str, max_steps: int) -> Dict[str, Any]:
         """Run research phase with enhanced visualization"""
@@ -97,7 +117,8 @@ class EnhancedFinGeniusAnalyzer:
                     visualizer.show_progress_update(f"注册研究员", f"专家: {agent.name}")
             
             # Run research with tool call visualization
-            visualizer.show_progress_update("开始深度研究", "多专家顺序分析中（每3秒一个）...")
+            mode_desc = "多专家并发分析中..." if research_env.concurrent else "多专家顺序分析中（每3秒一个）..."
+            visualizer.show_progress_update("开始深度研究", mode_desc)
             
             # Enhance agents with visualization
             self._enhance_agents_with_visualization(research_env)
@@ -110,22 +131,28 @@ class EnhancedFinGeniusAnalyzer:
             if hasattr(research_env, 'llm_calls'):
                 self.total_llm_calls += research_env.llm_calls
             
-            await research_env.cleanup()
+            # Keep the initialized agents for the battle phase
+            self.research_env = research_env
             return results
             
         except Exception as e:
             visualizer.show_error(f"研究阶段错误: {str(e)}")
             return {}
 
-    async def _run_battle_phase(self, research_results: Dict[str, Any], max_steps: int, debate_rounds: int) -> Dict[str, Any]:
+    async def _run_battle_phase(self, research_results: Dict[str, Any], max_steps: int, debate_rounds: int, debate_mode: Optional[str] = None) -> Dict[str, Any]:
         """Run battle phase with enhanced visualization"""
         try:
             # Create battle environment
             visualizer.show_progress_update("创建辩论环境")
-            battle_env = await BattleEnvironment.create(max_steps=max_steps, debate_rounds=debate_rounds)
-            
-            # Register agents for battle
-            research_env = await ResearchEnvironment.create(max_steps=max_steps)
+            battle_kwargs = {"max_steps": max_steps, "debate_rounds": debate_rounds}
+            if debate_mode:
+                battle_kwargs["debate_mode"] = debate_mode
+            battle_env = await BattleEnvironment.create(**battle_kwargs)
+            
+            # Register the research agents for battle (reused, not re-created)
+            research_env = self.research_env
+            if research_env is None:
+                research_env = self.research_env = await ResearchEnvironment.create(max_steps=max_steps)
             agent_names = [
                 "sentiment_agent",
                 "risk_control_agent",
@@ -138,9 +165,7 @@ class EnhancedFinGeniusAnalyzer:
             for name in agent_names:
                 agent = research_env.get_agent(name)
                 if agent:
-                    agent.current_step = 0
-                    agent.state = AgentState.IDLE
-                    battle_env.register_agent(agent)
+                    battle_env.adopt_agent(agent)
                     visualizer.show_progress_update(f"注册辩论专家", f"专家: {agent.name}")
             
             # Enhance agents with visualization for battle
@@ -156,7 +181,7 @@ class EnhancedFinGeniusAnalyzer:
             if hasattr(battle_env, 'llm_calls'):
                 self.total_llm_calls += battle_env.llm_calls
             
-            await research_env.cleanup()
+            await self._cleanup_research_env()
             await battle_env.cleanup()
             return results
             
@@ -193,6 +218,7 @@ class EnhancedFinGeniusAnalyzer:
         """Generate reports with progress visualization and HTML completion validation"""
         try:
             visualizer.show_progress_update("生成分析报告", "创建HTML报告和JSON数据...")
+            emit(EventType.PHASE, phase="report", stock_code=stock_code)
             
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             
@@ -311,6 +337,14 @@ class EnhancedFinGeniusAnalyzer:
                             visualizer.show_progress_update("HTML验证通过", "报告文件完整且包含所有数据")
                         else:
                             visualizer.show_progress_update("HTML验证警告", "报告文件可能不完整，但已生成")
+
+                        emit(
+                            EventType.REPORT_READY,
+                            stock_code=stock_code,
+                            report_path=str(html_path),
+                            data_path=str(data_path),
+                            validated=html_validation_passed,
+                        )
                     else:
                         error_msg = html_result.error if html_result else "未知错误"
                         logger.error(f"HTML生成失败: {error_msg}")
@@ -506,20 +540,131 @@ def display_results(results: Dict[str, Any], output_format: str = "text", output
     logger.info(f"Results saved to {output_file}")
 
 
+def load_stock_codes(stock_codes: List[str], watchlist: Optional[str] = None) -> List[str]:
+    """Merge command-line codes with a watchlist file, keeping order and dropping duplicates.
+
+    The watchlist holds codes separated by newlines, commas or spaces; text
+    after '#' is ignored.
+    """
+    codes = list(stock_codes)
+    if watchlist:
+        with open(watchlist, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.split("#", 1)[0]
+                codes.extend(line.replace(",", " ").split())
+    return list(dict.fromkeys(code.strip() for code in codes if code.strip()))
+
+
+async def run_batch(
+    stock_codes: List[str],
+    max_steps: int,
+    debate_rounds: int,
+    debate_mode: Optional[str] = None,
+    concurrency: int = 4,
+    output_file: Optional[str] = None,
+) -> int:
+    """Analyze many stocks concurrently in one process.
+
+    Market-wide datasets are fetched once for the whole batch, while the LLM
+    rate controllers, HTTP pool and data cache are shared by every analysis.
+    Each stock's result is appended to a JSONL file as soon as it completes.
+    Returns 1 if any stock failed, so a partial failure is visible to scripts.
+    """
+    import os
+
+    if not output_file:
+        os.makedirs("results", exist_ok=True)
+        output_file = os.path.join(
+            "results", f"batch_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl"
+        )
+
+    visualizer.show_section_header(f"批量分析 {len(stock_codes)} 只股票", "[BATCH]")
+    visualizer.show_progress_update("预取全市场数据", "板块、指数资金流、大单、实时行情...")
+    market_snapshot = await prefetch_market_wide()
+    snapshot_token = set_market_snapshot(market_snapshot)
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def analyze_one(stock_code: str):
+        async with semaphore:
+            started = time.time()
+            # max_input_tokens applies to each stock, not the whole batch
+            token_scope = start_token_scope()
+            try:
+                analyzer = EnhancedFinGeniusAnalyzer(interactive=False)
+                result = await analyzer.analyze_stock(stock_code, max_steps, debate_rounds, debate_mode)
+            except Exception as e:
+                logger.error(f"Batch analysis of {stock_code} failed: {str(e)}")
+                result = {"error": str(e), "stock_code": stock_code}
+            finally:
+                reset_token_scope(token_scope)
+            return stock_code, result, time.time() - started
+
+    failures = 0
+    try:
+        # Tasks inherit the market-wide snapshot from this context
+        tasks = [asyncio.create_task(analyze_one(code)) for code in stock_codes]
+        with open(output_file, "w", encoding="utf-8") as f:
+            for done, next_result in enumerate(asyncio.as_completed(tasks), start=1):
+                stock_code, result, elapsed = await next_result
+                battle_result = result.get("battle_result", {})
+                record = {
+                    "stock_code": stock_code,
+                    "success": "error" not in result,
+                    "final_decision": battle_result.get("final_decision"),
+                    "vote_count": battle_result.get("vote_count"),
+                    "expert_consensus": result.get("expert_consensus"),
+                    "elapsed": round(elapsed, 1),
+                    "result": result,
+                }
+                if not record["success"]:
+                    failures += 1
+                f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+                f.flush()
+                visualizer.show_progress_update(
+                    f"完成 [{done}/{len(stock_codes)}] {stock_code}",
+                    result.get("error") or f"{record['final_decision']} ({elapsed:.0f}s)",
+                )
+    finally:
+        reset_market_snapshot(snapshot_token)
+
+    logger.info(f"Batch results saved to {output_file}")
+    visualizer.show_progress_update("批量分析完成", f"成功 {len(stock_codes) - failures}/{len(stock_codes)}，结果: {output_file}")
+    return 1 if failures else 0
+
+
 async def main():
     """Main entry point for the application."""
     parser = argparse.ArgumentParser(description="FinGenius Stock Research")
-    parser.add_argument("stock_code", help="Stock code to research (e.g., AAPL, MSFT)")
+    parser.add_argument(
+        "stock_codes",
+        nargs="*",
+        metavar="stock_code",
+        help="Stock code(s) to research (e.g., 000001); several codes run as a batch",
+    )
+    parser.add_argument(
+        "--watchlist",
+        help="File with stock codes to analyze as a batch (one per line); "
+        "a batch exits non-zero if any stock fails",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="Number of stocks analyzed at the same time in batch mode (default: 4)",
+    )
     parser.add_argument(
         "-f",
         "--format",
         choices=["text", "json"],
-        default="text",
-        help="Output format (default: text)",
+        default=None,
+        help="Output format (default: text; single stock only)",
     )
-    parser.add_argument("-o", "--output", help="Save results to file")
+    parser.add_argument("-o", "--output", help="Save results to file (JSONL file in batch mode)")
     parser.add_argument(
-        "--tts", action="store_true", help="Enable text-to-speech for the final result"
+        "--tts",
+        action="store_true",
+        help="Enable text-to-speech for the final result (single stock only)",
     )
     parser.add_argument(
         "--max-steps", 
@@ -533,19 +678,44 @@ async def main():
         default=2, 
         help="Number of debate rounds in battle (default: 2)"
     )
+    parser.add_argument(
+        "--debate-mode",
+        choices=["sequential", "simultaneous"],
+        default=None,
+        help="Speak one after another or all at once each round (default: [battle] debate_mode)"
+    )
 
     args = parser.parse_args()
     analyzer = None
 
+    stock_codes = load_stock_codes(args.stock_codes, args.watchlist)
+    if not stock_codes:
+        parser.error("at least one stock code or --watchlist is required")
+
+    if len(stock_codes) > 1 or args.watchlist:
+        if args.tts or args.format:
+            parser.error(
+                "--tts and -f/--format apply to a single stock; "
+                "a batch writes JSONL results (see -o/--output)"
+            )
+        return await run_batch(
+            stock_codes,
+            args.max_steps,
+            args.debate_rounds,
+            args.debate_mode,
+            args.concurrency,
+            args.output,
+        )
+
     try:
         # Create enhanced analyzer
         analyzer = EnhancedFinGeniusAnalyzer()
         
         # Run analysis with beautiful visualization
-        results = await analyzer.analyze_stock(args.stock_code, args.max_steps, args.debate_rounds)
+        results = await analyzer.analyze_stock(stock_codes[0], args.max_steps, args.debate_rounds, args.debate_mode)
         
         # Display results
-        display_results(results, args.format, args.output)
+        display_results(results, args.format or "text", args.output)
 
         # TTS announcement if requested
         if args.tts:
@@ -1,10 +1,13 @@
 import asyncio
 import json
+import time
 from typing import Any, List, Optional, Union
 
 from pydantic import Field
 
 from src.agent.react import ReActAgent
+from src.config import config
+from src.events import EventType, emit
 from src.exceptions import TokenLimitExceeded
 from src.llm import LLM
 from src.logger import logger
@@ -48,16 +51,37 @@ class ToolCallAgent(ReActAgent):
 
     max_observe: Optional[Union[int, bool]] = None
 
+    # 对话记忆的 token 预算，超出时压缩较早的对话（None 表示不压缩，辩论阶段才启用）
+    memory_token_budget: Optional[int] = None
+
+    def compact_memory(self) -> None:
+        """Compact older turns so the prompt stays within memory_token_budget."""
+        if not self.memory_token_budget:
+            return
+        settings = config.memory_config
+        result = self.memory.compact(
+            self.memory_token_budget,
+            summary_max_tokens=settings.summary_max_tokens,
+            excerpt_chars=settings.excerpt_chars,
+        )
+        if result:
+            logger.info(
+                f"🗜️ {self.name} memory compacted: {result['before']} -> {result['after']} tokens "
+                f"({result['elided_turns']} turns summarized)"
+            )
+
     async def think(self) -> bool:
         """Process current state and decide next actions using tools"""
         if self.next_step_prompt:
             user_msg = Message.user_message(self.next_step_prompt)
             self.messages += [user_msg]
 
+        self.compact_memory()
+
         try:
             # Get response with tool options
             response = await self.llm.ask_tool(
-                messages=self.messages,
+                messages=self.memory.prompt_messages(),
                 system_msgs=(
                     [Message.system_message(self.system_prompt)]
                     if self.system_prompt
@@ -65,6 +89,7 @@ class ToolCallAgent(ReActAgent):
                 ),
                 tools=self.available_tools.to_params(),
                 tool_choice=self.tool_choices,
+                tools_tokens=self.available_tools.count_tokens(self.llm.token_counter),
             )
         except ValueError:
             raise
@@ -195,7 +220,16 @@ class ToolCallAgent(ReActAgent):
 
             # Execute the tool
             logger.info(f"🔧 Activating tool: '{name}'...")
+            started = time.monotonic()
             result = await self.available_tools.execute(name=name, tool_input=args)
+            emit(
+                EventType.TOOL_CALL,
+                agent=self.name,
+                tool=name,
+                arguments=args,
+                success=not getattr(result, "error", None),
+                elapsed=round(time.monotonic() - started, 3),
+            )
 
             # Handle special tools
             await self._handle_special_tool(name=name, result=result)
@@ -230,6 +264,7 @@ class ToolCallAgent(ReActAgent):
         except Exception as e:
             error_msg = f"⚠️ Tool '{name}' encountered a problem: {str(e)}"
             logger.exception(error_msg)
+            emit(EventType.TOOL_CALL, agent=self.name, tool=name, success=False, error=str(e))
             return f"Error: {error_msg}"
 
     async def _handle_special_tool(self, name: str, result: Any, **kwargs):
@@ -34,6 +34,15 @@ class LLMSettings(BaseModel):
     temperature: float = Field(1.0, description="Sampling temperature")
     api_type: str = Field(..., description="Azure, Openai, or Ollama")
     api_version: str = Field(..., description="Azure Openai version if AzureOpenai")
+    max_concurrency: int = Field(
+        8, description="Maximum in-flight requests to this endpoint"
+    )
+    requests_per_minute: Optional[int] = Field(
+        None, description="Provider request quota per minute (None for unlimited)"
+    )
+    tokens_per_minute: Optional[int] = Field(
+        None, description="Provider token quota per minute (None for unlimited)"
+    )
 
 
 class ProxySettings(BaseModel):
@@ -104,6 +113,169 @@ class TTSSettings(BaseModel):
     default_output_dir: str = Field("results", description="默认音频文件输出目录")
 
 
+class ResearchSettings(BaseModel):
+    """Scheduling configuration for the research phase"""
+
+    concurrent: bool = Field(
+        True, description="Run specialist agents concurrently instead of one by one"
+    )
+    max_concurrency: int = Field(
+        6, description="Maximum number of specialist agents running at the same time"
+    )
+    provider_concurrency: Optional[int] = Field(
+        None,
+        description="Maximum number of agents in flight per LLM provider (base_url); "
+        "None leaves throttling to the LLM endpoint limiter",
+    )
+    provider_start_interval: float = Field(
+        0.5,
+        description="Minimum seconds between two agent starts on the same LLM provider",
+    )
+    prefetch: bool = Field(
+        True,
+        description="Prefetch shared market datasets once per stock before the agents run",
+    )
+
+
+class DataCacheSettings(BaseModel):
+    """Configuration for the market data fetch cache"""
+
+    enabled: bool = Field(True, description="Cache akshare/efinance/eastmoney fetches")
+    cache_dir: str = Field(
+        "cache/data",
+        description="On-disk cache directory, relative to the project root",
+    )
+    memory_max_entries: int = Field(
+        256, description="Maximum number of entries kept in the in-memory tier"
+    )
+    realtime_ttl: int = Field(
+        30, description="Seconds intraday data (quotes, capital flow) stays fresh"
+    )
+    financial_ttl_days: int = Field(
+        3, description="Days financial statements stay fresh"
+    )
+    spot_refresh_interval: int = Field(
+        60, description="Seconds between refreshes of the market-wide spot snapshot"
+    )
+
+
+class ExecutorSettings(BaseModel):
+    """Configuration for the thread pool running blocking data fetches"""
+
+    max_workers: int = Field(16, description="Maximum number of data fetch threads")
+    timeout: float = Field(60.0, description="Default per-call timeout in seconds")
+    backoff: float = Field(
+        1.0, description="Base retry delay in seconds, doubled after each failure"
+    )
+
+
+class HttpSettings(BaseModel):
+    """Configuration for the shared scraper HTTP client"""
+
+    max_connections: int = Field(20, description="Maximum pooled connections")
+    max_per_host: int = Field(6, description="Maximum concurrent requests per host")
+    timeout: float = Field(15.0, description="Request timeout in seconds")
+    http2: bool = Field(True, description="Use HTTP/2 when the h2 package is installed")
+    announcement_rate: float = Field(
+        5.0, description="Announcement detail requests per second"
+    )
+    announcement_burst: int = Field(
+        5, description="Announcement detail requests allowed in an initial burst"
+    )
+
+
+class LLMCacheSettings(BaseModel):
+    """Configuration for the LLM response cache"""
+
+    enabled: bool = Field(False, description="Cache deterministic LLM responses")
+    cache_dir: str = Field(
+        "cache/llm", description="On-disk cache directory, relative to the project root"
+    )
+    memory_max_entries: int = Field(
+        128, description="Maximum number of responses kept in memory"
+    )
+    max_entries: int = Field(
+        2000, description="Maximum number of responses kept on disk"
+    )
+    max_age_hours: float = Field(
+        168, description="Hours after which a cached response is discarded"
+    )
+
+
+class MemorySettings(BaseModel):
+    """Configuration for agent memory compaction"""
+
+    token_budget: Optional[int] = Field(
+        24000,
+        description="Token budget for a debate agent's conversation memory (None disables compaction)",
+    )
+    summary_max_tokens: int = Field(
+        2000, description="Token budget of the summary that replaces compacted turns"
+    )
+    excerpt_chars: int = Field(
+        160, description="Characters kept per message in the compaction summary"
+    )
+
+
+class BattleSettings(BaseModel):
+    """Configuration for the battle (debate) phase"""
+
+    debate_mode: str = Field(
+        "sequential",
+        description="'sequential': agents speak one after another; "
+        "'simultaneous': all agents speak concurrently on a shared snapshot of prior rounds",
+    )
+    keep_research_memory: bool = Field(
+        False,
+        description="Carry each agent's (compacted) research memory into the debate",
+    )
+
+
+class BackendSettings(BaseModel):
+    """Configuration for the web backend"""
+
+    analysis_workers: int = Field(
+        2, description="Number of analyses the backend runs at the same time"
+    )
+    max_queued: int = Field(
+        20, description="Analyses allowed to wait for a worker; more are rejected"
+    )
+    session_ttl: int = Field(
+        1800, description="Seconds a finished session (and its events) is kept"
+    )
+
+
+class ReportStorageSettings(BaseModel):
+    """Configuration for report file storage"""
+
+    mode: str = Field(
+        "plain",
+        description="plain: pretty-printed files; packed: compressed, deduplicated blobs",
+    )
+    blob_min_size: int = Field(
+        2048,
+        description="Smallest JSON subtree (bytes) stored as a shared blob in packed mode",
+    )
+
+
+class KlineStoreSettings(BaseModel):
+    """Configuration for the local K-line bar store"""
+
+    enabled: bool = Field(
+        True, description="Keep daily bars locally and fetch only the missing range"
+    )
+    store_dir: str = Field(
+        "cache/klines", description="Bar store directory, relative to the project root"
+    )
+    minute_store_dir: str = Field(
+        "cache/minutes",
+        description="Intraday minute bar directory, relative to the project root",
+    )
+    minute_keep_days: int = Field(
+        5, description="Trading days of minute bars kept per symbol"
+    )
+
+
 class MCPServerConfig(BaseModel):
     """Configuration for a single MCP server"""
 
@@ -161,6 +333,36 @@ class AppConfig(BaseModel):
     )
     mcp_config: Optional[MCPSettings] = Field(None, description="MCP configuration")
     tts_config: Optional[TTSSettings] = Field(None, description="TTS configuration")
+    research_config: Optional[ResearchSettings] = Field(
+        None, description="Research phase configuration"
+    )
+    data_cache_config: Optional[DataCacheSettings] = Field(
+        None, description="Market data cache configuration"
+    )
+    executor_config: Optional[ExecutorSettings] = Field(
+        None, description="Data fetch executor configuration"
+    )
+    http_config: Optional[HttpSettings] = Field(
+        None, description="Scraper HTTP client configuration"
+    )
+    llm_cache_config: Optional[LLMCacheSettings] = Field(
+        None, description="LLM response cache configuration"
+    )
+    memory_config: Optional[MemorySettings] = Field(
+        None, description="Agent memory compaction configuration"
+    )
+    battle_config: Optional[BattleSettings] = Field(
+        None, description="Battle phase configuration"
+    )
+    backend_config: Optional[BackendSettings] = Field(
+        None, description="Web backend configuration"
+    )
+    report_storage_config: Optional[ReportStorageSettings] = Field(
+        None, description="Report storage configuration"
+    )
+    kline_store_config: Optional[KlineStoreSettings] = Field(
+        None, description="K-line store configuration"
+    )
 
     class Config:
         arbitrary_types_allowed = True
@@ -218,6 +420,9 @@ class Config:
             "temperature": base_llm.get("temperature", 1.0),
             "api_type": base_llm.get("api_type", ""),
             "api_version": base_llm.get("api_version", ""),
+            "max_concurrency": base_llm.get("max_concurrency", 8),
+            "requests_per_minute": base_llm.get("requests_per_minute"),
+            "tokens_per_minute": base_llm.get("tokens_per_minute"),
         }
 
         # handle browser config.
@@ -276,6 +481,36 @@ class Config:
             # 创建默认TTS配置
             tts_settings = TTSSettings()
 
+        research_config = raw_config.get("research", {})
+        research_settings = ResearchSettings(**research_config)
+
+        data_cache_config = raw_config.get("data_cache", {})
+        data_cache_settings = DataCacheSettings(**data_cache_config)
+
+        executor_config = raw_config.get("executor", {})
+        executor_settings = ExecutorSettings(**executor_config)
+
+        http_config = raw_config.get("http", {})
+        http_settings = HttpSettings(**http_config)
+
+        llm_cache_config = raw_config.get("llm_cache", {})
+        llm_cache_settings = LLMCacheSettings(**llm_cache_config)
+
+        memory_config = raw_config.get("memory", {})
+        memory_settings = MemorySettings(**memory_config)
+
+        battle_config = raw_config.get("battle", {})
+        battle_settings = BattleSettings(**battle_config)
+
+        backend_config = raw_config.get("backend", {})
+        backend_settings = BackendSettings(**backend_config)
+
+        report_storage_config = raw_config.get("report_storage", {})
+        report_storage_settings = ReportStorageSettings(**report_storage_config)
+
+        kline_store_config = raw_config.get("kline_store", {})
+        kline_store_settings = KlineStoreSettings(**kline_store_config)
+
         config_dict = {
             "llm": {
                 "default": default_settings,
@@ -288,6 +523,16 @@ class Config:
             "search_config": search_settings,
             "mcp_config": mcp_settings,
             "tts_config": tts_settings,
+            "research_config": research_settings,
+            "data_cache_config": data_cache_settings,
+            "executor_config": executor_settings,
+            "http_config": http_settings,
+            "llm_cache_config": llm_cache_settings,
+            "memory_config": memory_settings,
+            "battle_config": battle_settings,
+            "backend_config": backend_settings,
+            "report_storage_config": report_storage_settings,
+            "kline_store_config": kline_store_settings,
         }
 
         self._config = AppConfig(**config_dict)
@@ -314,6 +559,56 @@ class Config:
         """获取TTS配置"""
         return self._config.tts_config
 
+    @property
+    def research_config(self) -> ResearchSettings:
+        """Get the research phase configuration"""
+        return self._config.research_config
+
+    @property
+    def data_cache_config(self) -> DataCacheSettings:
+        """Get the market data cache configuration"""
+        return self._config.data_cache_config
+
+    @property
+    def executor_config(self) -> ExecutorSettings:
+        """Get the data fetch executor configuration"""
+        return self._config.executor_config
+
+    @property
+    def http_config(self) -> HttpSettings:
+        """Get the scraper HTTP client configuration"""
+        return self._config.http_config
+
+    @property
+    def llm_cache_config(self) -> LLMCacheSettings:
+        """Get the LLM response cache configuration"""
+        return self._config.llm_cache_config
+
+    @property
+    def memory_config(self) -> MemorySettings:
+        """Get the agent memory compaction configuration"""
+        return self._config.memory_config
+
+    @property
+    def battle_config(self) -> BattleSettings:
+        """Get the battle phase configuration"""
+        return self._config.battle_config
+
+    @property
+    def backend_config(self) -> BackendSettings:
+        """Get the web backend configuration"""
+        return self._config.backend_config
+
+    @property
+    def report_storage_config(self) -> ReportStorageSettings:
+        """Get the report storage configuration"""
+        return self._config.report_storage_config
+
+    @property
+    def kline_store_config(self) -> KlineStoreSettings:
+        """Get the k-line store configuration"""
+        return self._config.kline_store_config
+
     @property
     def workspace_root(self) -> Path:
         """Get the workspace root directory"""
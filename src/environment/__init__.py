@@ -3,6 +3,12 @@
 from src.environment.base import BaseEnvironment
 from src.environment.battle import BattleEnvironment
 from src.environment.research import ResearchEnvironment
+from src.environment.scheduler import AgentScheduler
 
 
-__all__ = ["BaseEnvironment", "ResearchEnvironment", "BattleEnvironment"]
+__all__ = [
+    "BaseEnvironment",
+    "ResearchEnvironment",
+    "BattleEnvironment",
+    "AgentScheduler",
+]
@@ -1,11 +1,14 @@
 import asyncio
 import random
+import threading
 from typing import Any, Dict, List, Optional
-from pydantic import BaseModel, Field, ConfigDict
+from pydantic import BaseModel, Field, ConfigDict, PrivateAttr
 
 from src.agent.base import BaseAgent
 from src.agent.toolcall import ToolCallAgent
-from src.schema import AgentState
+from src.config import config
+from src.events import EventType, emit
+from src.schema import AgentState, Message
 from src.environment.base import BaseEnvironment
 from src.logger import logger
 from src.prompt.battle import (
@@ -21,6 +24,9 @@ from src.tool.terminate import Terminate
 from src.tool.tool_collection import ToolCollection
 
 
+DEBATE_MODES = ("sequential", "simultaneous")
+
+
 class BattleState(BaseModel):
     """Battle state tracking"""
     model_config = ConfigDict(arbitrary_types_allowed=True)
@@ -42,6 +48,9 @@ class BattleState(BaseModel):
     current_round: int = Field(default=0)  # 当前轮次
     current_speaker_index: int = Field(default=0)  # 当前发言者索引
 
+    # 投票可能并发提交，统计更新需加锁
+    _vote_lock: threading.RLock = PrivateAttr(default_factory=threading.RLock)
+
     def is_agent_active(self, agent_id: str) -> bool:
         """Check if agent is active and can participate"""
         return (
@@ -90,49 +99,51 @@ class BattleState(BaseModel):
             logger.error(f"❌ Invalid vote option '{vote}' from {agent_id}. Valid options: {VOTE_OPTIONS}")
             return
         
-        # 记录当前轮次的投票
-        if round_num is not None:
-            if round_num not in self.round_votes:
-                self.round_votes[round_num] = {}
-            self.round_votes[round_num][agent_id] = vote
-            logger.info(f"📊 Recorded {agent_id} vote for round {round_num}: {vote}")
-        
-        # 更新最终投票（最新的投票覆盖之前的）
-        old_vote = self.final_votes.get(agent_id, "None")
-        self.final_votes[agent_id] = vote
-        logger.info(f"🔄 Updated final vote for {agent_id}: {old_vote} -> {vote}")
-        
-        # 重新计算投票统计
-        self._recalculate_vote_results()
-    
+        with self._vote_lock:
+            # 记录当前轮次的投票
+            if round_num is not None:
+                if round_num not in self.round_votes:
+                    self.round_votes[round_num] = {}
+                self.round_votes[round_num][agent_id] = vote
+                logger.info(f"📊 Recorded {agent_id} vote for round {round_num}: {vote}")
+
+            # 更新最终投票（最新的投票覆盖之前的）
+            old_vote = self.final_votes.get(agent_id, "None")
+            self.final_votes[agent_id] = vote
+            logger.info(f"🔄 Updated final vote for {agent_id}: {old_vote} -> {vote}")
+
+            # 重新计算投票统计
+            self._recalculate_vote_results()
+
     def _recalculate_vote_results(self) -> None:
         """重新计算投票统计结果"""
-        logger.info(f"🔄 Recalculating vote results...")
-        logger.info(f"📋 Active agents: {list(self.active_agents.keys())} (total: {len(self.active_agents)})")
-        logger.info(f"📋 Final votes: {self.final_votes} (total: {len(self.final_votes)})")
-        logger.info(f"📋 Terminated agents: {list(self.terminated_agents.keys())} (total: {len(self.terminated_agents)})")
-        
-        # 重置计数
-        self.vote_results = {option: 0 for option in VOTE_OPTIONS}
-        
-        # 基于最终投票重新计算
-        for agent_id, vote in self.final_votes.items():
-            if vote in self.vote_results:
-                self.vote_results[vote] += 1
-                logger.info(f"✅ Counted vote: {agent_id} -> {vote}")
-            else:
-                logger.error(f"❌ Invalid vote option '{vote}' from {agent_id}, skipping")
-        
-        # 检查是否有专家没有投票
-        missing_votes = []
-        for agent_id in self.active_agents.keys():
-            if agent_id not in self.terminated_agents and agent_id not in self.final_votes:
-                missing_votes.append(agent_id)
-        
-        if missing_votes:
-            logger.warning(f"⚠️ Agents without final votes: {missing_votes}")
-        
-        logger.info(f"📊 Final vote results: {self.vote_results} (total votes: {sum(self.vote_results.values())})")
+        with self._vote_lock:
+            logger.info(f"🔄 Recalculating vote results...")
+            logger.info(f"📋 Active agents: {list(self.active_agents.keys())} (total: {len(self.active_agents)})")
+            logger.info(f"📋 Final votes: {self.final_votes} (total: {len(self.final_votes)})")
+            logger.info(f"📋 Terminated agents: {list(self.terminated_agents.keys())} (total: {len(self.terminated_agents)})")
+
+            # 重置计数
+            self.vote_results = {option: 0 for option in VOTE_OPTIONS}
+
+            # 基于最终投票重新计算
+            for agent_id, vote in self.final_votes.items():
+                if vote in self.vote_results:
+                    self.vote_results[vote] += 1
+                    logger.info(f"✅ Counted vote: {agent_id} -> {vote}")
+                else:
+                    logger.error(f"❌ Invalid vote option '{vote}' from {agent_id}, skipping")
+
+            # 检查是否有专家没有投票
+            missing_votes = []
+            for agent_id in self.active_agents.keys():
+                if agent_id not in self.terminated_agents and agent_id not in self.final_votes:
+                    missing_votes.append(agent_id)
+
+            if missing_votes:
+                logger.warning(f"⚠️ Agents without final votes: {missing_votes}")
+
+            logger.info(f"📊 Final vote results: {self.vote_results} (total votes: {sum(self.vote_results.values())})")
 
     def add_highlight(self, agent_name: str, content: str) -> None:
         """Add highlight if content is significant with deduplication"""
@@ -173,6 +184,13 @@ class BattleEnvironment(BaseEnvironment):
     tools: Dict[str, BaseTool] = Field(default_factory=dict)
     max_steps: int = Field(default=3, description="Maximum steps for each agent")
     debate_rounds: int = Field(default=2, description="Number of debate rounds")
+    debate_mode: str = Field(
+        default_factory=lambda: config.battle_config.debate_mode,
+        description="sequential or simultaneous speaking within a round",
+    )
+
+    # 同步发言模式下，本轮的广播先缓存，轮末统一发送
+    _round_broadcasts: Optional[List[tuple]] = PrivateAttr(default=None)
     tool_calls: int = Field(default=0, description="Total number of tool calls")
     llm_calls: int = Field(default=0, description="Total number of LLM calls")
 
@@ -180,7 +198,14 @@ class BattleEnvironment(BaseEnvironment):
         """Initialize the battle environment"""
         await super().initialize()
         self.state = BattleState()
-        logger.info(f"Battle environment initialized (max_steps={self.max_steps})")
+        if self.debate_mode not in DEBATE_MODES:
+            logger.warning(f"Unknown debate_mode '{self.debate_mode}', using sequential")
+            self.debate_mode = "sequential"
+        self._round_broadcasts = None
+        logger.info(
+            f"Battle environment initialized (max_steps={self.max_steps}, "
+            f"debate_mode={self.debate_mode})"
+        )
 
     def register_agent(self, agent: BaseAgent) -> None:
         """Register an agent with battle tools and instructions"""
@@ -201,6 +226,8 @@ class BattleEnvironment(BaseEnvironment):
             battle_tool.controller = self
             self.tools[agent_id] = battle_tool
             agent.available_tools = ToolCollection(battle_tool, Terminate())
+            # Only debate agents compact their memory; research runs stay verbatim
+            agent.memory_token_budget = config.memory_config.token_budget
 
             # Add battle instructions while preserving research context
             agent_description = getattr(agent, "description", "")
@@ -209,6 +236,25 @@ class BattleEnvironment(BaseEnvironment):
             
             logger.info(f"Agent {agent_id} registered for battle with preserved research context")
 
+    def adopt_agent(self, agent: BaseAgent, keep_memory: Optional[bool] = None) -> None:
+        """Register an agent that already ran in the research phase.
+
+        The agent keeps its LLM and MCP connections; its research memory is
+        compacted and kept, or cleared (the research digest is pinned later
+        either way).
+        """
+        if keep_memory is None:
+            keep_memory = config.battle_config.keep_research_memory
+
+        agent.current_step = 0
+        agent.state = AgentState.IDLE
+        if not keep_memory:
+            agent.memory.clear()
+
+        self.register_agent(agent)
+        if keep_memory and isinstance(agent, ToolCallAgent):
+            agent.compact_memory()
+
     async def run(self, report: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """Run the battle environment with the given research report."""
         try:
@@ -220,9 +266,17 @@ class BattleEnvironment(BaseEnvironment):
             await self._send_initial_context(report)
             
             # Run structured debate
+            emit(
+                EventType.PHASE,
+                phase="debate",
+                rounds=self.debate_rounds,
+                mode=self.debate_mode,
+                agents=list(self.state.agent_order),
+            )
             await self._run_structured_debate()
             
             # Run final voting
+            emit(EventType.PHASE, phase="voting")
             await self._run_final_voting()
 
             # Return results
@@ -251,6 +305,13 @@ class BattleEnvironment(BaseEnvironment):
         }
         self.state.debate_history.append(debate_entry)
         
+        emit(
+            EventType.SPEECH,
+            agent=agent_id,
+            speaker=event["agent_name"],
+            round=debate_entry["round"],
+            content=content,
+        )
         await self._broadcast_message(agent_id, content, EVENT_TYPES["speak"])
 
         return ToolResult(output=f"Message sent: {content}")
@@ -270,6 +331,13 @@ class BattleEnvironment(BaseEnvironment):
         current_round = getattr(self.state, 'current_round', 0)
         self.state.record_vote(agent_id, vote, current_round)
         self.state.add_event(EVENT_TYPES["vote"], agent_id, vote=vote, round=current_round)
+        emit(
+            EventType.VOTE,
+            agent=agent_id,
+            vote=vote,
+            round=current_round,
+            vote_count=dict(self.state.vote_results),
+        )
         await self._broadcast_message(agent_id, f"voted {vote} (Round {current_round})", EVENT_TYPES["vote"])
 
         return ToolResult(output=f"Vote recorded: {vote} for Round {current_round}")
@@ -344,16 +412,21 @@ class BattleEnvironment(BaseEnvironment):
         context_parts.append("你需要引用具体的分析数据来支持你的观点，并与其他专家进行充分讨论。")
         
         full_context = "\n".join(context_parts)
-        
-        # 发送给所有agents
+
+        # 研究摘要作为同一个固定块共享给所有agents，不参与记忆压缩
+        digest = Message.user_message(full_context)
         for agent_id, agent in self.agents.items():
             if isinstance(agent, ToolCallAgent):
-                agent.update_memory("user", full_context)
+                agent.memory.pin("research_digest", digest)
                 self.llm_calls += 1
                 logger.info(f"Sent comprehensive research context to {agent_id}")
 
     async def _run_structured_debate(self) -> None:
         """Run structured debate rounds with cumulative context passing."""
+        if self.debate_mode == "simultaneous":
+            await self._run_simultaneous_debate()
+            return
+
         for round_num in range(self.debate_rounds):
             self.state.current_round = round_num + 1
             logger.info(f"🗣️ Starting debate round {round_num + 1}/{self.debate_rounds}")
@@ -374,9 +447,70 @@ class BattleEnvironment(BaseEnvironment):
                 # 执行单个专家的发言轮次 (限制步数为1)
                 await self._run_single_agent_debate_turn(agent_id)
     
-    async def _send_debate_instruction(self, current_agent_id: str, speaker_index: int, round_num: int) -> None:
-        """Send specific debate instruction to current speaker."""
-        # 构建前面发言的总结
+    async def _run_simultaneous_debate(self) -> None:
+        """Run debate rounds in which all agents speak concurrently.
+
+        Every speaker gets the same snapshot of the previous rounds; speeches
+        and votes made during the round are broadcast together when it ends,
+        in speaking order, so the outcome does not depend on which LLM call
+        finished first.
+        """
+        for round_num in range(self.debate_rounds):
+            self.state.current_round = round_num + 1
+            speakers = [a for a in self.state.agent_order if self.state.can_agent_speak(a)]
+            if not speakers:
+                logger.warning("⚠️ No agents left to speak, ending debate")
+                return
+
+            logger.info(
+                f"🗣️ Starting simultaneous debate round {round_num + 1}/{self.debate_rounds} "
+                f"({len(speakers)} speakers)"
+            )
+            previous_speeches = self._previous_speeches()
+            history_start = len(self.state.battle_history)
+            debate_start = len(self.state.debate_history)
+
+            self._round_broadcasts = []
+            try:
+                for agent_id in speakers:
+                    await self._send_simultaneous_instruction(
+                        agent_id, round_num, previous_speeches
+                    )
+                await asyncio.gather(
+                    *(self._run_single_agent_debate_turn(agent_id) for agent_id in speakers)
+                )
+            finally:
+                broadcasts, self._round_broadcasts = self._round_broadcasts, None
+
+            self._order_round_history(history_start, debate_start)
+            self._flush_broadcasts(broadcasts)
+            logger.info(
+                f"📣 Round {round_num + 1} finished, broadcast {len(broadcasts)} messages"
+            )
+
+    def _flush_broadcasts(self, broadcasts: List[tuple]) -> None:
+        """Deliver buffered broadcasts in speaking order."""
+        order = {agent_id: i for i, agent_id in enumerate(self.state.agent_order)}
+        # sorted() is stable, so each speaker's own messages keep their order
+        for sender_id, message in sorted(broadcasts, key=lambda b: order.get(b[0], len(order))):
+            self._deliver_message(sender_id, message)
+
+    def _order_round_history(self, history_start: int, debate_start: int) -> None:
+        """Sort one round's events by speaking order instead of completion order."""
+        order = {agent_id: i for i, agent_id in enumerate(self.state.agent_order)}
+
+        def key(event: Dict[str, Any]) -> int:
+            return order.get(event.get("agent_id"), len(order))
+
+        self.state.battle_history[history_start:] = sorted(
+            self.state.battle_history[history_start:], key=key
+        )
+        self.state.debate_history[debate_start:] = sorted(
+            self.state.debate_history[debate_start:], key=key
+        )
+
+    def _previous_speeches(self) -> List[str]:
+        """Excerpts of the most recent round of speeches (older ones are in memory)."""
         previous_speeches = []
         for event in self.state.battle_history:
             if event.get("type") == "speak":
@@ -384,6 +518,45 @@ class BattleEnvironment(BaseEnvironment):
                 content = event.get("content", "")
                 if content:
                     previous_speeches.append(f"**{speaker_name}**: {content[:200]}...")
+        return previous_speeches[-max(1, len(self.state.agent_order)):]
+
+    async def _send_simultaneous_instruction(
+        self, agent_id: str, round_num: int, previous_speeches: List[str]
+    ) -> None:
+        """Send the shared round instruction used in simultaneous mode."""
+        context_parts = [
+            f"# 🎯 第{round_num + 1}轮辩论发言 (本轮所有专家同时发言)",
+            "",
+            "**你的任务非常明确：**",
+            "1. 立即使用Battle.speak发表你的观点（看涨或看跌）",
+            "2. 引用研究阶段的具体数据支持你的立场",
+            "3. 回应上一轮其他专家的观点（支持或反驳）",
+            "4. 发言后请立即投票（Battle.vote）- 你可以在每轮都投票！",
+            "",
+            "💡 **同步发言机制**：本轮其他专家的发言会在本轮结束后统一发给你。",
+            "⚠️ **严禁行为**：不要再做深度分析，直接基于已有数据发言！",
+            "",
+        ]
+        if previous_speeches:
+            context_parts.extend(["## 📋 上一轮专家的观点：", ""])
+            context_parts.extend(previous_speeches)
+            context_parts.extend(["", "## 🗣️ 现在请立即表态并说出理由！"])
+        else:
+            context_parts.extend([
+                "## 🗣️ 这是第一轮发言，请直接表明立场！",
+                "直接说出你的观点：看涨还是看跌，并给出核心理由。",
+            ])
+
+        agent = self.agents.get(agent_id)
+        if isinstance(agent, ToolCallAgent):
+            agent.update_memory("user", "\n".join(context_parts))
+            self.llm_calls += 1
+            logger.info(f"✉️ Sent simultaneous debate instruction to {agent_id} (Round {round_num + 1})")
+
+    async def _send_debate_instruction(self, current_agent_id: str, speaker_index: int, round_num: int) -> None:
+        """Send specific debate instruction to current speaker."""
+        # 构建前面发言的总结（只取最近一轮，更早的发言已在记忆中）
+        previous_speeches = self._previous_speeches()
         
         # 构建辩论指导
         context_parts = [
@@ -482,24 +655,22 @@ class BattleEnvironment(BaseEnvironment):
                 logger.info(f"✅ {agent_id} has final vote: {self.state.final_votes[agent_id]} - allowing update")
             else:
                 logger.info(f"🗳️ {agent_id} needs to cast final vote")
-            
+
             logger.info(f"🗳️ Requesting vote from {agent_id}")
             await self._send_voting_instruction(agent_id)
-            await self._run_single_agent_voting_turn(agent_id)
-        
-        # 最终验证：确保所有合格的分析师都投了票
-        missing_votes = []
-        for agent_id in eligible_voters:
-            if agent_id not in self.state.final_votes:
-                missing_votes.append(agent_id)
-        
-        if missing_votes:
-            logger.error(f"❌ CRITICAL: Missing votes after voting phase: {missing_votes}")
-            # 对缺失投票的分析师进行最后一次尝试
-            for agent_id in missing_votes:
-                logger.warning(f"🔄 Final attempt to get vote from {agent_id}")
-                await self._run_single_agent_voting_turn(agent_id)
-        
+
+        # 各专家的最终投票互不依赖，并发进行（LLM 并发由端点限流器控制）；
+        # 投票广播在本阶段结束后按发言顺序统一发送
+        self._round_broadcasts = []
+        try:
+            # 重试与默认投票都在 _run_single_agent_voting_turn 内完成
+            await asyncio.gather(
+                *(self._run_single_agent_voting_turn(agent_id) for agent_id in eligible_voters)
+            )
+        finally:
+            broadcasts, self._round_broadcasts = self._round_broadcasts, None
+
+        self._flush_broadcasts(broadcasts)
         logger.info(f"✅ Final voting phase completed. Total votes: {len(self.state.final_votes)}")
 
     async def _send_voting_instruction(self, agent_id: str) -> None:
@@ -659,7 +830,16 @@ class BattleEnvironment(BaseEnvironment):
             content=content,
             action_type=event_type,
         )
-        
+
+        if self._round_broadcasts is not None:
+            # Simultaneous round in progress: delivered at the round boundary
+            self._round_broadcasts.append((sender_id, message))
+            return
+
+        self._deliver_message(sender_id, message)
+
+    def _deliver_message(self, sender_id: str, message: str) -> None:
+        """Append a broadcast message to every other agent's memory."""
         for agent_id, agent in self.agents.items():
             if agent_id != sender_id and isinstance(agent, ToolCallAgent):
                 agent.update_memory("user", message)
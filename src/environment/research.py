@@ -1,5 +1,5 @@
 import asyncio
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 from pydantic import Field
 
@@ -9,9 +9,18 @@ from src.agent.risk_control import RiskControlAgent
 from src.agent.sentiment import SentimentAgent
 from src.agent.technical_analysis import TechnicalAnalysisAgent
 from src.agent.big_deal_analysis import BigDealAnalysisAgent
+from src.config import config
 from src.environment.base import BaseEnvironment
+from src.environment.scheduler import AgentScheduler
+from src.events import EventType, emit
 from src.logger import logger
 from src.schema import Message
+from src.tool.data_cache import data_cache
+from src.tool.market_data import (
+    prefetch_market_data,
+    reset_current_snapshot,
+    set_current_snapshot,
+)
 from src.tool.stock_info_request import StockInfoRequest
 from src.utils.report_manager import report_manager
 
@@ -24,6 +33,28 @@ class ResearchEnvironment(BaseEnvironment):
     results: Dict[str, Any] = Field(default_factory=dict)
     max_steps: int = Field(default=3, description="Maximum steps for each agent")
 
+    # Scheduling of the specialist agents
+    concurrent: bool = Field(
+        default_factory=lambda: config.research_config.concurrent,
+        description="Run specialist agents concurrently instead of sequentially",
+    )
+    max_concurrency: int = Field(
+        default_factory=lambda: config.research_config.max_concurrency,
+        description="Maximum number of agents running at the same time",
+    )
+    provider_concurrency: Optional[int] = Field(
+        default_factory=lambda: config.research_config.provider_concurrency,
+        description="Maximum number of agents in flight per LLM provider",
+    )
+    provider_start_interval: float = Field(
+        default_factory=lambda: config.research_config.provider_start_interval,
+        description="Minimum seconds between agent starts on the same provider",
+    )
+    prefetch: bool = Field(
+        default_factory=lambda: config.research_config.prefetch,
+        description="Prefetch shared market data once per stock before the agents run",
+    )
+
     # Analysis mapping for agent roles
     analysis_mapping: Dict[str, str] = Field(
         default={
@@ -59,11 +90,26 @@ class ResearchEnvironment(BaseEnvironment):
     async def run(self, stock_code: str) -> Dict[str, Any]:
         """Run research on the given stock code using all specialist agents."""
         logger.info(f"Running research on stock {stock_code}")
+        emit(
+            EventType.PHASE,
+            phase="research",
+            stock_code=stock_code,
+            agents=[k for k in self.analysis_mapping.keys() if k in self.agents],
+        )
 
+        snapshot_token = None
         try:
-            # 获取股票基本信息
+            # 获取股票基本信息，同时预取各专家共用的行情数据
             basic_info_tool = StockInfoRequest()
-            basic_info_result = await basic_info_tool.execute(stock_code=stock_code)
+            if self.prefetch:
+                basic_info_result, snapshot = await asyncio.gather(
+                    basic_info_tool.execute(stock_code=stock_code),
+                    prefetch_market_data(stock_code),
+                )
+                # Agent tasks created below inherit this context
+                snapshot_token = set_current_snapshot(snapshot)
+            else:
+                basic_info_result = await basic_info_tool.execute(stock_code=stock_code)
 
             if basic_info_result.error:
                 logger.error(f"Error getting basic info: {basic_info_result.error}")
@@ -83,49 +129,22 @@ class ResearchEnvironment(BaseEnvironment):
                         )
                         logger.info(f"Added basic stock info to {agent_key}'s context")
 
-            # Run analysis tasks sequentially with 3-second intervals
-            results = {}
-            agent_count = 0
-            total_agents = len([k for k in self.analysis_mapping.keys() if k in self.agents])
-            
             # Import visualizer for progress display
             try:
                 from src.console import visualizer
                 show_visual = True
             except:
+                visualizer = None
                 show_visual = False
-            
-            for agent_key, result_key in self.analysis_mapping.items():
-                if agent_key not in self.agents:
-                    continue
-                    
-                agent_count += 1
-                logger.info(f"🔄 Starting analysis with {agent_key} ({agent_count}/{total_agents})")
-                
-                # Show agent starting in terminal
-                if show_visual:
-                    visualizer.show_agent_starting(agent_key, agent_count, total_agents)
-                
-                try:
-                    # Run individual agent
-                    result = await self.agents[agent_key].run(stock_code)
-                    results[result_key] = result
-                    logger.info(f"✅ Completed analysis with {agent_key}")
-                    
-                    # Show agent completion in terminal
-                    if show_visual:
-                        visualizer.show_agent_completed(agent_key, agent_count, total_agents)
-                    
-                    # Wait 3 seconds before next agent (except for the last one)
-                    if agent_count < total_agents:
-                        logger.info(f"⏳ Waiting 3 seconds before next agent...")
-                        if show_visual:
-                            visualizer.show_waiting_next_agent(3)
-                        await asyncio.sleep(3)
-                        
-                except Exception as e:
-                    logger.error(f"❌ Error with {agent_key}: {str(e)}")
-                    results[result_key] = f"Error: {str(e)}"
+
+            if self.concurrent:
+                results = await self._run_agents_concurrently(
+                    stock_code, visualizer if show_visual else None
+                )
+            else:
+                results = await self._run_agents_sequentially(
+                    stock_code, visualizer if show_visual else None
+                )
 
             if not results:
                 return {
@@ -139,11 +158,108 @@ class ResearchEnvironment(BaseEnvironment):
 
             # Store and return complete results (without generating report here)
             self.results = {**results, "stock_code": stock_code}
+            logger.info(f"Data cache stats: {data_cache.stats()['total']}")
             return self.results
 
         except Exception as e:
             logger.error(f"Error in research: {str(e)}")
             return {"error": str(e), "stock_code": stock_code}
+        finally:
+            if snapshot_token is not None:
+                reset_current_snapshot(snapshot_token)
+
+    async def _run_agents_sequentially(self, stock_code: str, visualizer=None) -> Dict[str, Any]:
+        """Run specialist agents one by one with a fixed interval between them."""
+        results = {}
+        agent_count = 0
+        total_agents = len([k for k in self.analysis_mapping.keys() if k in self.agents])
+
+        for agent_key, result_key in self.analysis_mapping.items():
+            if agent_key not in self.agents:
+                continue
+
+            agent_count += 1
+            logger.info(f"🔄 Starting analysis with {agent_key} ({agent_count}/{total_agents})")
+
+            # Show agent starting in terminal
+            if visualizer:
+                visualizer.show_agent_starting(agent_key, agent_count, total_agents)
+
+            try:
+                # Run individual agent
+                result = await self.agents[agent_key].run(stock_code)
+                results[result_key] = result
+                logger.info(f"✅ Completed analysis with {agent_key}")
+
+                # Show agent completion in terminal
+                if visualizer:
+                    visualizer.show_agent_completed(agent_key, agent_count, total_agents)
+
+                # Wait 3 seconds before next agent (except for the last one)
+                if agent_count < total_agents:
+                    logger.info(f"⏳ Waiting 3 seconds before next agent...")
+                    if visualizer:
+                        visualizer.show_waiting_next_agent(3)
+                    await asyncio.sleep(3)
+
+            except Exception as e:
+                logger.error(f"❌ Error with {agent_key}: {str(e)}")
+                results[result_key] = f"Error: {str(e)}"
+
+        return results
+
+    async def _run_agents_concurrently(self, stock_code: str, visualizer=None) -> Dict[str, Any]:
+        """Run specialist agents as concurrent tasks under the scheduler's budget."""
+        agent_keys = [k for k in self.analysis_mapping.keys() if k in self.agents]
+        total_agents = len(agent_keys)
+        completed = 0
+
+        scheduler = AgentScheduler(
+            max_concurrency=self.max_concurrency,
+            provider_concurrency=self.provider_concurrency,
+            provider_start_interval=self.provider_start_interval,
+        )
+
+        def make_job(agent_key: str, index: int):
+            async def job():
+                nonlocal completed
+                logger.info(f"🔄 Starting analysis with {agent_key} ({index}/{total_agents})")
+                if visualizer:
+                    visualizer.show_agent_starting(agent_key, index, total_agents)
+
+                result = await self.agents[agent_key].run(stock_code)
+
+                completed += 1
+                logger.info(f"✅ Completed analysis with {agent_key}")
+                if visualizer:
+                    visualizer.show_agent_completed(agent_key, completed, total_agents)
+                return result
+
+            return job
+
+        logger.info(
+            f"Running {total_agents} agents concurrently "
+            f"(max_concurrency={self.max_concurrency}, provider_concurrency={self.provider_concurrency})"
+        )
+        outcomes = await scheduler.run_all(
+            [
+                (agent_key, self.agents[agent_key], make_job(agent_key, index))
+                for index, agent_key in enumerate(agent_keys, start=1)
+            ]
+        )
+
+        # Keep results in analysis_mapping order regardless of completion order
+        results = {}
+        for agent_key in agent_keys:
+            result_key = self.analysis_mapping[agent_key]
+            outcome = outcomes.get(agent_key)
+            if isinstance(outcome, BaseException):
+                logger.error(f"❌ Error with {agent_key}: {str(outcome)}")
+                results[result_key] = f"Error: {str(outcome)}"
+            else:
+                results[result_key] = outcome
+
+        return results
 
     async def cleanup(self) -> None:
         """Clean up all agent resources."""
@@ -0,0 +1,91 @@
+import asyncio
+import contextlib
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from src.agent.base import BaseAgent
+from src.logger import logger
+
+
+AgentJob = Callable[[], Awaitable[Any]]
+
+
+class AgentScheduler:
+    """Run agent jobs as asyncio tasks under a global and per-provider budget.
+
+    Every job holds one slot of the global concurrency limit while it runs.
+    Jobs whose agents talk to the same LLM provider (grouped by ``base_url``)
+    optionally share a provider semaphore (by default the per-endpoint LLM rate
+    limiter does the throttling instead), and consecutive starts on one
+    provider are spaced by ``provider_start_interval`` seconds so a burst of
+    agents does not hit the endpoint at the same instant.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 6,
+        provider_concurrency: Optional[int] = None,
+        provider_start_interval: float = 0.0,
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.provider_concurrency = (
+            max(1, provider_concurrency) if provider_concurrency is not None else None
+        )
+        self.provider_start_interval = max(0.0, provider_start_interval)
+
+        self._global_slots = asyncio.Semaphore(self.max_concurrency)
+        self._provider_slots: Dict[str, asyncio.Semaphore] = {}
+        self._provider_locks: Dict[str, asyncio.Lock] = {}
+        self._provider_last_start: Dict[str, float] = {}
+
+    @staticmethod
+    def provider_key(agent: Optional[BaseAgent]) -> str:
+        """Group agents by the LLM endpoint they call."""
+        llm = getattr(agent, "llm", None)
+        return getattr(llm, "base_url", None) or "default"
+
+    async def _wait_start_interval(self, provider: str) -> None:
+        """Space out consecutive job starts on the same provider."""
+        if not self.provider_start_interval:
+            return
+
+        lock = self._provider_locks.setdefault(provider, asyncio.Lock())
+        async with lock:
+            last_start = self._provider_last_start.get(provider)
+            if last_start is not None:
+                delay = self.provider_start_interval - (time.monotonic() - last_start)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            self._provider_last_start[provider] = time.monotonic()
+
+    async def run_job(
+        self, name: str, agent: Optional[BaseAgent], job: AgentJob
+    ) -> Any:
+        """Run a single job once a global and a provider slot are available."""
+        provider = self.provider_key(agent)
+        provider_slots = None
+        if self.provider_concurrency is not None:
+            provider_slots = self._provider_slots.setdefault(
+                provider, asyncio.Semaphore(self.provider_concurrency)
+            )
+
+        async with self._global_slots:
+            async with provider_slots or contextlib.nullcontext():
+                await self._wait_start_interval(provider)
+                logger.info(f"🚦 Scheduler started {name} on provider {provider}")
+                return await job()
+
+    async def run_all(
+        self, jobs: List[Tuple[str, Optional[BaseAgent], AgentJob]]
+    ) -> Dict[str, Any]:
+        """Run all jobs concurrently and return results keyed by job name.
+
+        Exceptions are not propagated; a failed job maps to its exception so the
+        caller can decide how to report it.
+        """
+        tasks = {
+            name: asyncio.create_task(self.run_job(name, agent, job), name=name)
+            for name, agent, job in jobs
+        }
+        outcomes = await asyncio.gather(*tasks.values(), return_exceptions=True)
+        return dict(zip(tasks.keys(), outcomes))
@@ -0,0 +1,231 @@
+"""
+分析进度事件总线
+
+Agents, tools and environments publish typed progress events (agent start and
+finish, tool calls, debate speeches, votes, report ready; the web backend adds
+queue position and start events) to the topic bound to the current context,
+normally one analysis session. Consumers such as the
+web backend's SSE route subscribe to a topic and ``await`` its events; every
+subscriber gets its own queue, so several browser tabs can follow the same
+session. Each topic keeps a bounded history that is replayed to late
+subscribers.
+
+Publishing is synchronous and thread-safe, so it works from executor threads
+and pydantic model methods alike, and costs nothing when no topic is bound
+(the CLI).
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar, Token
+from enum import Enum
+from typing import Any, Deque, Dict, Optional, Set
+
+from pydantic import BaseModel, Field
+
+
+class EventType(str, Enum):
+    """Progress event types"""
+
+    QUEUED = "queued"
+    STARTED = "started"
+    PHASE = "phase"
+    AGENT_START = "agent_start"
+    AGENT_FINISH = "agent_finish"
+    TOOL_CALL = "tool_call"
+    SPEECH = "speech"
+    VOTE = "vote"
+    REPORT_READY = "report_ready"
+    OUTPUT = "output"
+    COMPLETE = "complete"
+    ERROR = "error"
+
+
+# A topic ends with one of these; subscribers stop after receiving it
+TERMINAL_EVENTS = (EventType.COMPLETE, EventType.ERROR)
+
+
+class ProgressEvent(BaseModel):
+    """One progress event published on a topic"""
+
+    type: EventType
+    topic: str
+    seq: int
+    timestamp: float = Field(default_factory=time.time)
+    agent: Optional[str] = None
+    data: Dict[str, Any] = Field(default_factory=dict)
+
+    @property
+    def is_terminal(self) -> bool:
+        return self.type in TERMINAL_EVENTS
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Flat JSON payload: type, seq, timestamp, agent and the event data."""
+        payload = {
+            "type": self.type.value,
+            "seq": self.seq,
+            "timestamp": self.timestamp,
+        }
+        if self.agent:
+            payload["agent"] = self.agent
+        payload.update(self.data)
+        return payload
+
+
+class Subscription:
+    """A subscriber's queue of events on one topic; consume with ``async for``."""
+
+    def __init__(self, bus: "EventBus", topic: str):
+        self.bus = bus
+        self.topic = topic
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self._loop = asyncio.get_running_loop()
+
+    def _deliver(self, event: ProgressEvent) -> None:
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self.queue.put_nowait(event)
+        elif not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self.queue.put_nowait, event)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[ProgressEvent]:
+        """Next event, or None if nothing arrived within ``timeout`` seconds."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> ProgressEvent:
+        event = await self.queue.get()
+        if event.is_terminal:
+            self.close()
+        return event
+
+    def close(self) -> None:
+        self.bus.unsubscribe(self)
+
+    def __enter__(self) -> "Subscription":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class _Channel:
+    def __init__(self, history_size: int):
+        self.history: Deque[ProgressEvent] = deque(maxlen=history_size)
+        self.subscribers: Set[Subscription] = set()
+        self.seq = 0
+        self.finished = False
+
+
+class EventBus:
+    """In-process publish/subscribe bus keyed by topic."""
+
+    def __init__(self, history_size: int = 2000):
+        self.history_size = history_size
+        self._channels: Dict[str, _Channel] = {}
+        self._lock = threading.Lock()
+
+    def _channel(self, topic: str) -> _Channel:
+        channel = self._channels.get(topic)
+        if channel is None:
+            channel = self._channels[topic] = _Channel(self.history_size)
+        return channel
+
+    def publish(
+        self,
+        topic: str,
+        event_type: EventType,
+        agent: Optional[str] = None,
+        **data: Any,
+    ) -> Optional[ProgressEvent]:
+        """Publish an event to every subscriber of the topic; safe from any thread."""
+        with self._lock:
+            channel = self._channel(topic)
+            if channel.finished:
+                return None
+            channel.seq += 1
+            event = ProgressEvent(
+                type=event_type, topic=topic, seq=channel.seq, agent=agent, data=data
+            )
+            channel.history.append(event)
+            channel.finished = event.is_terminal
+            subscribers = list(channel.subscribers)
+
+        for subscriber in subscribers:
+            subscriber._deliver(event)
+        return event
+
+    def subscribe(self, topic: str, replay: bool = True) -> Subscription:
+        """Subscribe from the event loop; past events are replayed first by default."""
+        subscription = Subscription(self, topic)
+        with self._lock:
+            channel = self._channel(topic)
+            if replay:
+                for event in channel.history:
+                    subscription.queue.put_nowait(event)
+            channel.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            channel = self._channels.get(subscription.topic)
+            if channel is not None:
+                channel.subscribers.discard(subscription)
+
+    def last(self, topic: str, event_type: EventType) -> Optional[ProgressEvent]:
+        """Most recent event of a type still in the topic's history."""
+        with self._lock:
+            channel = self._channels.get(topic)
+            if channel is None:
+                return None
+            for event in reversed(channel.history):
+                if event.type == event_type:
+                    return event
+        return None
+
+    def subscriber_count(self, topic: str) -> int:
+        with self._lock:
+            channel = self._channels.get(topic)
+            return len(channel.subscribers) if channel else 0
+
+    def close(self, topic: str) -> None:
+        """Forget a topic and its history."""
+        with self._lock:
+            self._channels.pop(topic, None)
+
+
+# 全局事件总线实例
+event_bus = EventBus()
+
+_current_topic: ContextVar[Optional[str]] = ContextVar("event_topic", default=None)
+
+
+def current_topic() -> Optional[str]:
+    """Topic bound to the current context, if any."""
+    return _current_topic.get()
+
+
+def bind_topic(topic: Optional[str]) -> Token:
+    """Bind a topic for the current context; tasks created afterwards inherit it."""
+    return _current_topic.set(topic)
+
+
+def reset_topic(token: Token) -> None:
+    _current_topic.reset(token)
+
+
+def emit(event_type: EventType, agent: Optional[str] = None, **data: Any) -> None:
+    """Publish to the topic bound to the current context; no-op when none is bound."""
+    topic = _current_topic.get()
+    if topic is not None:
+        event_bus.publish(topic, event_type, agent=agent, **data)
@@ -7,3 +7,7 @@ class ToolError(Exception):
 
 class TokenLimitExceeded(Exception):
     """Exception raised when the token limit is exceeded"""
+
+
+class EmptyLLMResponse(ValueError):
+    """Raised when the LLM returns no content; retried like a transient error"""
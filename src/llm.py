@@ -1,5 +1,13 @@
+import hashlib
+import json
 import math
-from typing import Dict, List, Optional, Union
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar, Token
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
 
 import tiktoken
 from openai import (
@@ -10,15 +18,16 @@ from openai import (
     OpenAIError,
     RateLimitError,
 )
-from tenacity import (
-    retry,
-    retry_if_exception_type,
-    stop_after_attempt,
-    wait_random_exponential,
+from openai.types.chat import ChatCompletionMessage
+from tenacity import retry, retry_if_exception, stop_after_attempt
+
+from src.config import PROJECT_ROOT, LLMSettings, config
+from src.exceptions import EmptyLLMResponse, TokenLimitExceeded
+from src.llm_rate_limiter import (
+    get_rate_controller,
+    is_transient_llm_error,
+    wait_retry_after,
 )
-
-from src.config import LLMSettings, config
-from src.exceptions import TokenLimitExceeded
 from src.logger import logger  # Assuming a logger is set up in your app
 from src.ollama_client import OllamaAsyncOpenAI
 from src.schema import (
@@ -71,6 +80,8 @@ class TokenCounter:
 
     def __init__(self, tokenizer):
         self.tokenizer = tokenizer
+        self.name = getattr(tokenizer, "name", "default")
+        self._schema_tokens: Dict[str, int] = {}
 
     def count_text(self, text: str) -> int:
         """Calculate tokens for a text string"""
@@ -166,31 +177,222 @@ class TokenCounter:
                 token_count += self.count_text(function.get("arguments", ""))
         return token_count
 
-    def count_message_tokens(self, messages: List[dict]) -> int:
-        """Calculate the total number of tokens in a message list"""
+    def count_message(self, message: dict) -> int:
+        """Calculate the tokens of a single formatted message"""
+        tokens = self.BASE_MESSAGE_TOKENS  # Base tokens per message
+
+        # Add role tokens
+        tokens += self.count_text(message.get("role", ""))
+
+        # Add content tokens
+        if "content" in message:
+            tokens += self.count_content(message["content"])
+
+        # Add tool calls tokens
+        if "tool_calls" in message:
+            tokens += self.count_tool_calls(message["tool_calls"])
+
+        # Add name and tool_call_id tokens
+        tokens += self.count_text(message.get("name", ""))
+        tokens += self.count_text(message.get("tool_call_id", ""))
+
+        # format_messages sends base64_image along; count it as one image
+        if message.get("base64_image"):
+            tokens += self.count_image({})
+
+        return tokens
+
+    def count_message_tokens(self, messages: List[Union[dict, Message]]) -> int:
+        """Calculate the total number of tokens in a message list
+
+        Message objects carry their own cached count, so only dicts and new
+        messages are encoded.
+        """
         total_tokens = self.FORMAT_TOKENS  # Base format tokens
 
         for message in messages:
-            tokens = self.BASE_MESSAGE_TOKENS  # Base tokens per message
+            if isinstance(message, Message):
+                total_tokens += message.token_count(self)
+            else:
+                total_tokens += self.count_message(message)
+
+        return total_tokens
 
-            # Add role tokens
-            tokens += self.count_text(message.get("role", ""))
+    def count_tools(self, tools: List[dict]) -> int:
+        """Calculate tokens for tool schemas, caching each distinct schema"""
+        token_count = 0
+        for tool in tools:
+            schema = str(tool)
+            tokens = self._schema_tokens.get(schema)
+            if tokens is None:
+                tokens = self._schema_tokens[schema] = self.count_text(schema)
+            token_count += tokens
+        return token_count
 
-            # Add content tokens
-            if "content" in message:
-                tokens += self.count_content(message["content"])
 
-            # Add tool calls tokens
-            if "tool_calls" in message:
-                tokens += self.count_tool_calls(message["tool_calls"])
+class LLMResponseCache:
+    """Memory LRU plus on-disk store for deterministic LLM responses.
 
-            # Add name and tool_call_id tokens
-            tokens += self.count_text(message.get("name", ""))
-            tokens += self.count_text(message.get("tool_call_id", ""))
+    Keys are a canonical hash of the request (model, temperature, formatted
+    messages, tool schemas). Entries older than ``max_age`` seconds are
+    discarded, and the disk store is trimmed to ``max_entries`` files by age.
+    """
 
-            total_tokens += tokens
+    PRUNE_EVERY = 50
 
-        return total_tokens
+    def __init__(
+        self,
+        cache_dir: Path,
+        memory_max_entries: int = 128,
+        max_entries: int = 2000,
+        max_age: float = 7 * 24 * 3600,
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.memory_max_entries = max(1, memory_max_entries)
+        self.max_entries = max(1, max_entries)
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    @staticmethod
+    def make_key(payload: Dict[str, Any]) -> str:
+        canonical = json.dumps(
+            payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str
+        )
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def _expired(self, created_at: float) -> bool:
+        return time.time() - created_at > self.max_age
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created_at, value = entry
+                if not self._expired(created_at):
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._memory[key]
+
+        path = self._path(key)
+        try:
+            with path.open("r", encoding="utf-8") as f:
+                record = json.load(f)
+        except FileNotFoundError:
+            record = None
+        except Exception as e:
+            logger.warning(f"Discarding unreadable LLM cache file {path}: {e}")
+            path.unlink(missing_ok=True)
+            record = None
+
+        if record is None or self._expired(record.get("created_at", 0)):
+            if record is not None:
+                path.unlink(missing_ok=True)
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self._remember(key, record["created_at"], record["value"])
+            self.hits += 1
+        return record["value"]
+
+    def _remember(self, key: str, created_at: float, value: Any) -> None:
+        self._memory[key] = (created_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_max_entries:
+            self._memory.popitem(last=False)
+
+    def set(self, key: str, value: Any) -> None:
+        created_at = time.time()
+        with self._lock:
+            self._remember(key, created_at, value)
+            self._writes += 1
+            prune = self._writes % self.PRUNE_EVERY == 0
+
+        path = self._path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            with tmp_path.open("w", encoding="utf-8") as f:
+                json.dump({"created_at": created_at, "value": value}, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Failed to write LLM cache file {path}: {e}")
+
+        if prune:
+            self.prune()
+
+    def prune(self) -> None:
+        """Drop expired files and trim the disk store to max_entries."""
+        if not self.cache_dir.exists():
+            return
+        entries = []
+        for path in self.cache_dir.glob("*/*.json"):
+            try:
+                mtime = path.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            if time.time() - mtime > self.max_age:
+                path.unlink(missing_ok=True)
+            else:
+                entries.append((mtime, path))
+
+        excess = len(entries) - self.max_entries
+        if excess > 0:
+            entries.sort()
+            for _, path in entries[:excess]:
+                path.unlink(missing_ok=True)
+
+
+_response_cache: Optional[LLMResponseCache] = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[LLMResponseCache]:
+    """Return the shared response cache, or None when caching is disabled."""
+    global _response_cache
+    settings = config.llm_cache_config
+    if settings is None or not settings.enabled:
+        return None
+    if _response_cache is None:
+        with _response_cache_lock:
+            if _response_cache is None:
+                cache_dir = Path(settings.cache_dir)
+                if not cache_dir.is_absolute():
+                    cache_dir = PROJECT_ROOT / cache_dir
+                _response_cache = LLMResponseCache(
+                    cache_dir=cache_dir,
+                    memory_max_entries=settings.memory_max_entries,
+                    max_entries=settings.max_entries,
+                    max_age=settings.max_age_hours * 3600,
+                )
+    return _response_cache
+
+
+# Input tokens counted per analysis scope (LLM instance -> tokens); None means
+# the process-wide counter of each instance is used
+_token_usage: ContextVar[Optional[Dict[Any, int]]] = ContextVar(
+    "llm_token_usage", default=None
+)
+
+
+def start_token_scope() -> Token:
+    """Count input tokens separately from here on, so max_input_tokens applies
+    per analysis; tasks started afterwards share the scope."""
+    return _token_usage.set({})
+
+
+def reset_token_scope(token: Token) -> None:
+    _token_usage.reset(token)
 
 
 class LLM:
@@ -222,7 +424,7 @@ class LLM:
             self.base_url = llm_config.base_url
 
             # Add token counting related attributes
-            self.total_input_tokens = 0
+            self._total_input_tokens = 0
             self.max_input_tokens = (
                 llm_config.max_input_tokens
                 if hasattr(llm_config, "max_input_tokens")
@@ -241,6 +443,7 @@ class LLM:
                     base_url=self.base_url,
                     api_key=self.api_key,
                     api_version=self.api_version,
+                    max_retries=0,
                 )
             elif self.api_type == "ollama":
                 # For Ollama, we need to handle it differently
@@ -252,23 +455,47 @@ class LLM:
                 )
                 logger.info(f"Ollama client initialized successfully")
             else:
-                self.client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url)
+                # Retries are driven by tenacity and the rate controller below,
+                # so the SDK's own retry loop is disabled
+                self.client = AsyncOpenAI(
+                    api_key=self.api_key, base_url=self.base_url, max_retries=0
+                )
 
             self.token_counter = TokenCounter(self.tokenizer)
 
+            # Shared by every config that points at the same endpoint and model
+            self.rate_controller = get_rate_controller(
+                self.base_url,
+                self.model,
+                max_concurrency=getattr(llm_config, "max_concurrency", 8),
+                requests_per_minute=getattr(llm_config, "requests_per_minute", None),
+                tokens_per_minute=getattr(llm_config, "tokens_per_minute", None),
+            )
+
     def count_tokens(self, text: str) -> int:
         """Calculate the number of tokens in a text"""
         if not text:
             return 0
         return len(self.tokenizer.encode(text))
 
-    def count_message_tokens(self, messages: List[dict]) -> int:
+    def count_message_tokens(self, messages: List[Union[dict, Message]]) -> int:
         return self.token_counter.count_message_tokens(messages)
 
+    @property
+    def total_input_tokens(self) -> int:
+        """Input tokens used so far in the current token scope (or the process)."""
+        usage = _token_usage.get()
+        if usage is None:
+            return self._total_input_tokens
+        return usage.get(self, 0)
+
     def update_token_count(self, input_tokens: int) -> None:
         """Update token counts"""
-        # Only track tokens if max_input_tokens is set
-        self.total_input_tokens += input_tokens
+        usage = _token_usage.get()
+        if usage is None:
+            self._total_input_tokens += input_tokens
+        else:
+            usage[self] = usage.get(self, 0) + input_tokens
         logger.info(
             f"Token usage: Input={input_tokens}, Cumulative Input={self.total_input_tokens}"
         )
@@ -290,6 +517,66 @@ class LLM:
 
         return "Token limit exceeded"
 
+    def _response_cache_key(
+        self,
+        kind: str,
+        messages: List[dict],
+        temperature: Optional[float],
+        tools: Optional[List[dict]] = None,
+        tool_choice: Any = None,
+        **extra,
+    ) -> Optional[str]:
+        """Cache key for a deterministic request, or None if it must not be cached."""
+        if get_response_cache() is None:
+            return None
+
+        # Only temperature 0 requests are reproducible; reasoning models ignore temperature
+        effective_temperature = temperature if temperature is not None else self.temperature
+        if (
+            effective_temperature is None
+            or effective_temperature > 0
+            or is_reasoning_model(self.model)
+        ):
+            return None
+
+        return LLMResponseCache.make_key(
+            {
+                "kind": kind,
+                "base_url": self.base_url,
+                "model": self.model,
+                "temperature": effective_temperature,
+                "max_tokens": self.max_tokens,
+                "messages": messages,
+                "tools": tools,
+                "tool_choice": tool_choice,
+                **extra,
+            }
+        )
+
+    @staticmethod
+    def _cache_get(cache_key: Optional[str]) -> Optional[Any]:
+        if not cache_key:
+            return None
+        value = get_response_cache().get(cache_key)
+        if value is not None:
+            logger.info("LLM response served from cache")
+        return value
+
+    @staticmethod
+    def _cache_set(cache_key: Optional[str], value: Any) -> None:
+        if cache_key:
+            get_response_cache().set(cache_key, value)
+
+    async def _create_completion(self, params: Dict[str, Any], input_tokens: int):
+        """Non-streaming chat completion admitted by the endpoint rate controller."""
+        async with self.rate_controller.slot(input_tokens):
+            response = await self.client.chat.completions.create(**params)
+        usage = getattr(response, "usage", None)
+        self.rate_controller.record_usage(
+            input_tokens, getattr(usage, "total_tokens", None)
+        )
+        return response
+
     @staticmethod
     def format_messages(messages: List[Union[dict, Message]]) -> List[dict]:
         """
@@ -336,11 +623,11 @@ class LLM:
         return formatted_messages
 
     @retry(
-        wait=wait_random_exponential(min=1, max=60),
+        wait=wait_retry_after(min=1, max=60),
         stop=stop_after_attempt(6),
-        retry=retry_if_exception_type(
-            (OpenAIError, Exception, ValueError)
-        ),  # Don't retry TokenLimitExceeded
+        # Only transient API errors are retried; TokenLimitExceeded, auth and
+        # validation errors fail immediately
+        retry=retry_if_exception(is_transient_llm_error),
     )
     async def ask(
         self,
@@ -368,6 +655,9 @@ class LLM:
             Exception: For unexpected errors
         """
         try:
+            # Calculate input token count from the per-message cached counts
+            input_tokens = self.count_message_tokens(list(system_msgs or []) + list(messages))
+
             # Format system and user messages
             if system_msgs:
                 system_msgs = self.format_messages(system_msgs)
@@ -375,8 +665,10 @@ class LLM:
             else:
                 messages = self.format_messages(messages)
 
-            # Calculate input token count
-            input_tokens = self.count_message_tokens(messages)
+            cache_key = self._response_cache_key("ask", messages, temperature)
+            cached = self._cache_get(cache_key)
+            if cached is not None:
+                return cached
 
             # Check if token limits are exceeded
             if not self.check_token_limit(input_tokens):
@@ -419,14 +711,15 @@ class LLM:
                     logger.info(f"  - Model: {self.model}")
                     logger.info(f"  - Client base_url: {getattr(self.client, '_base_url', 'Unknown')}")
 
-                response = await self.client.chat.completions.create(**params)
+                response = await self._create_completion(params, input_tokens)
 
                 if not response.choices or not response.choices[0].message.content:
-                    raise ValueError("Empty or invalid response from LLM")
+                    raise EmptyLLMResponse("Empty or invalid response from LLM")
 
                 # Update token counts
                 self.update_token_count(response.usage.prompt_tokens)
 
+                self._cache_set(cache_key, response.choices[0].message.content)
                 return response.choices[0].message.content
 
             # Streaming request, For streaming, update estimated token count before making the request
@@ -440,20 +733,22 @@ class LLM:
                 logger.info(f"  - Base URL: {self.base_url}")
                 logger.info(f"  - Model: {self.model}")
                 logger.info(f"  - Client base_url: {getattr(self.client, '_base_url', 'Unknown')}")
-                
-            response = await self.client.chat.completions.create(**params)
 
+            # Hold the request slot until the stream has been consumed
             collected_messages = []
-            async for chunk in response:
-                chunk_message = chunk.choices[0].delta.content or ""
-                collected_messages.append(chunk_message)
-                print(chunk_message, end="", flush=True)
+            async with self.rate_controller.slot(input_tokens):
+                response = await self.client.chat.completions.create(**params)
+                async for chunk in response:
+                    chunk_message = chunk.choices[0].delta.content or ""
+                    collected_messages.append(chunk_message)
+                    print(chunk_message, end="", flush=True)
 
             print()  # Newline after streaming
             full_response = "".join(collected_messages).strip()
             if not full_response:
-                raise ValueError("Empty response from streaming LLM")
+                raise EmptyLLMResponse("Empty response from streaming LLM")
 
+            self._cache_set(cache_key, full_response)
             return full_response
 
         except TokenLimitExceeded:
@@ -476,11 +771,11 @@ class LLM:
             raise
 
     @retry(
-        wait=wait_random_exponential(min=1, max=60),
+        wait=wait_retry_after(min=1, max=60),
         stop=stop_after_attempt(6),
-        retry=retry_if_exception_type(
-            (OpenAIError, Exception, ValueError)
-        ),  # Don't retry TokenLimitExceeded
+        # Only transient API errors are retried; TokenLimitExceeded, auth and
+        # validation errors fail immediately
+        retry=retry_if_exception(is_transient_llm_error),
     )
     async def ask_with_images(
         self,
@@ -554,6 +849,11 @@ class LLM:
             else:
                 all_messages = formatted_messages
 
+            cache_key = self._response_cache_key("ask_with_images", all_messages, temperature)
+            cached = self._cache_get(cache_key)
+            if cached is not None:
+                return cached
+
             # Calculate tokens and check limits
             input_tokens = self.count_message_tokens(all_messages)
             if not self.check_token_limit(input_tokens):
@@ -581,12 +881,13 @@ class LLM:
                 if self.api_type == "ollama":
                     params["stream"] = False
                     
-                response = await self.client.chat.completions.create(**params)
+                response = await self._create_completion(params, input_tokens)
 
                 if not response.choices or not response.choices[0].message.content:
-                    raise ValueError("Empty or invalid response from LLM")
+                    raise EmptyLLMResponse("Empty or invalid response from LLM")
 
                 self.update_token_count(response.usage.prompt_tokens)
+                self._cache_set(cache_key, response.choices[0].message.content)
                 return response.choices[0].message.content
             else:
                 # Handle streaming request - 改善Ollama流式请求处理
@@ -594,20 +895,22 @@ class LLM:
                     params["stream"] = True
                     
                 self.update_token_count(input_tokens)
-                response = await self.client.chat.completions.create(**params)
 
                 collected_messages = []
-                async for chunk in response:
-                    chunk_message = chunk.choices[0].delta.content or ""
-                    collected_messages.append(chunk_message)
-                    print(chunk_message, end="", flush=True)
+                async with self.rate_controller.slot(input_tokens):
+                    response = await self.client.chat.completions.create(**params)
+                    async for chunk in response:
+                        chunk_message = chunk.choices[0].delta.content or ""
+                        collected_messages.append(chunk_message)
+                        print(chunk_message, end="", flush=True)
 
                 print()  # Newline after streaming
                 full_response = "".join(collected_messages).strip()
 
                 if not full_response:
-                    raise ValueError("Empty response from streaming LLM")
+                    raise EmptyLLMResponse("Empty response from streaming LLM")
 
+                self._cache_set(cache_key, full_response)
                 return full_response
 
         except TokenLimitExceeded:
@@ -629,11 +932,11 @@ class LLM:
             raise
 
     @retry(
-        wait=wait_random_exponential(min=1, max=60),
+        wait=wait_retry_after(min=1, max=60),
         stop=stop_after_attempt(6),
-        retry=retry_if_exception_type(
-            (OpenAIError, Exception, ValueError)
-        ),  # Don't retry TokenLimitExceeded
+        # Only transient API errors are retried; TokenLimitExceeded, auth and
+        # validation errors fail immediately
+        retry=retry_if_exception(is_transient_llm_error),
     )
     async def ask_tool(
         self,
@@ -643,6 +946,7 @@ class LLM:
         tools: Optional[List[dict]] = None,
         tool_choice: TOOL_CHOICE_TYPE = ToolChoice.AUTO,  # type: ignore
         temperature: Optional[float] = None,
+        tools_tokens: Optional[int] = None,
         **kwargs,
     ):
         """
@@ -655,6 +959,7 @@ class LLM:
             tools: List of tools to use
             tool_choice: Tool choice strategy
             temperature: Sampling temperature for the response
+            tools_tokens: Precomputed token count of ``tools`` (e.g. from ToolCollection)
             **kwargs: Additional completion arguments
 
         Returns:
@@ -671,6 +976,9 @@ class LLM:
             if tool_choice not in TOOL_CHOICE_VALUES:
                 raise ValueError(f"Invalid tool_choice: {tool_choice}")
 
+            # Calculate input token count from the per-message cached counts
+            input_tokens = self.count_message_tokens(list(system_msgs or []) + list(messages))
+
             # Format messages
             if system_msgs:
                 system_msgs = self.format_messages(system_msgs)
@@ -678,14 +986,9 @@ class LLM:
             else:
                 messages = self.format_messages(messages)
 
-            # Calculate input token count
-            input_tokens = self.count_message_tokens(messages)
-
-            # If there are tools, calculate token count for tool descriptions
-            tools_tokens = 0
-            if tools:
-                for tool in tools:
-                    tools_tokens += self.count_tokens(str(tool))
+            # If there are tools, add token count for tool descriptions
+            if tools_tokens is None:
+                tools_tokens = self.token_counter.count_tools(tools) if tools else 0
 
             input_tokens += tools_tokens
 
@@ -705,6 +1008,13 @@ class LLM:
             if tool_choice == ToolChoice.AUTO and any(keyword in self.base_url.lower() for keyword in ["openrouter", "infini"]):
                 tool_choice = ToolChoice.NONE  # type: ignore
 
+            cache_key = self._response_cache_key(
+                "ask_tool", messages, temperature, tools=tools, tool_choice=tool_choice, **kwargs
+            )
+            cached = self._cache_get(cache_key)
+            if cached is not None:
+                return ChatCompletionMessage.model_validate(cached)
+
             # Set up the completion request
             params = {
                 "model": self.model,
@@ -723,16 +1033,17 @@ class LLM:
                     temperature if temperature is not None else self.temperature
                 )
 
-            response = await self.client.chat.completions.create(**params)
+            response = await self._create_completion(params, input_tokens)
 
             # Check if response is valid
             if not response.choices or not response.choices[0].message:
                 print(response)
-                raise ValueError("Invalid or empty response from LLM")
+                raise EmptyLLMResponse("Invalid or empty response from LLM")
 
             # Update token counts
             self.update_token_count(response.usage.prompt_tokens)
 
+            self._cache_set(cache_key, response.choices[0].message.model_dump())
             return response.choices[0].message
 
         except TokenLimitExceeded:
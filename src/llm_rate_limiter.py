@@ -0,0 +1,346 @@
+"""
+LLM 端点限流控制器
+
+One controller is shared by every LLM instance that talks to the same
+endpoint (base_url + model). It caps in-flight requests, keeps requests and
+tokens inside the configured per-minute quotas, and adapts the concurrency
+limit AIMD-style: a success raises it by 1/limit, a 429 halves it. When the
+provider sends ``Retry-After`` every caller waits until that moment instead
+of retrying on its own schedule.
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import Any, Deque, Dict, Optional, Tuple
+
+import httpx
+from openai import (
+    APIConnectionError,
+    APIStatusError,
+    APITimeoutError,
+    InternalServerError,
+    RateLimitError,
+)
+from tenacity import wait_random_exponential
+
+from src.exceptions import EmptyLLMResponse
+from src.logger import logger
+
+
+# Errors worth retrying; everything else (auth, bad request, validation) fails fast.
+# httpx errors come from the native Ollama client, which does not wrap them.
+TRANSIENT_LLM_ERRORS = (
+    RateLimitError,
+    APIConnectionError,
+    APITimeoutError,
+    InternalServerError,
+    httpx.TransportError,
+    EmptyLLMResponse,
+)
+
+# Status codes worth retrying: request timeout, conflict, rate limit, server errors
+_TRANSIENT_STATUS = (408, 409, 429)
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code
+    if isinstance(error, APIStatusError):
+        return error.status_code
+    return None
+
+
+def is_transient_llm_error(error: BaseException) -> bool:
+    """Whether an LLM call failing with ``error`` should be retried."""
+    if isinstance(error, TRANSIENT_LLM_ERRORS):
+        return True
+    status = _status_code(error)
+    return status is not None and (status in _TRANSIENT_STATUS or status >= 500)
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    return isinstance(error, RateLimitError) or _status_code(error) == 429
+
+
+WINDOW_SECONDS = 60.0
+
+
+def parse_retry_after(error: BaseException) -> Optional[float]:
+    """Seconds to wait according to the Retry-After headers of an API error."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return max(0.0, float(retry_after_ms) / 1000)
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class wait_retry_after(wait_random_exponential):
+    """Tenacity wait honoring Retry-After, with random exponential fallback."""
+
+    def __call__(self, retry_state) -> float:
+        outcome = retry_state.outcome
+        if outcome is not None and outcome.failed:
+            delay = parse_retry_after(outcome.exception())
+            if delay is not None:
+                return min(delay, self.max)
+        return super().__call__(retry_state)
+
+
+class _Waiter:
+    """A caller queued for a slot; woken from any thread or event loop."""
+
+    def __init__(self):
+        self._loop = asyncio.get_running_loop()
+        self._future = self._loop.create_future()
+
+    def wake(self) -> None:
+        future = self._future
+
+        def _set() -> None:
+            if not future.done():
+                future.set_result(None)
+
+        try:
+            self._loop.call_soon_threadsafe(_set)
+        except RuntimeError:
+            # The waiter's loop is closed; nobody is left to wake
+            pass
+
+    async def wait(self, timeout: Optional[float]) -> None:
+        """Until woken (a wake that came in earlier counts) or ``timeout``."""
+        await asyncio.wait({self._future}, timeout=timeout)
+        if self._future.done():
+            self._future = self._loop.create_future()
+
+
+class LLMRateController:
+    """Concurrency, RPM/TPM and backoff control for one LLM endpoint."""
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int = 8,
+        min_concurrency: int = 1,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+    ):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+
+        self._limit = float(self.max_concurrency)
+        self._in_flight = 0
+        self._blocked_until = 0.0
+        self._last_decrease = 0.0
+        self._requests: Deque[float] = deque()
+        self._tokens: Deque[Tuple[float, int]] = deque()
+        self._token_total = 0
+        # Callers waiting for a slot, oldest first
+        self._waiters: Deque[_Waiter] = deque()
+        self._lock = threading.Lock()
+
+        self.total_requests = 0
+        self.rate_limited = 0
+
+    @property
+    def limit(self) -> int:
+        return max(self.min_concurrency, int(self._limit))
+
+    # ------------------------------------------------------------------
+    # Admission
+    # ------------------------------------------------------------------
+    def _prune(self, now: float) -> None:
+        cutoff = now - WINDOW_SECONDS
+        while self._requests and self._requests[0] <= cutoff:
+            self._requests.popleft()
+        while self._tokens and self._tokens[0][0] <= cutoff:
+            self._token_total -= self._tokens.popleft()[1]
+
+    def _try_admit(self, tokens: int, waiter: Optional[_Waiter]) -> Optional[float]:
+        """Admit the caller and return 0, or return how long to wait first.
+
+        None means every slot is taken or earlier callers are queued: the
+        caller waits in FIFO order until a release wakes it.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self._waiters and self._waiters[0] is not waiter:
+                return None
+            if now < self._blocked_until:
+                return self._blocked_until - now
+
+            self._prune(now)
+            if self._in_flight >= self.limit:
+                return None
+            if (
+                self.requests_per_minute
+                and len(self._requests) >= self.requests_per_minute
+            ):
+                return self._requests[0] + WINDOW_SECONDS - now
+            if (
+                self.tokens_per_minute
+                and self._tokens
+                and self._token_total + tokens > self.tokens_per_minute
+            ):
+                return self._tokens[0][0] + WINDOW_SECONDS - now
+
+            self._in_flight += 1
+            self.total_requests += 1
+            self._requests.append(now)
+            if tokens:
+                self._tokens.append((now, tokens))
+                self._token_total += tokens
+            if waiter is not None:
+                self._waiters.popleft()
+                self._wake_next()
+            return 0.0
+
+    def _wake_next(self) -> None:
+        # Called with the lock held: let the oldest waiter retry if a slot is free
+        if self._waiters and self._in_flight < self.limit:
+            self._waiters[0].wake()
+
+    async def acquire(self, tokens: int = 0) -> None:
+        waiter: Optional[_Waiter] = None
+        try:
+            while True:
+                wait = self._try_admit(tokens, waiter)
+                if wait is not None and wait <= 0:
+                    waiter = None
+                    return
+                if waiter is None:
+                    waiter = _Waiter()
+                    with self._lock:
+                        self._waiters.append(waiter)
+                        self._wake_next()
+                # Queue waits end on a wake; RPM/TPM and Retry-After waits are timed
+                await waiter.wait(None if wait is None else min(wait, WINDOW_SECONDS))
+        finally:
+            if waiter is not None:
+                # Cancelled while queued: leave the queue and pass the turn on
+                with self._lock:
+                    self._waiters.remove(waiter)
+                    self._wake_next()
+
+    def release(self) -> None:
+        with self._lock:
+            self._in_flight = max(0, self._in_flight - 1)
+            self._wake_next()
+
+    # ------------------------------------------------------------------
+    # Feedback
+    # ------------------------------------------------------------------
+    def record_usage(self, estimated_tokens: int, actual_tokens: Optional[int]) -> None:
+        """Replace the admission estimate with the tokens the provider billed."""
+        if not actual_tokens or actual_tokens == estimated_tokens:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._tokens.append((now, actual_tokens - estimated_tokens))
+            self._token_total += actual_tokens - estimated_tokens
+
+    def on_success(self) -> None:
+        with self._lock:
+            if self._limit < self.max_concurrency:
+                self._limit = min(self.max_concurrency, self._limit + 1 / self._limit)
+                self._wake_next()
+
+    def on_rate_limited(self, error: BaseException) -> None:
+        retry_after = parse_retry_after(error)
+        with self._lock:
+            now = time.monotonic()
+            self.rate_limited += 1
+            # One 429 burst from parallel callers counts as a single congestion signal
+            if now - self._last_decrease >= 1.0:
+                self._limit = max(self.min_concurrency, self._limit / 2)
+                self._last_decrease = now
+            if retry_after:
+                self._blocked_until = max(self._blocked_until, now + retry_after)
+            limit = self.limit
+        logger.warning(
+            f"LLM endpoint {self.name} rate limited; concurrency limit -> {limit}"
+            + (f", pausing {retry_after:.1f}s" if retry_after else "")
+        )
+
+    @asynccontextmanager
+    async def slot(self, tokens: int = 0):
+        """Hold one request slot for the duration of the block."""
+        await self.acquire(tokens)
+        try:
+            yield self
+        except Exception as e:
+            if is_rate_limit_error(e):
+                self.on_rate_limited(e)
+            raise
+        else:
+            self.on_success()
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._prune(time.monotonic())
+            return {
+                "endpoint": self.name,
+                "concurrency_limit": self.limit,
+                "in_flight": self._in_flight,
+                "requests_last_minute": len(self._requests),
+                "tokens_last_minute": self._token_total,
+                "total_requests": self.total_requests,
+                "rate_limited": self.rate_limited,
+            }
+
+
+_controllers: Dict[str, LLMRateController] = {}
+_controllers_lock = threading.Lock()
+
+
+def get_rate_controller(
+    base_url: str,
+    model: str,
+    max_concurrency: int = 8,
+    requests_per_minute: Optional[int] = None,
+    tokens_per_minute: Optional[int] = None,
+) -> LLMRateController:
+    """Return the controller shared by every LLM using this endpoint and model."""
+    name = f"{base_url.rstrip('/')}#{model}"
+    with _controllers_lock:
+        controller = _controllers.get(name)
+        if controller is None:
+            controller = _controllers[name] = LLMRateController(
+                name,
+                max_concurrency=max_concurrency,
+                requests_per_minute=requests_per_minute,
+                tokens_per_minute=tokens_per_minute,
+            )
+        return controller
+
+
+def rate_controller_stats() -> Dict[str, Dict[str, Any]]:
+    with _controllers_lock:
+        controllers = list(_controllers.values())
+    return {c.name: c.stats() for c in controllers}
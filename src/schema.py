@@ -1,7 +1,7 @@
 from enum import Enum
-from typing import Any, List, Literal, Optional, Union
+from typing import Any, Dict, List, Literal, Optional, Union
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 
 
 class Role(str, Enum):
@@ -61,6 +61,33 @@ class Message(BaseModel):
     tool_call_id: Optional[str] = Field(default=None)
     base64_image: Optional[str] = Field(default=None)
 
+    # Token counts per tokenizer, computed once and dropped when a field changes
+    _token_counts: Dict[str, int] = PrivateAttr(default_factory=dict)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        super().__setattr__(name, value)
+        if not name.startswith("_"):
+            self._token_counts.clear()
+
+    def token_count(self, counter: Any) -> int:
+        """Tokens this message contributes to a request, cached per tokenizer.
+
+        ``counter`` is an LLM TokenCounter (anything with ``name`` and
+        ``count_message``). The count is taken on ``to_dict()``, the payload
+        LLM.format_messages sends, images included. The cache is dropped when
+        a field is assigned; fields edited in place (e.g. appending to
+        ``tool_calls``) must be reassigned to refresh it.
+        """
+        cached = self._token_counts.get(counter.name)
+        if cached is None:
+            message = self.to_dict()
+            if "content" in message or "tool_calls" in message:
+                cached = counter.count_message(message)
+            else:
+                cached = 0  # LLM.format_messages drops such messages
+            self._token_counts[counter.name] = cached
+        return cached
+
     def __add__(self, other) -> List["Message"]:
         """支持 Message + list 或 Message + Message 的操作"""
         if isinstance(other, list):
@@ -164,32 +191,221 @@ class Message(BaseModel):
         )
 
 
+SUMMARY_PREFIX = "[Earlier conversation summary]"
+
+
+def _tool_call_name(tool_call: Any) -> str:
+    if isinstance(tool_call, dict):
+        return tool_call.get("function", {}).get("name", "")
+    function = getattr(tool_call, "function", None)
+    return getattr(function, "name", "") or ""
+
+
 class Memory(BaseModel):
     messages: List[Message] = Field(default_factory=list)
     max_messages: int = Field(default=100)
+    # Blocks placed ahead of the conversation and never compacted, keyed by name
+    pinned: Dict[str, Message] = Field(default_factory=dict)
+    # Owning agent's LLM TokenCounter; messages are counted once as they are added
+    token_counter: Optional[Any] = Field(default=None, exclude=True)
 
     def add_message(self, message: Message) -> None:
         """Add a message to memory"""
+        if self.token_counter is not None:
+            message.token_count(self.token_counter)
         self.messages.append(message)
-        # Optional: Implement message limit
-        if len(self.messages) > self.max_messages:
-            self.messages = self.messages[-self.max_messages :]
+        self._enforce_max_messages()
 
     def add_messages(self, messages: List[Message]) -> None:
         """Add multiple messages to memory"""
+        if self.token_counter is not None:
+            for message in messages:
+                message.token_count(self.token_counter)
         self.messages.extend(messages)
-        # Optional: Implement message limit
+        self._enforce_max_messages()
+
+    def _enforce_max_messages(self) -> None:
+        """Trim to max_messages without leaving tool results whose call was cut."""
         if len(self.messages) > self.max_messages:
-            self.messages = self.messages[-self.max_messages :]
+            messages = self.messages[-self.max_messages :]
+            while messages and messages[0].role == Role.TOOL:
+                messages.pop(0)
+            self.messages = messages
+
+    def pin(self, key: str, message: Message) -> None:
+        """Pin a block (e.g. the research digest); a later pin with the same key replaces it."""
+        if self.token_counter is not None:
+            message.token_count(self.token_counter)
+        self.pinned[key] = message
 
     def clear(self) -> None:
         """Clear all messages"""
         self.messages.clear()
+        self.pinned.clear()
 
     def get_recent_messages(self, n: int) -> List[Message]:
         """Get n most recent messages"""
         return self.messages[-n:]
 
+    def prompt_messages(self) -> List[Message]:
+        """Messages to send to the LLM: pinned blocks followed by the conversation."""
+        return list(self.pinned.values()) + self.messages
+
+    def token_count(self) -> int:
+        """Total tokens of the pinned blocks and messages, summed from per-message counts."""
+        if self.token_counter is None:
+            return 0
+        return sum(
+            msg.token_count(self.token_counter) for msg in self.prompt_messages()
+        )
+
+    @staticmethod
+    def _group_turns(messages: List[Message]) -> List[List[Message]]:
+        """Group an assistant tool-call message with its tool results so they stay together."""
+        turns: List[List[Message]] = []
+        for message in messages:
+            if (
+                message.role == Role.TOOL
+                and turns
+                and turns[-1][0].role == Role.ASSISTANT
+                and turns[-1][0].tool_calls
+            ):
+                turns[-1].append(message)
+            else:
+                turns.append([message])
+        return turns
+
+    @staticmethod
+    def _excerpt(turn: List[Message], max_chars: int) -> str:
+        parts = []
+        for message in turn:
+            text = " ".join((message.content or "").split())
+            if len(text) > max_chars:
+                text = text[:max_chars] + "..."
+            if message.tool_calls:
+                calls = ", ".join(_tool_call_name(call) for call in message.tool_calls)
+                text = f"{text} [tools: {calls}]".strip()
+            if text:
+                parts.append(f"{message.name or message.role}: {text}")
+        return " | ".join(parts)
+
+    @staticmethod
+    def _protected_turns(turns: List[List[Message]]) -> set:
+        """Turns never folded: system messages, the first user message (the
+        task) and the latest tool-call turn with its results."""
+        protected = {i for i, turn in enumerate(turns) if turn[0].role == Role.SYSTEM}
+        first_user = next(
+            (i for i, turn in enumerate(turns) if turn[0].role == Role.USER), None
+        )
+        if first_user is not None:
+            protected.add(first_user)
+        last_tool = next(
+            (
+                i
+                for i in range(len(turns) - 1, -1, -1)
+                if turns[i][0].tool_calls and len(turns[i]) > 1
+            ),
+            None,
+        )
+        if last_tool is not None:
+            protected.add(last_tool)
+        return protected
+
+    def compact(
+        self,
+        token_budget: int,
+        summary_max_tokens: int = 2000,
+        excerpt_chars: int = 160,
+    ) -> Optional[Dict[str, int]]:
+        """Keep pinned blocks and messages within ``token_budget`` tokens.
+
+        The most recent turns are kept verbatim; older turns are replaced by a
+        single summary message of one excerpt line per turn, newest lines
+        first in priority. Pinned blocks, system messages, the first user
+        message and the latest tool-call turn are never folded. Tool calls and
+        their results are kept or dropped together. Returns before/after token
+        counts, or None if nothing changed (also when no token counter is
+        attached).
+        """
+        counter = self.token_counter
+        if counter is None or not token_budget:
+            return None
+
+        before = self.token_count()
+        if before <= token_budget:
+            return None
+
+        turns: List[List[Message]] = []
+        summary_lines: List[str] = []
+        for turn in self._group_turns(self.messages):
+            content = turn[0].content or ""
+            if turn[0].role == Role.USER and content.startswith(SUMMARY_PREFIX):
+                summary_lines = content.splitlines()[1:]
+            else:
+                turns.append(turn)
+
+        def turn_tokens(turn: List[Message]) -> int:
+            return sum(msg.token_count(counter) for msg in turn)
+
+        protected = self._protected_turns(turns)
+        pinned_tokens = sum(msg.token_count(counter) for msg in self.pinned.values())
+        available = (
+            token_budget
+            - pinned_tokens
+            - summary_max_tokens
+            - sum(turn_tokens(turns[i]) for i in protected)
+        )
+
+        # Keep the newest turns that fit; the latest turn is always kept
+        kept = set(protected)
+        used = 0
+        for i in range(len(turns) - 1, -1, -1):
+            if i in protected:
+                continue
+            tokens = turn_tokens(turns[i])
+            if i < len(turns) - 1 and used + tokens > available:
+                break
+            kept.add(i)
+            used += tokens
+
+        # A tool result without its call cannot be sent on its own
+        kept = {i for i in kept if i in protected or turns[i][0].role != Role.TOOL}
+        elided = [i for i in range(len(turns)) if i not in kept]
+        if not elided:
+            return None
+
+        summary_lines += [
+            line
+            for line in (self._excerpt(turns[i], excerpt_chars) for i in elided)
+            if line
+        ]
+        line_budget = summary_max_tokens - counter.count_message(
+            {"role": Role.USER.value, "content": SUMMARY_PREFIX}
+        )
+        selected: List[str] = []
+        for line in reversed(summary_lines):
+            line_budget -= counter.count_text(line) + 1
+            if line_budget < 0:
+                break
+            selected.append(line)
+        selected.reverse()
+
+        # The summary takes the place of the first folded turn
+        summary = Message.user_message("\n".join([SUMMARY_PREFIX] + selected))
+        summary.token_count(counter)
+        messages: List[Message] = []
+        for i, turn in enumerate(turns):
+            if i == elided[0]:
+                messages.append(summary)
+            if i in kept:
+                messages.extend(turn)
+        self.messages = messages
+        return {
+            "before": before,
+            "after": self.token_count(),
+            "elided_turns": len(elided),
+        }
+
     def to_dict_list(self) -> List[dict]:
         """Convert messages to list of dicts"""
         return [msg.to_dict() for msg in self.messages]
@@ -1,9 +1,10 @@
 from typing import Any, Dict
-import time
-import pandas as pd  # type: ignore
 
 from src.logger import logger
 from src.tool.base import BaseTool, ToolResult
+from src.tool.big_deal_engine import big_deal_engine
+from src.tool.executor import data_executor
+from src.tool.market_data import fund_flow_rank, stock_hist
 
 try:
     import akshare as ak  # type: ignore
@@ -67,68 +68,26 @@ class BigDealAnalysisTool(BaseTool):
         try:
             result: Dict[str, Any] = {}
 
-            def _with_retry(func, *args, **kwargs):
-                """Simple retry wrapper for unstable akshare endpoints."""
-                for attempt in range(1, max_retry + 1):
-                    try:
-                        return func(*args, **kwargs)
-                    except Exception as e:
-                        if attempt >= max_retry:
-                            raise
-                        logger.warning(f"{func.__name__} attempt {attempt} failed: {e}. Retrying...")
-                        time.sleep(sleep_seconds)
-
-            def _safe_fetch(func, *args, **kwargs):
-                """Fetch data with retries; return None on ultimate failure instead of raising."""
-                try:
-                    return _with_retry(func, *args, **kwargs)
-                except Exception as e:
-                    logger.warning(f"{func.__name__} failed after {max_retry} attempts: {e}")
-                    return None
-
-            # Market wide big deal flow (逐笔大单)
-            df_bd = _safe_fetch(ak.stock_fund_flow_big_deal)
-            if df_bd is not None and not df_bd.empty:
-                # 清洗数字列
-                def _to_float(series):
-                    return (
-                        series.astype(str)
-                        .str.replace(",", "", regex=False)
-                        .str.replace("亿", "e8")  # unlikely present here
-                        .str.replace("万", "e4")
-                        .str.extract(r"([\d\.-eE]+)")[0]
-                        .astype(float)
-                    )
-
-                if df_bd["成交额"].dtype == "O":
-                    df_bd["成交额"] = _to_float(df_bd["成交额"])
-
-                # 计算买盘/卖盘汇总
-                inflow = df_bd[df_bd["大单性质"] == "买盘"]["成交额"].sum()
-                outflow = df_bd[df_bd["大单性质"] == "卖盘"]["成交额"].sum()
-                result["market_summary"] = {
-                    "total_inflow_wan": round(inflow, 2),
-                    "total_outflow_wan": round(outflow, 2),
-                    "net_inflow_wan": round(inflow - outflow, 2),
-                }
-
-                # 按净额排序股票
-                grouped = (
-                    df_bd.groupby(["股票代码", "股票简称", "大单性质"])["成交额"].sum().reset_index()
+            async def _safe_fetch(func, *args, **kwargs):
+                """Fetch data off the event loop with retries; return None on ultimate failure."""
+                return await data_executor.run_safe(
+                    func, *args, retries=max_retry, backoff=sleep_seconds, **kwargs
                 )
-                buy_df = grouped[grouped["大单性质"] == "买盘"].sort_values("成交额", ascending=False)
-                sell_df = grouped[grouped["大单性质"] == "卖盘"].sort_values("成交额", ascending=False)
 
-                result["top_inflow"] = buy_df.head(top_n).to_dict(orient="records")
-                result["top_outflow"] = sell_df.head(top_n).to_dict(orient="records")
+            # Market wide big deal flow (逐笔大单)，只解析新增的逐笔记录
+            tick_count = await _safe_fetch(big_deal_engine.refresh)
+            if tick_count:
+                result["market_summary"] = big_deal_engine.market_summary()
+                result["top_inflow"] = big_deal_engine.top("买盘", top_n)
+                result["top_outflow"] = big_deal_engine.top("卖盘", top_n)
 
                 # 保存部分原始逐笔记录以备调试（最多 top_n 条）
-                result["market_big_deal_samples"] = df_bd.head(top_n).to_dict(orient="records")
+                result["market_big_deal_samples"] = big_deal_engine.latest_ticks(top_n)
             else:
                 result["market_big_deal_samples"] = []
 
             # Individual fund flow rank 使用 stock_fund_flow_individual(symbol)
-            individual_rank = _safe_fetch(ak.stock_fund_flow_individual, symbol=rank_symbol)
+            individual_rank = await _safe_fetch(fund_flow_rank, symbol=rank_symbol)
 
             # 默认返回排行榜前 top_n 条
             result["individual_rank_top"] = (
@@ -147,41 +106,21 @@ class BigDealAnalysisTool(BaseTool):
 
             if stock_code:
                 # Stock specific fund flow trend 使用 stock_individual_fund_flow
-                individual_flow = _safe_fetch(ak.stock_individual_fund_flow, stock=stock_code)
+                individual_flow = await _safe_fetch(ak.stock_individual_fund_flow, stock=stock_code)
                 result["stock_fund_flow"] = (
                     individual_flow.to_dict(orient="records") if individual_flow is not None else []
                 )
 
                 # Historical price data for correlation
-                hist_price = _safe_fetch(ak.stock_zh_a_hist, symbol=stock_code, period="daily")
+                hist_price = await _safe_fetch(stock_hist, symbol=stock_code, period="daily", count=120)
                 if hist_price is not None:
-                    result["stock_price_hist"] = hist_price.tail(120).to_dict(orient="records")
+                    result["stock_price_hist"] = hist_price.to_dict(orient="records")
                 else:
                     result["stock_price_hist"] = []
 
-                # 1. 先整体抓取逐笔大单
-                # 复用已获取的 df_bd，若为空再尝试一次
-                if df_bd is None:
-                    df_bd = _safe_fetch(ak.stock_fund_flow_big_deal)
-
-                stk_df = pd.DataFrame()
-                if df_bd is not None and not df_bd.empty:
-                    stk_df = df_bd[df_bd["股票代码"] == stock_code]
-
-                if not stk_df.empty:
-                    inflow = stk_df[stk_df["大单性质"] == "买盘"]["成交额"].sum()
-                    outflow = stk_df[stk_df["大单性质"] == "卖盘"]["成交额"].sum()
-
-                    result["stock_big_deal_summary"] = {
-                        "inflow_wan": round(inflow, 2),
-                        "outflow_wan": round(outflow, 2),
-                        "net_inflow_wan": round(inflow - outflow, 2),
-                        "trade_count": len(stk_df),
-                    }
-                    result["stock_big_deal_samples"] = stk_df.head(top_n).to_dict(orient="records")
-                else:
-                    result["stock_big_deal_summary"] = {}
-                    result["stock_big_deal_samples"] = []
+                # 个股逐笔大单汇总直接取自聚合引擎的累计值和行区间索引
+                result["stock_big_deal_summary"] = big_deal_engine.stock_summary(stock_code)
+                result["stock_big_deal_samples"] = big_deal_engine.stock_ticks(stock_code, top_n)
 
             return ToolResult(output=result)
         except Exception as e:
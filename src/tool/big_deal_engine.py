@@ -0,0 +1,293 @@
+"""
+大单成交聚合引擎
+
+Keeps the market-wide big-deal tape (``ak.stock_fund_flow_big_deal``) parsed
+once with numeric dtypes, together with per-stock running sums of buy and
+sell amounts. Ticks are held sorted by stock and time, newest first, with a
+code -> row range index, so a stock's summary or latest ticks are an O(1)
+lookup instead of a scan over the whole tape, and the market top-N comes
+from the per-stock aggregates.
+
+Every refresh only parses and adds the ticks newer than the last one seen;
+a new trading day starts over. A batch run serves the tape from its
+market-wide snapshot, so all its stocks share one download and one parse.
+"""
+
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.logger import logger
+from src.tool.market_data import market_big_deal
+
+
+SIDES = {"买盘": 1, "卖盘": -1}
+NUMERIC_COLUMNS = ("成交价格", "成交量", "成交额", "涨跌幅", "涨跌额")
+# Helper columns kept next to the feed columns, left out of output records
+_TIME, _CODE_ID = "_time", "_code_id"
+_UNITS = {"亿": 1e8, "万": 1e4, "%": 1.0}
+
+
+def _to_number(series: pd.Series) -> pd.Series:
+    """Numeric column; text like '1,234.5', '1.2万' or '3.5%' is converted once, vectorized."""
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype(float)
+    numbers = pd.to_numeric(series, errors="coerce").astype(float)
+    dirty = numbers.isna() & series.notna()
+    if not dirty.any():
+        return numbers
+    # Only the values that are not plain numbers go through the string cleaning
+    text = series[dirty].astype(str).str.replace(",", "", regex=False).str.strip()
+    factor = pd.Series(1.0, index=text.index)
+    for unit, scale in _UNITS.items():
+        has_unit = text.str.endswith(unit)
+        factor[has_unit] = scale
+        text = text.str.removesuffix(unit)
+    numbers[dirty] = pd.to_numeric(text, errors="coerce") * factor
+    return numbers
+
+
+class BigDealEngine:
+    """Incremental per-stock aggregates over the big-deal tape."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._source: Optional[pd.DataFrame] = None
+        self._reset()
+
+    def _reset(self) -> None:
+        self._day: Optional[np.datetime64] = None
+        self._last_time = np.iinfo(np.int64).min
+        self._last_keys: Counter = Counter()
+        # Feed columns as NumPy arrays, grouped by stock, newest first
+        self._fields: List[str] = []
+        self._columns: Dict[str, np.ndarray] = {}
+        # code -> id, and per id: name, buy/sell amount and tick counts
+        self._code_ids: Dict[str, int] = {}
+        self._codes: List[str] = []
+        self._names: List[str] = []
+        self._amounts = np.zeros((0, 2))
+        self._counts = np.zeros((0, 2), dtype=np.int64)
+        self._totals = np.zeros(0, dtype=np.int64)
+        # Rows of code id i in ``_ticks``: offsets[i]:offsets[i + 1]
+        self._offsets = np.zeros(1, dtype=np.int64)
+
+    @property
+    def tick_count(self) -> int:
+        return len(self._columns.get(_TIME, ()))
+
+    def _records(self, rows: Any) -> List[Dict[str, Any]]:
+        values = [self._columns[field][rows].tolist() for field in self._fields]
+        return [dict(zip(self._fields, row)) for row in zip(*values)]
+
+    # ------------------------------------------------------------------
+    # Updates
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _tick_keys(df: pd.DataFrame) -> List[tuple]:
+        """Identity of ticks sharing a timestamp, on the parsed values."""
+        values = [
+            _to_number(df[column]) for column in ("成交价格", "成交量", "成交额") if column in df
+        ]
+        return list(zip(df["股票代码"].astype(str), df["大单性质"], *values))
+
+    def _new_rows(self, df: pd.DataFrame, times: np.ndarray) -> np.ndarray:
+        """Mask of ticks not seen yet: newer than the last one, or unseen at its time."""
+        mask = times > self._last_time
+        at_last = np.flatnonzero(times == self._last_time)
+        if len(at_last):
+            seen = Counter(self._last_keys)
+            for row, key in zip(at_last, self._tick_keys(df.iloc[at_last])):
+                if seen[key] > 0:
+                    seen[key] -= 1
+                else:
+                    mask[row] = True
+        return mask
+
+    def update(self, feed: Optional[pd.DataFrame]) -> int:
+        """Add the ticks of ``feed`` not seen yet; returns how many were added."""
+        with self._lock:
+            if feed is None or feed.empty or feed is self._source:
+                return 0
+            self._source = feed
+
+            times = pd.to_datetime(feed["成交时间"], errors="coerce").to_numpy(
+                "datetime64[ns]"
+            )
+            valid = ~np.isnat(times)
+            if not valid.any():
+                return 0
+            day = times[valid].max().astype("datetime64[D]")
+            if day != self._day:
+                self._reset()
+                self._day = day
+            times = times.astype(np.int64)
+
+            new = (
+                self._new_rows(feed, times)
+                & valid
+                & (times.astype("datetime64[ns]").astype("datetime64[D]") == day)
+            )
+            if not new.any():
+                return 0
+
+            ticks = feed.loc[new].reset_index(drop=True)
+            for column in NUMERIC_COLUMNS:
+                if column in ticks.columns:
+                    ticks[column] = _to_number(ticks[column])
+            ticks["股票代码"] = ticks["股票代码"].astype(str)
+            ticks[_TIME] = times[new]
+            ticks[_CODE_ID] = self._assign_ids(ticks)
+            self._accumulate(ticks)
+
+            newest = ticks[_TIME].max()
+            if newest > self._last_time:
+                self._last_time, self._last_keys = newest, Counter()
+            self._last_keys.update(
+                self._tick_keys(ticks[ticks[_TIME] == self._last_time])
+            )
+            return len(ticks)
+
+    def _assign_ids(self, ticks: pd.DataFrame) -> np.ndarray:
+        names = (
+            ticks.groupby("股票代码", sort=False)["股票简称"].first()
+            if "股票简称" in ticks
+            else None
+        )
+        for code in ticks["股票代码"].unique():
+            if code not in self._code_ids:
+                self._code_ids[code] = len(self._codes)
+                self._codes.append(code)
+                self._names.append("")
+            if names is not None:
+                self._names[self._code_ids[code]] = names[code]
+        return ticks["股票代码"].map(self._code_ids).to_numpy(dtype=np.int64)
+
+    def _accumulate(self, ticks: pd.DataFrame) -> None:
+        size = len(self._codes)
+        grow = size - len(self._totals)
+        if grow:
+            self._amounts = np.vstack([self._amounts, np.zeros((grow, 2))])
+            self._counts = np.vstack(
+                [self._counts, np.zeros((grow, 2), dtype=np.int64)]
+            )
+            self._totals = np.concatenate(
+                [self._totals, np.zeros(grow, dtype=np.int64)]
+            )
+
+        # Running sums over the new ticks only
+        ids = ticks[_CODE_ID].to_numpy()
+        side = ticks["大单性质"].map(SIDES).fillna(0).to_numpy()
+        amount = np.nan_to_num(ticks["成交额"].to_numpy(dtype=float))
+        for column, flag in enumerate((1, -1)):
+            selected = side == flag
+            self._amounts[:, column] += np.bincount(
+                ids[selected], amount[selected], minlength=size
+            )
+            self._counts[:, column] += np.bincount(ids[selected], minlength=size)
+        self._totals += np.bincount(ids, minlength=size)
+
+        # Keep ticks grouped by stock, newest first, and rebuild the row ranges
+        if not self._fields:
+            self._fields = [
+                column for column in ticks.columns if column not in (_TIME, _CODE_ID)
+            ]
+        columns = {
+            name: np.concatenate([self._columns[name], ticks[name].to_numpy()])
+            if name in self._columns
+            else ticks[name].to_numpy()
+            for name in (*self._fields, _TIME, _CODE_ID)
+        }
+        order = np.lexsort((-columns[_TIME], columns[_CODE_ID]))
+        self._columns = {name: values[order] for name, values in columns.items()}
+        self._offsets = np.searchsorted(self._columns[_CODE_ID], np.arange(size + 1))
+
+    def refresh(self) -> int:
+        """Pull the current tape (snapshot or cached fetch) and add its new ticks."""
+        added = self.update(market_big_deal(copy=False))
+        if added:
+            logger.info(
+                f"Big deal engine: {added} new ticks, {self.tick_count} in total"
+            )
+        return self.tick_count
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+    def market_summary(self) -> Dict[str, float]:
+        with self._lock:
+            inflow, outflow = (
+                self._amounts.sum(axis=0) if len(self._amounts) else (0.0, 0.0)
+            )
+            return {
+                "total_inflow_wan": round(float(inflow), 2),
+                "total_outflow_wan": round(float(outflow), 2),
+                "net_inflow_wan": round(float(inflow - outflow), 2),
+            }
+
+    def top(self, side: str, n: int) -> List[Dict[str, Any]]:
+        """Stocks with the largest buy or sell amount, from the aggregates."""
+        with self._lock:
+            column = 0 if SIDES[side] > 0 else 1
+            candidates = np.flatnonzero(self._counts[:, column] > 0)
+            if n <= 0 or not len(candidates):
+                return []
+            amounts = self._amounts[candidates, column]
+            if len(candidates) > n:
+                part = np.argpartition(-amounts, n - 1)[:n]
+                candidates, amounts = candidates[part], amounts[part]
+            order = np.argsort(-amounts, kind="stable")
+            return [
+                {
+                    "股票代码": self._codes[i],
+                    "股票简称": self._names[i],
+                    "大单性质": side,
+                    "成交额": float(self._amounts[i, column]),
+                }
+                for i in candidates[order]
+            ]
+
+    def latest_ticks(self, n: int) -> List[Dict[str, Any]]:
+        """The newest ticks of the whole market."""
+        with self._lock:
+            if not self.tick_count or n <= 0:
+                return []
+            times = self._columns[_TIME]
+            rows = np.argpartition(-times, min(n, len(times)) - 1)[:n]
+            return self._records(rows[np.argsort(-times[rows], kind="stable")])
+
+    def _range(self, stock_code: str) -> Optional[slice]:
+        code_id = self._code_ids.get(stock_code)
+        if code_id is None or code_id + 1 >= len(self._offsets):
+            return None
+        return slice(int(self._offsets[code_id]), int(self._offsets[code_id + 1]))
+
+    def stock_summary(self, stock_code: str) -> Dict[str, Any]:
+        with self._lock:
+            code_id = self._code_ids.get(stock_code)
+            if code_id is None:
+                return {}
+            inflow, outflow = self._amounts[code_id]
+            return {
+                "inflow_wan": round(float(inflow), 2),
+                "outflow_wan": round(float(outflow), 2),
+                "net_inflow_wan": round(float(inflow - outflow), 2),
+                "trade_count": int(self._totals[code_id]),
+            }
+
+    def stock_ticks(self, stock_code: str, n: int) -> List[Dict[str, Any]]:
+        """The newest ticks of one stock, read from its row range."""
+        with self._lock:
+            rows = self._range(stock_code)
+            if rows is None:
+                return []
+            return self._records(
+                slice(rows.start, min(rows.stop, rows.start + max(n, 0)))
+            )
+
+
+# 全局大单聚合引擎实例
+big_deal_engine = BigDealEngine()
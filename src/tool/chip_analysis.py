@@ -10,6 +10,14 @@ import pandas as pd
 
 from src.logger import logger
 from src.tool.base import BaseTool, ToolResult, get_recent_trading_day
+from src.tool.chip_engine import chip_history, chip_peak, trapped_zones
+from src.tool.executor import data_executor
+from src.tool.market_data import stock_hist
+from src.tool.spot_snapshot import spot_snapshot
+
+
+# 计算筹码分布使用的日线历史（自然日，约250个交易日）
+CHIP_HISTORY_DAYS = 365
 
 
 class ChipAnalysisTool(BaseTool):
@@ -50,7 +58,7 @@ class ChipAnalysisTool(BaseTool):
             logger.info(f"开始筹码分析: {stock_code}")
             
             # 获取筹码分布数据
-            chip_data = await self._get_chip_distribution(stock_code, adjust)
+            chip_data = await self._get_chip_distribution(stock_code, adjust, analysis_days)
             if not chip_data:
                 return ToolResult(error=f"无法获取股票 {stock_code} 的筹码分布数据")
             
@@ -78,7 +86,9 @@ class ChipAnalysisTool(BaseTool):
             logger.error(error_msg)
             return ToolResult(error=error_msg)
 
-    async def _get_chip_distribution(self, stock_code: str, adjust: str) -> Optional[Dict]:
+    async def _get_chip_distribution(
+        self, stock_code: str, adjust: str, analysis_days: int = 5
+    ) -> Optional[Dict]:
         """获取筹码分布数据"""
         try:
             # 确保股票代码格式正确 - 移除任何市场前缀
@@ -86,78 +96,61 @@ class ChipAnalysisTool(BaseTool):
             if stock_code.startswith(('sh', 'sz')):
                 clean_code = stock_code[2:]
             
-            logger.info(f"尝试获取筹码分布数据: {clean_code}")
+            # 输出最近的交易日（至少5天），用于趋势分析
+            record_days = max(analysis_days, 5)
             
-            # 方法1: 尝试使用原始API - 只获取最近5个交易日
+            # 方法1: 用一年日线历史计算换手率衰减筹码分布（与东方财富筹码分布算法一致）
             try:
-                df = ak.stock_cyq_em(symbol=clean_code, adjust=adjust)
-                if df is not None and not df.empty:
-                    # 只保留最近5个交易日的数据
-                    recent_df = df.tail(5)
-                    logger.info(f"成功获取筹码分布数据: {clean_code}, 原始数据行数: {len(df)}, 保留最近5天: {len(recent_df)}")
+                logger.info(f"使用日线历史计算筹码分布: {clean_code}")
+                recent_trading_day = datetime.strptime(get_recent_trading_day(), "%Y-%m-%d")
+                end_date = recent_trading_day.strftime("%Y%m%d")
+                start_date = (recent_trading_day - timedelta(days=CHIP_HISTORY_DAYS)).strftime("%Y%m%d")
+                
+                hist_df = await data_executor.run(stock_hist, symbol=clean_code, period="daily",
+                                                  start_date=start_date, end_date=end_date, adjust=adjust)
+                
+                if hist_df is not None and not hist_df.empty:
+                    stats_df, chip_result = chip_history(hist_df, record_days=record_days)
+                    last_close = float(hist_df["收盘"].iloc[-1])
                     
                     chip_data = {
-                        "date": recent_df.index.strftime("%Y-%m-%d").tolist() if hasattr(recent_df.index, 'strftime') else [],
-                        "chip_distribution": recent_df.to_dict('records'),
-                        "data_source": "stock_cyq_em",
-                        "data_range": "recent_5_days"
+                        "date": [str(d) for d in stats_df["日期"]],
+                        "chip_distribution": self._chip_records(stats_df),
+                        "chip_peak": chip_peak(chip_result),
+                        "trapped_zones": trapped_zones(chip_result, last_close),
+                        "data_source": "chip_engine",
+                        "data_range": f"{len(hist_df)}_trading_days",
                     }
+                    logger.info(f"筹码分布计算完成: {clean_code}, 历史交易日: {len(hist_df)}")
                     return chip_data
+                    
             except Exception as e:
-                logger.warning(f"stock_cyq_em失败: {clean_code}, 错误: {str(e)}")
+                logger.warning(f"日线历史筹码计算失败: {clean_code}, 错误: {str(e)}")
             
-            # 方法2: 尝试替代方案 - 使用历史行情数据估算筹码分布
+            # 方法2: 使用东方财富筹码分布接口（输出字段与方法1相同）
             try:
-                logger.info(f"尝试使用历史行情数据估算筹码分布: {clean_code}")
-                
-                # 使用动态日期范围 - 获取最近10个交易日的数据（保证有足够数据）
-                from datetime import datetime, timedelta
-                recent_trading_day = datetime.strptime(get_recent_trading_day(), "%Y-%m-%d")
-                end_date = recent_trading_day.strftime("%Y%m%d")
-                start_date = (recent_trading_day - timedelta(days=15)).strftime("%Y%m%d")  # 15天前保证有足够交易日
-                
-                hist_df = ak.stock_zh_a_hist(symbol=clean_code, period="daily", 
-                                           start_date=start_date, end_date=end_date, adjust="qfq")
-                
-                if hist_df is not None and not hist_df.empty:
-                    # 只使用最近5个交易日的数据
-                    recent_data = hist_df.tail(5)
-                    
-                    # 简单的筹码分布估算
-                    chip_distribution = []
-                    for _, row in recent_data.iterrows():
-                        chip_info = {
-                            "日期": row["日期"],
-                            "价格": row["收盘"],
-                            "成交量": row["成交量"],
-                            "成交额": row["成交额"],
-                            "筹码比例": min(row["换手率"] * 0.1, 10.0) if "换手率" in row else 1.0  # 估算筹码比例
-                        }
-                        chip_distribution.append(chip_info)
+                df = await data_executor.run(ak.stock_cyq_em, symbol=clean_code, adjust=adjust)
+                if df is not None and not df.empty:
+                    recent_df = df.tail(record_days)
+                    logger.info(f"成功获取筹码分布数据: {clean_code}, 原始数据行数: {len(df)}, 保留最近{len(recent_df)}天")
                     
                     chip_data = {
-                        "date": recent_data["日期"].tolist(),
-                        "chip_distribution": chip_distribution,
-                        "data_source": "estimated_from_hist",
-                        "data_range": "recent_5_days"
+                        "date": [str(d) for d in recent_df["日期"]],
+                        "chip_distribution": self._chip_records(recent_df),
+                        "data_source": "stock_cyq_em",
+                        "data_range": f"recent_{len(recent_df)}_days"
                     }
-                    logger.info(f"成功使用历史数据估算筹码分布: {clean_code}, 数据时间范围: {recent_data['日期'].min()} 到 {recent_data['日期'].max()}")
                     return chip_data
-                    
             except Exception as e:
-                logger.warning(f"历史行情数据获取失败: {clean_code}, 错误: {str(e)}")
+                logger.warning(f"stock_cyq_em失败: {clean_code}, 错误: {str(e)}")
             
-            # 方法3: 返回模拟数据以避免完全失败
+            # 方法3: 返回默认数据以避免完全失败
             logger.warning(f"所有方法失败，返回默认数据: {clean_code}")
             current_date = get_recent_trading_day()
             default_data = {
                 "date": [current_date],
                 "chip_distribution": [{
                     "日期": current_date,
-                    "价格": 0.0,
-                    "成交量": 0,
-                    "成交额": 0.0,
-                    "筹码比例": 0.0,
                     "说明": "数据获取失败，使用默认值"
                 }],
                 "data_source": "default_fallback"
@@ -168,6 +161,14 @@ class ChipAnalysisTool(BaseTool):
             logger.error(f"获取筹码分布数据失败: {stock_code}, {str(e)}")
             return None
 
+    @staticmethod
+    def _chip_records(stats_df: pd.DataFrame) -> List[Dict]:
+        """筹码统计转为记录列表（日期转字符串，数值保留4位小数）"""
+        records = stats_df.round(4).to_dict('records')
+        for record in records:
+            record["日期"] = str(record.get("日期", ""))
+        return records
+
     async def _get_stock_info(self, stock_code: str) -> Dict:
         """获取股票基本信息"""
         try:
@@ -180,22 +181,18 @@ class ChipAnalysisTool(BaseTool):
             
             # 方法1: 尝试使用实时行情API
             try:
-                stock_info = ak.stock_zh_a_spot_em()
-                if stock_info is not None and not stock_info.empty:
-                    stock_detail = stock_info[stock_info['代码'] == clean_code]
-                    
-                    if not stock_detail.empty:
-                        detail = stock_detail.iloc[0]
-                        return {
-                            "name": detail.get('名称', f'股票{clean_code}'),
-                            "current_price": detail.get('最新价', 0.0),
-                            "change_percent": detail.get('涨跌幅', 0.0),
-                            "volume": detail.get('成交量', 0),
-                            "turnover": detail.get('成交额', 0.0),
-                            "market_cap": detail.get('总市值', 0.0),
-                            "pe_ratio": detail.get('市盈率-动态', 0.0),
-                            "data_source": "spot_em"
-                        }
+                detail = await spot_snapshot.aget(clean_code)
+                if detail:
+                    return {
+                        "name": detail.get('名称', f'股票{clean_code}'),
+                        "current_price": detail.get('最新价', 0.0),
+                        "change_percent": detail.get('涨跌幅', 0.0),
+                        "volume": detail.get('成交量', 0),
+                        "turnover": detail.get('成交额', 0.0),
+                        "market_cap": detail.get('总市值', 0.0),
+                        "pe_ratio": detail.get('市盈率-动态', 0.0),
+                        "data_source": "spot_em"
+                    }
             except Exception as e:
                 logger.warning(f"实时行情获取失败: {clean_code}, 错误: {str(e)}")
             
@@ -205,8 +202,8 @@ class ChipAnalysisTool(BaseTool):
                 end_date = recent_trading_day.strftime("%Y%m%d")
                 start_date = (recent_trading_day - timedelta(days=7)).strftime("%Y%m%d")  # 7天前保证有数据
                 
-                hist_df = ak.stock_zh_a_hist(symbol=clean_code, period="daily", 
-                                           start_date=start_date, end_date=end_date, adjust="")
+                hist_df = await data_executor.run(stock_hist, symbol=clean_code, period="daily", 
+                                                  start_date=start_date, end_date=end_date, adjust="")
                 if hist_df is not None and not hist_df.empty:
                     latest = hist_df.iloc[-1]
                     return {
@@ -250,17 +247,15 @@ class ChipAnalysisTool(BaseTool):
             
             # 1. 尝试东方财富实时数据
             try:
-                realtime_data = ak.stock_zh_a_spot_em()
-                if realtime_data is not None and not realtime_data.empty:
-                    stock_data = realtime_data[realtime_data['代码'] == clean_code]
-                    if not stock_data.empty:
-                        data_sources.append({
-                            "source": "eastmoney_realtime",
-                            "current_price": stock_data.iloc[0].get('最新价', 0),
-                            "volume": stock_data.iloc[0].get('成交量', 0),
-                            "turnover": stock_data.iloc[0].get('成交额', 0),
-                            "quality": "high"
-                        })
+                stock_data = await spot_snapshot.aget(clean_code)
+                if stock_data:
+                    data_sources.append({
+                        "source": "eastmoney_realtime",
+                        "current_price": stock_data.get('最新价', 0),
+                        "volume": stock_data.get('成交量', 0),
+                        "turnover": stock_data.get('成交额', 0),
+                        "quality": "high"
+                    })
             except:
                 pass
             
@@ -270,8 +265,8 @@ class ChipAnalysisTool(BaseTool):
                 current_date = recent_trading_day.strftime("%Y%m%d")
                 start_date = (recent_trading_day - timedelta(days=7)).strftime("%Y%m%d")  # 7天前
                 
-                hist_data = ak.stock_zh_a_hist(symbol=clean_code, period="daily", 
-                                             start_date=start_date, end_date=current_date, adjust="")
+                hist_data = await data_executor.run(stock_hist, symbol=clean_code, period="daily", 
+                                                    start_date=start_date, end_date=current_date, adjust="")
                 if hist_data is not None and not hist_data.empty:
                     latest = hist_data.iloc[-1]
                     data_sources.append({
@@ -287,7 +282,7 @@ class ChipAnalysisTool(BaseTool):
             
             # 3. 尝试获取资金流向数据
             try:
-                money_flow = ak.stock_individual_fund_flow(stock=clean_code, market="sh" if clean_code.startswith('6') else "sz")
+                money_flow = await data_executor.run(ak.stock_individual_fund_flow, stock=clean_code, market="sh" if clean_code.startswith('6') else "sz")
                 if money_flow is not None and not money_flow.empty:
                     latest_flow = money_flow.iloc[-1]
                     data_sources.append({
@@ -321,17 +316,20 @@ class ChipAnalysisTool(BaseTool):
             df = pd.DataFrame(chip_data['chip_distribution'])
             current_price = stock_info.get('current_price', 0)
             
+            # 最新交易日的筹码指标（各项分析共用）
+            metrics = self._chip_metrics(df, current_price)
+            
             # 基础筹码分析
-            basic_analysis = self._basic_chip_analysis(df, current_price)
+            basic_analysis = self._basic_chip_analysis(metrics, current_price)
             
             # 主力成本分析
-            main_cost_analysis = self._main_cost_analysis(df, current_price)
+            main_cost_analysis = self._main_cost_analysis(metrics, current_price, chip_data.get('chip_peak'))
             
             # 套牢区分析
-            trapped_analysis = self._trapped_area_analysis(df, current_price)
+            trapped_analysis = self._trapped_area_analysis(metrics, chip_data.get('trapped_zones', []))
             
             # 筹码集中度分析
-            concentration_analysis = self._concentration_analysis(df)
+            concentration_analysis = self._concentration_analysis(df, metrics)
             
             # 筹码变化趋势分析
             trend_analysis = self._trend_analysis(df, analysis_days)
@@ -358,237 +356,95 @@ class ChipAnalysisTool(BaseTool):
             logger.error(f"筹码分析失败: {str(e)}")
             return {"error": f"筹码分析失败: {str(e)}"}
 
-    def _basic_chip_analysis(self, df: pd.DataFrame, current_price: float) -> Dict:
-        """基础筹码分析"""
-        try:
-            if df is None or df.empty:
-                logger.warning("筹码分布数据为空，使用默认分析结果")
-                # 返回基于当前价格的估算结果
-                avg_cost = current_price * 0.95 if current_price > 0 else 10.0
+    def _chip_metrics(self, df: pd.DataFrame, current_price: float) -> Dict:
+        """最新交易日的筹码指标，比例换算为百分数；无有效数据时返回估算值"""
+        if df is not None and not df.empty and '平均成本' in df.columns:
+            valid = df.dropna(subset=['平均成本', '获利比例'])
+            valid = valid[valid['平均成本'] > 0]
+            if not valid.empty:
+                latest = valid.iloc[-1]
                 return {
-                    "average_cost": avg_cost,
-                    "profit_ratio": 50.0,
-                    "concentration_90": 80.0,
-                    "concentration_70": 65.0,
-                    "current_price": current_price,
-                    "cost_deviation": (current_price - avg_cost) / avg_cost * 100 if avg_cost > 0 else 0,
-                    "data_quality": "estimated"
+                    "average_cost": float(latest['平均成本']),
+                    "profit_ratio": float(latest['获利比例']) * 100,
+                    "concentration_90": float(latest.get('90集中度', 0) or 0) * 100,
+                    "concentration_70": float(latest.get('70集中度', 0) or 0) * 100,
+                    "cost_range_90": [round(float(latest.get('90成本-低', 0) or 0), 2), round(float(latest.get('90成本-高', 0) or 0), 2)],
+                    "cost_range_70": [round(float(latest.get('70成本-低', 0) or 0), 2), round(float(latest.get('70成本-高', 0) or 0), 2)],
+                    "data_quality": "processed",
                 }
-            
-            # 尝试从不同的列名获取数据
-            avg_cost = 0
-            profit_ratio = 0
-            concentration_90 = 0
-            concentration_70 = 0
-            
-            # 处理不同的数据格式
-            if hasattr(df, 'columns'):
-                # DataFrame格式
-                if '平均成本' in df.columns:
-                    avg_cost = df['平均成本'].iloc[-1] if len(df) > 0 else 0
-                elif '价格' in df.columns and '筹码比例' in df.columns:
-                    # 计算加权平均成本
-                    total_chips = df['筹码比例'].sum()
-                    if total_chips > 0:
-                        avg_cost = (df['价格'] * df['筹码比例']).sum() / total_chips
-                
-                if '获利比例' in df.columns:
-                    profit_ratio = df['获利比例'].iloc[-1] if len(df) > 0 else 0
-                elif '价格' in df.columns and current_price > 0:
-                    # 估算获利比例
-                    profitable_volume = df[df['价格'] < current_price]['筹码比例'].sum() if '筹码比例' in df.columns else 0
-                    total_volume = df['筹码比例'].sum() if '筹码比例' in df.columns else 1
-                    profit_ratio = (profitable_volume / total_volume * 100) if total_volume > 0 else 50
-                
-                if '90%成本集中度' in df.columns:
-                    concentration_90 = df['90%成本集中度'].iloc[-1] if len(df) > 0 else 0
-                if '70%成本集中度' in df.columns:
-                    concentration_70 = df['70%成本集中度'].iloc[-1] if len(df) > 0 else 0
-            else:
-                # 字典格式
-                avg_cost = df.get('平均成本', 0)
-                profit_ratio = df.get('获利比例', 0)
-                concentration_90 = df.get('90%成本集中度', 0)
-                concentration_70 = df.get('70%成本集中度', 0)
-            
-            # 如果没有获取到有效数据，使用估算值
-            if avg_cost == 0:
-                avg_cost = current_price * 0.95 if current_price > 0 else 10.0
-            if profit_ratio == 0:
-                profit_ratio = 50.0
-            if concentration_90 == 0:
-                concentration_90 = 80.0
-            if concentration_70 == 0:
-                concentration_70 = 65.0
-            
-            return {
-                "average_cost": round(avg_cost, 2),
-                "profit_ratio": round(profit_ratio, 2),
-                "concentration_90": round(concentration_90, 2),
-                "concentration_70": round(concentration_70, 2),
-                "current_price": current_price,
-                "cost_deviation": round((current_price - avg_cost) / avg_cost * 100, 2) if avg_cost > 0 else 0,
-                "data_quality": "processed"
-            }
-            
-        except Exception as e:
-            logger.error(f"基础筹码分析失败: {str(e)}")
-            # 返回默认值而不是错误
-            avg_cost = current_price * 0.95 if current_price > 0 else 10.0
-            return {
-                "average_cost": avg_cost,
-                "profit_ratio": 50.0,
-                "concentration_90": 80.0,
-                "concentration_70": 65.0,
-                "current_price": current_price,
-                "cost_deviation": round((current_price - avg_cost) / avg_cost * 100, 2) if avg_cost > 0 else 0,
-                "error": str(e),
-                "data_quality": "error_fallback"
-            }
-
-    def _main_cost_analysis(self, df: pd.DataFrame, current_price: float) -> Dict:
+        
+        logger.warning("筹码分布数据为空，使用默认分析结果")
+        return {
+            "average_cost": current_price * 0.95 if current_price > 0 else 10.0,
+            "profit_ratio": 50.0,
+            "concentration_90": 80.0,
+            "concentration_70": 65.0,
+            "data_quality": "estimated",
+        }
+
+    def _basic_chip_analysis(self, metrics: Dict, current_price: float) -> Dict:
+        """基础筹码分析"""
+        avg_cost = metrics["average_cost"]
+        result = {
+            "average_cost": round(avg_cost, 2),
+            "profit_ratio": round(metrics["profit_ratio"], 2),
+            "concentration_90": round(metrics["concentration_90"], 2),
+            "concentration_70": round(metrics["concentration_70"], 2),
+            "current_price": current_price,
+            "cost_deviation": round((current_price - avg_cost) / avg_cost * 100, 2) if avg_cost > 0 else 0,
+            "data_quality": metrics["data_quality"],
+        }
+        if "cost_range_90" in metrics:
+            result["cost_range_90"] = metrics["cost_range_90"]
+            result["cost_range_70"] = metrics["cost_range_70"]
+        return result
+
+    def _main_cost_analysis(self, metrics: Dict, current_price: float, chip_peak: Optional[float] = None) -> Dict:
         """主力成本分析"""
-        try:
-            if df is None or df.empty:
-                logger.warning("筹码分布数据为空，使用默认主力成本分析")
-                avg_cost = current_price * 0.95 if current_price > 0 else 10.0
-                main_cost_deviation = (current_price - avg_cost) / avg_cost * 100 if avg_cost > 0 else 0
-                control_level = self._evaluate_control_level(80.0)
-                return {
-                    "main_cost_area": avg_cost,
-                    "cost_deviation_percent": round(main_cost_deviation, 2),
-                    "control_level": control_level,
-                    "main_profit_space": max(main_cost_deviation, 0) if main_cost_deviation > 0 else 0,
-                    "analysis": self._generate_main_cost_analysis_text(main_cost_deviation, control_level),
-                    "data_quality": "estimated"
-                }
-            
-            # 获取平均成本
-            avg_cost = 0
-            concentration_90 = 0
-            
-            if hasattr(df, 'columns'):
-                # DataFrame格式
-                if '平均成本' in df.columns:
-                    avg_cost = df['平均成本'].iloc[-1] if len(df) > 0 else 0
-                elif '价格' in df.columns and '筹码比例' in df.columns:
-                    # 计算加权平均成本
-                    total_chips = df['筹码比例'].sum()
-                    if total_chips > 0:
-                        avg_cost = (df['价格'] * df['筹码比例']).sum() / total_chips
-                
-                if '90%成本集中度' in df.columns:
-                    concentration_90 = df['90%成本集中度'].iloc[-1] if len(df) > 0 else 0
-            else:
-                # 字典格式
-                avg_cost = df.get('平均成本', 0)
-                concentration_90 = df.get('90%成本集中度', 0)
-            
-            # 如果没有获取到有效数据，使用估算值
-            if avg_cost == 0:
-                avg_cost = current_price * 0.95 if current_price > 0 else 10.0
-            if concentration_90 == 0:
-                concentration_90 = 80.0
-            
-            # 主力成本乖离率
-            main_cost_deviation = (current_price - avg_cost) / avg_cost * 100 if avg_cost > 0 else 0
-            
-            # 主力控盘程度评估
-            control_level = self._evaluate_control_level(concentration_90)
-            
-            return {
-                "main_cost_area": round(avg_cost, 2),
-                "cost_deviation_percent": round(main_cost_deviation, 2),
-                "control_level": control_level,
-                "main_profit_space": round(max(main_cost_deviation, 0), 2),
-                "analysis": self._generate_main_cost_analysis_text(main_cost_deviation, control_level),
-                "data_quality": "processed"
-            }
-            
-        except Exception as e:
-            logger.error(f"主力成本分析失败: {str(e)}")
-            # 返回默认值而不是错误
-            avg_cost = current_price * 0.95 if current_price > 0 else 10.0
-            main_cost_deviation = (current_price - avg_cost) / avg_cost * 100 if avg_cost > 0 else 0
-            control_level = self._evaluate_control_level(80.0)
-            return {
-                "main_cost_area": avg_cost,
-                "cost_deviation_percent": round(main_cost_deviation, 2),
-                "control_level": control_level,
-                "main_profit_space": max(main_cost_deviation, 0),
-                "analysis": self._generate_main_cost_analysis_text(main_cost_deviation, control_level),
-                "error": str(e),
-                "data_quality": "error_fallback"
-            }
-
-    def _trapped_area_analysis(self, df: pd.DataFrame, current_price: float) -> Dict:
+        avg_cost = metrics["average_cost"]
+        
+        # 主力成本乖离率
+        main_cost_deviation = (current_price - avg_cost) / avg_cost * 100 if avg_cost > 0 else 0
+        
+        # 主力控盘程度评估
+        control_level = self._evaluate_control_level(metrics["concentration_90"])
+        
+        result = {
+            "main_cost_area": round(avg_cost, 2),
+            "cost_deviation_percent": round(main_cost_deviation, 2),
+            "control_level": control_level,
+            "main_profit_space": round(max(main_cost_deviation, 0), 2),
+            "analysis": self._generate_main_cost_analysis_text(main_cost_deviation, control_level),
+            "data_quality": metrics["data_quality"],
+        }
+        if chip_peak:
+            # 筹码峰：筹码最密集的价位
+            result["chip_peak_price"] = chip_peak
+        return result
+
+    def _trapped_area_analysis(self, metrics: Dict, zones: List[Dict]) -> Dict:
         """套牢区分析"""
-        try:
-            if df is None or df.empty:
-                logger.warning("筹码分布数据为空，使用默认套牢区分析")
-                trapped_ratio = 50.0
-                trapped_depth = self._evaluate_trapped_depth(trapped_ratio)
-                return {
-                    "trapped_ratio": trapped_ratio,
-                    "trapped_depth": trapped_depth,
-                    "selling_pressure": self._evaluate_selling_pressure(trapped_ratio),
-                    "analysis": self._generate_trapped_analysis_text(trapped_ratio, trapped_depth),
-                    "data_quality": "estimated"
-                }
-            
-            # 获取获利比例
-            profit_ratio = 0
-            
-            if hasattr(df, 'columns'):
-                # DataFrame格式
-                if '获利比例' in df.columns:
-                    profit_ratio = df['获利比例'].iloc[-1] if len(df) > 0 else 0
-                elif '价格' in df.columns and '筹码比例' in df.columns and current_price > 0:
-                    # 计算获利比例
-                    profitable_volume = df[df['价格'] < current_price]['筹码比例'].sum()
-                    total_volume = df['筹码比例'].sum()
-                    profit_ratio = (profitable_volume / total_volume * 100) if total_volume > 0 else 0
-            else:
-                # 字典格式
-                profit_ratio = df.get('获利比例', 0)
-            
-            # 如果没有获取到有效数据，使用估算值
-            if profit_ratio == 0:
-                profit_ratio = 50.0
-            
-            # 套牢比例
-            trapped_ratio = 100 - profit_ratio
-            
-            # 套牢深度评估
-            trapped_depth = self._evaluate_trapped_depth(trapped_ratio)
-            
-            return {
-                "trapped_ratio": round(trapped_ratio, 2),
-                "trapped_depth": trapped_depth,
-                "selling_pressure": self._evaluate_selling_pressure(trapped_ratio),
-                "analysis": self._generate_trapped_analysis_text(trapped_ratio, trapped_depth),
-                "data_quality": "processed"
-            }
-            
-        except Exception as e:
-            logger.error(f"套牢区分析失败: {str(e)}")
-            # 返回默认值而不是错误
-            trapped_ratio = 50.0
-            trapped_depth = self._evaluate_trapped_depth(trapped_ratio)
-            return {
-                "trapped_ratio": trapped_ratio,
-                "trapped_depth": trapped_depth,
-                "selling_pressure": self._evaluate_selling_pressure(trapped_ratio),
-                "analysis": self._generate_trapped_analysis_text(trapped_ratio, trapped_depth),
-                "error": str(e),
-                "data_quality": "error_fallback"
-            }
-
-    def _concentration_analysis(self, df: pd.DataFrame) -> Dict:
+        # 套牢比例
+        trapped_ratio = 100 - metrics["profit_ratio"]
+        
+        # 套牢深度评估
+        trapped_depth = self._evaluate_trapped_depth(trapped_ratio)
+        
+        return {
+            "trapped_ratio": round(trapped_ratio, 2),
+            "trapped_depth": trapped_depth,
+            "selling_pressure": self._evaluate_selling_pressure(trapped_ratio),
+            # 现价上方的筹码密集区（价格区间、区间成本、占全部筹码的百分比）
+            "trapped_zones": zones,
+            "analysis": self._generate_trapped_analysis_text(trapped_ratio, trapped_depth),
+            "data_quality": metrics["data_quality"],
+        }
+
+    def _concentration_analysis(self, df: pd.DataFrame, metrics: Dict) -> Dict:
         """筹码集中度分析"""
         try:
-            concentration_90 = df.get('90%成本集中度', [0])[-1] if '90%成本集中度' in df.columns else 0
-            concentration_70 = df.get('70%成本集中度', [0])[-1] if '70%成本集中度' in df.columns else 0
+            concentration_90 = round(metrics["concentration_90"], 2)
+            concentration_70 = round(metrics["concentration_70"], 2)
             
             # 集中度变化趋势
             concentration_trend = self._analyze_concentration_trend(df)
@@ -737,9 +593,9 @@ class ChipAnalysisTool(BaseTool):
     def _analyze_concentration_trend(self, df: pd.DataFrame) -> str:
         """分析集中度变化趋势"""
         try:
-            if '90%成本集中度' in df.columns and len(df) > 1:
-                recent_concentration = df['90%成本集中度'].tail(5).mean()
-                earlier_concentration = df['90%成本集中度'].head(5).mean()
+            if '90集中度' in df.columns and len(df) > 1:
+                recent_concentration = df['90集中度'].tail(5).mean()
+                earlier_concentration = df['90集中度'].head(5).mean()
                 
                 if recent_concentration > earlier_concentration:
                     return "集中度上升"
@@ -771,8 +627,9 @@ class ChipAnalysisTool(BaseTool):
     def _analyze_chip_stability(self, recent_data: pd.DataFrame) -> str:
         """分析筹码稳定性"""
         try:
-            if '90%成本集中度' in recent_data.columns and len(recent_data) > 1:
-                concentration_std = recent_data['90%成本集中度'].std()
+            if '90集中度' in recent_data.columns and len(recent_data) > 1:
+                # 集中度为比例，换算为百分点
+                concentration_std = recent_data['90集中度'].std() * 100
                 if concentration_std < 2:
                     return "筹码稳定"
                 elif concentration_std < 5:
@@ -0,0 +1,349 @@
+"""Vectorized chip (cost) distribution engine.
+
+Port of the turnover-decay chip distribution that East Money draws (and that
+``ak.stock_cyq_em`` evaluates day by day in a JS interpreter): every trading
+day first decays the existing chips by that day's turnover rate, then adds
+the day's traded chips as a triangle over [low, high] peaking at the average
+price (open + high + low + close) / 4.
+
+The recurrence runs once over the daily history with NumPy arrays of shape
+(stocks, price bins), so one pass yields the statistics of every recorded day
+for every stock. Output columns match ``ak.stock_cyq_em`` (ratios as
+fractions), so the chip analysis tool reads both sources the same way.
+``chip_stats_batch`` screens many stocks at once.
+"""
+
+from typing import Dict, List, Mapping, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+DEFAULT_BINS = 150
+DEFAULT_LOOKBACK = 250
+
+# Columns of ak.stock_cyq_em
+CHIP_COLUMNS = [
+    "日期",
+    "获利比例",
+    "平均成本",
+    "90成本-低",
+    "90成本-高",
+    "90集中度",
+    "70成本-低",
+    "70成本-高",
+    "70集中度",
+]
+
+# Daily bar columns of ak.stock_zh_a_hist used by the engine
+_HIST_COLUMNS = ("开盘", "最高", "最低", "收盘", "换手率")
+
+
+class ChipResult:
+    """Chip distributions of a batch of stocks and their per-day statistics.
+
+    ``density`` holds the final distribution, one row per stock, over the price
+    grid ``grid_low + step * arange(bins)``, proportional to East Money's chip
+    stack (every day adds about its turnover share). Each entry of ``stats`` is
+    an array of shape (stocks, recorded days).
+    """
+
+    def __init__(
+        self,
+        grid_low: np.ndarray,
+        step: np.ndarray,
+        density: np.ndarray,
+        stats: Dict[str, np.ndarray],
+    ):
+        self.grid_low = grid_low
+        self.step = step
+        self.density = density
+        self.stats = stats
+
+    @property
+    def prices(self) -> np.ndarray:
+        return self.grid_low[:, None] + self.step[:, None] * np.arange(
+            self.density.shape[1]
+        )
+
+
+def _cost_at(
+    cumulative: np.ndarray,
+    total: np.ndarray,
+    share: float,
+    grid_low: np.ndarray,
+    step: np.ndarray,
+) -> np.ndarray:
+    """Lowest grid price below which ``share`` of the chips sit, per stock."""
+    index = np.argmax(cumulative > (share * total)[:, None], axis=1)
+    return grid_low + index * step
+
+
+def _distribution_stats(
+    density: np.ndarray,
+    prices: np.ndarray,
+    close: np.ndarray,
+    grid_low: np.ndarray,
+    step: np.ndarray,
+) -> Dict[str, np.ndarray]:
+    cumulative = np.cumsum(density, axis=1)
+    total = cumulative[:, -1]
+    valid = total > 0
+    safe_total = np.where(valid, total, 1.0)
+
+    profit = np.where(prices <= close[:, None], density, 0.0).sum(axis=1) / safe_total
+    stats = {
+        "获利比例": profit,
+        # Same definition as East Money: the cost that splits the chips in half
+        "平均成本": _cost_at(cumulative, total, 0.5, grid_low, step),
+    }
+    for percent in (90, 70):
+        share = percent / 100
+        low = _cost_at(cumulative, total, (1 - share) / 2, grid_low, step)
+        high = _cost_at(cumulative, total, (1 + share) / 2, grid_low, step)
+        span = low + high
+        stats[f"{percent}成本-低"] = low
+        stats[f"{percent}成本-高"] = high
+        stats[f"{percent}集中度"] = np.divide(
+            high - low, span, out=np.zeros_like(span), where=span > 0
+        )
+
+    for key, values in stats.items():
+        stats[key] = np.where(valid, values, np.nan)
+    return stats
+
+
+def compute_chip_distribution(
+    open_: np.ndarray,
+    high: np.ndarray,
+    low: np.ndarray,
+    close: np.ndarray,
+    turnover: np.ndarray,
+    bins: int = DEFAULT_BINS,
+    decay: float = 1.0,
+    record_days: int = 1,
+) -> ChipResult:
+    """Run the turnover-decay recurrence for a batch of stocks.
+
+    Inputs have shape (stocks, days), oldest day first; days before a stock's
+    history starts are NaN (they carry no turnover and leave its chips
+    unchanged). ``turnover`` is the daily turnover rate in percent and
+    ``decay`` scales it (East Money uses 1). Statistics are recorded for the
+    last ``record_days`` days.
+    """
+    open_, high, low, close, turnover = (
+        np.atleast_2d(np.asarray(a, dtype=float))
+        for a in (open_, high, low, close, turnover)
+    )
+    n_stocks, n_days = close.shape
+    record_days = max(1, min(record_days, n_days))
+
+    # fmin/fmax skip the NaN padding (an empty history gives NaN, then 0)
+    grid_low = np.nan_to_num(np.fmin.reduce(low, axis=1))
+    grid_high = np.nan_to_num(np.fmax.reduce(high, axis=1))
+    # Price step of at least 0.01, as on East Money
+    step = np.maximum(0.01, (grid_high - grid_low) / (bins - 1))
+    bin_index = np.arange(bins)
+    prices = grid_low[:, None] + step[:, None] * bin_index
+    rows = np.arange(n_stocks)
+
+    density = np.zeros((n_stocks, bins))
+    stats: Dict[str, np.ndarray] = {}
+    first_recorded = n_days - record_days
+
+    for day in range(n_days):
+        h, l, c = high[:, day], low[:, day], close[:, day]
+        active = ~(np.isnan(h) | np.isnan(l) | np.isnan(c))
+        rate = np.where(
+            active,
+            np.clip(np.nan_to_num(turnover[:, day]) / 100 * decay, 0.0, 1.0),
+            0.0,
+        )
+        h, l, c = (
+            np.where(active, h, 0.0),
+            np.where(active, l, 0.0),
+            np.where(active, c, 0.0),
+        )
+        o = np.where(np.isnan(open_[:, day]), c, open_[:, day])
+        avg = (o + h + l + c) / 4
+
+        density *= (1 - rate)[:, None]
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            rising = np.where(
+                (np.abs(avg - l) < 1e-8)[:, None],
+                1.0,
+                (prices - l[:, None]) / (avg - l)[:, None],
+            )
+            falling = np.where(
+                (np.abs(h - avg) < 1e-8)[:, None],
+                1.0,
+                (h[:, None] - prices) / (h - avg)[:, None],
+            )
+            # Triangle height 2 / (high - low) gives the day unit area; times the
+            # bin width that is about ``rate`` of chips spread over the bins
+            height = np.where(h > l, 2 / (h - l), 0.0) * step
+        lowest = np.ceil((l - grid_low) / step - 1e-9)
+        highest = np.floor((h - grid_low) / step + 1e-9)
+        in_range = (bin_index >= lowest[:, None]) & (bin_index <= highest[:, None])
+        weights = np.where(
+            in_range, np.where(prices <= avg[:, None], rising, falling), 0.0
+        )
+        weights = np.clip(np.nan_to_num(weights), 0.0, None)
+
+        density += weights * (height * rate)[:, None]
+
+        # One-price days (limit up/down) land in one bin with the weight East
+        # Money gives them (a rectangle, twice the triangle); ranges narrower
+        # than a bin land there with the day's turnover. A one-price day on a
+        # grid line has a triangle weight but no height, so it goes here too
+        point = active & ((h <= l) | (weights.sum(axis=1) <= 0))
+        if point.any():
+            flat_weight = np.where(h > l, 1.0, (bins - 1) * step / 2)
+            peak = np.floor((avg - grid_low) / step + 1e-9)
+            peak = np.clip(peak, 0, bins - 1).astype(int)
+            density[rows[point], peak[point]] += (flat_weight * rate)[point]
+
+        if day >= first_recorded:
+            day_stats = _distribution_stats(
+                density, prices, close[:, day], grid_low, step
+            )
+            for key, values in day_stats.items():
+                series = stats.setdefault(key, np.full((n_stocks, record_days), np.nan))
+                series[:, day - first_recorded] = values
+
+    return ChipResult(grid_low, step, density, stats)
+
+
+def _hist_arrays(histories: List[pd.DataFrame], lookback: int) -> Dict[str, np.ndarray]:
+    """Right-align daily bars into (stocks, days) arrays padded with NaN."""
+    length = max((min(len(df), lookback) for df in histories), default=0)
+    arrays = {
+        column: np.full((len(histories), max(length, 1)), np.nan)
+        for column in _HIST_COLUMNS
+    }
+    for row, df in enumerate(histories):
+        recent = df.tail(lookback)
+        if recent.empty:
+            continue
+        for column in _HIST_COLUMNS:
+            values = (
+                pd.to_numeric(recent[column], errors="coerce")
+                if column in recent
+                else np.nan
+            )
+            arrays[column][row, length - len(recent) :] = values
+    return arrays
+
+
+def _run(
+    histories: List[pd.DataFrame],
+    lookback: int,
+    bins: int,
+    decay: float,
+    record_days: int,
+) -> ChipResult:
+    arrays = _hist_arrays(histories, lookback)
+    return compute_chip_distribution(
+        arrays["开盘"],
+        arrays["最高"],
+        arrays["最低"],
+        arrays["收盘"],
+        arrays["换手率"],
+        bins=bins,
+        decay=decay,
+        record_days=record_days,
+    )
+
+
+def chip_history(
+    hist_df: pd.DataFrame,
+    record_days: int = 90,
+    lookback: int = DEFAULT_LOOKBACK,
+    bins: int = DEFAULT_BINS,
+    decay: float = 1.0,
+) -> Tuple[pd.DataFrame, Optional[ChipResult]]:
+    """Daily chip statistics of one stock, in the ``ak.stock_cyq_em`` layout,
+    and its final distribution (for chip peaks and trapped zones).
+
+    ``hist_df`` is an ``ak.stock_zh_a_hist`` daily frame; the last
+    ``lookback`` days feed the distribution and the last ``record_days`` rows
+    are returned.
+    """
+    recent = hist_df.tail(lookback).reset_index(drop=True)
+    if recent.empty:
+        return pd.DataFrame(columns=CHIP_COLUMNS), None
+    result = _run([recent], lookback, bins, decay, record_days)
+    recorded = result.stats["获利比例"].shape[1]
+
+    frame = pd.DataFrame({key: values[0] for key, values in result.stats.items()})
+    frame.insert(
+        0, "日期", recent["日期"].iloc[-recorded:].to_numpy() if "日期" in recent else None
+    )
+    return frame[CHIP_COLUMNS], result
+
+
+def chip_stats(hist_df: pd.DataFrame, record_days: int = 90, **kwargs) -> pd.DataFrame:
+    """Daily chip statistics of one stock, in the ``ak.stock_cyq_em`` layout."""
+    return chip_history(hist_df, record_days, **kwargs)[0]
+
+
+def chip_stats_batch(
+    histories: Mapping[str, pd.DataFrame],
+    lookback: int = DEFAULT_LOOKBACK,
+    bins: int = DEFAULT_BINS,
+    decay: float = 1.0,
+) -> pd.DataFrame:
+    """Latest chip statistics of many stocks in one pass, indexed by stock code."""
+    codes = list(histories)
+    if not codes:
+        return pd.DataFrame(columns=CHIP_COLUMNS[1:])
+    result = _run([histories[code] for code in codes], lookback, bins, decay, 1)
+    return pd.DataFrame(
+        {key: values[:, -1] for key, values in result.stats.items()},
+        index=pd.Index(codes, name="股票代码"),
+    )
+
+
+def trapped_zones(
+    result: ChipResult, price: float, top: int = 3
+) -> List[Dict[str, float]]:
+    """Dense chip zones above ``price`` (trapped holders), largest first.
+
+    A zone is a contiguous run of price bins above the price whose density is
+    above the average density of the occupied bins. ``ratio`` is the share of
+    all chips in the zone, in percent.
+    """
+    density, prices = result.density[0], result.prices[0]
+    total = density.sum()
+    if total <= 0 or price <= 0:
+        return []
+
+    occupied = density[density > 0]
+    dense = (prices > price) & (density > occupied.mean())
+    edges = np.diff(np.concatenate(([0], dense.astype(np.int8), [0])))
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+    zones = []
+    for start, end in zip(starts, ends):
+        chips = density[start:end]
+        zones.append(
+            {
+                "price_low": round(float(prices[start]), 2),
+                "price_high": round(float(prices[end - 1]), 2),
+                "average_cost": round(
+                    float((chips * prices[start:end]).sum() / chips.sum()), 2
+                ),
+                "ratio": round(float(chips.sum() / total * 100), 2),
+            }
+        )
+    zones.sort(key=lambda zone: zone["ratio"], reverse=True)
+    return zones[:top]
+
+
+def chip_peak(result: ChipResult) -> Optional[float]:
+    """Price of the densest chip bin (the main chip peak)."""
+    density = result.density[0]
+    if density.sum() <= 0:
+        return None
+    return round(float(result.prices[0][int(np.argmax(density))]), 2)
@@ -3,12 +3,14 @@ HTML报告生成工具 - 数据外部化版本
 将HTML模板与数据分离，避免截断问题
 """
 
-import json
 import os
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, Any, Optional
 
+from src.utils.report_catalog import report_catalog
+from src.utils.report_storage import report_storage
+
 def create_html_template() -> str:
     """创建基础HTML模板，不包含数据"""
     return """<!DOCTYPE html>
@@ -662,9 +664,8 @@ def save_data_file(data: Dict[str, Any], data_file_path: str) -> bool:
         # 确保目录存在
         os.makedirs(os.path.dirname(data_file_path), exist_ok=True)
         
-        # 保存数据
-        with open(data_file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        # 保存数据（packed 模式下压缩存储，与辩论/投票报告共享重复的数据块）
+        report_storage.write_json(data_file_path, data)
         
         print(f"数据已保存到: {data_file_path}")
         return True
@@ -707,13 +708,22 @@ def create_html_with_external_data(
         # 创建HTML模板
         html_content = create_html_template()
         
-        # 保存HTML文件
-        with open(html_path, 'w', encoding='utf-8') as f:
-            f.write(html_content)
+        # 保存HTML文件（packed 模式下模板内容只存一份）
+        report_storage.write_text(html_path, html_content)
         
         # 保存数据文件
         save_data_file(data, data_path)
         
+        # 写入报告目录索引（历史列表直接读取预先计算的投票摘要）
+        report_catalog.add(
+            "html",
+            stock_code,
+            html_path,
+            timestamp,
+            results=data.get("battle_results"),
+            data_path=data_path,
+        )
+        
         print(f"HTML报告已生成:")
         print(f"  HTML文件: {html_path}")
         print(f"  数据文件: {data_path}")
@@ -731,8 +741,7 @@ def load_external_data(data_file_path: str) -> Optional[Dict[str, Any]]:
             print(f"数据文件不存在: {data_file_path}")
             return None
         
-        with open(data_file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = report_storage.read_json(data_file_path)
         
         print(f"成功加载数据文件: {data_file_path}")
         return data
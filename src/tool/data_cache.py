@@ -0,0 +1,279 @@
+"""
+数据请求缓存
+
+Caches akshare/efinance/eastmoney fetches keyed by function and arguments,
+with an in-memory LRU tier in front of an on-disk pickle tier. Each cached
+function declares an expiry policy:
+
+- ``realtime``: a few seconds, for intraday quotes and capital flow
+- ``daily``: until the next market close, for daily bars and announcement lists
+- ``financial``: several days, for financial statements
+- ``permanent``: never expires, for immutable documents
+
+Lookups hand out copies of DataFrames, dicts and lists, so callers may
+modify what they get without affecting the cached value.
+"""
+
+import copy
+import functools
+import hashlib
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import pandas as pd
+
+from src.config import PROJECT_ROOT, config
+from src.logger import logger
+from src.tool.base import get_recent_trading_day
+
+
+MARKET_CLOSE_HOUR = 15
+
+POLICIES = ("realtime", "daily", "financial", "permanent")
+
+
+def next_market_close() -> datetime:
+    """Return the next A-share close (15:00 on a trading day) from now."""
+    now = datetime.now()
+    close_today = now.replace(hour=MARKET_CLOSE_HOUR, minute=0, second=0, microsecond=0)
+    if get_recent_trading_day() == now.strftime("%Y-%m-%d") and now < close_today:
+        return close_today
+
+    next_day = close_today + timedelta(days=1)
+    while next_day.weekday() >= 5:  # 跳过周末
+        next_day += timedelta(days=1)
+    return next_day
+
+
+def is_cacheable(value: Any) -> bool:
+    """Failed or empty fetch results are never cached."""
+    if value is None:
+        return False
+    if isinstance(value, pd.DataFrame):
+        return not value.empty
+    if isinstance(value, dict):
+        if value.get("success") is False or "error" in value:
+            return False
+        return bool(value)
+    if isinstance(value, (list, tuple, str)):
+        return len(value) > 0
+    return True
+
+
+def _detached(value: Any) -> Any:
+    """A copy of a mutable cached value, so callers cannot edit the memory tier."""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy()
+    if isinstance(value, (dict, list)):
+        return copy.deepcopy(value)
+    return value
+
+
+class DataCache:
+    """Two-tier (memory + disk) TTL cache for data fetch functions."""
+
+    def __init__(
+        self,
+        cache_dir: Path,
+        memory_max_entries: int = 256,
+        realtime_ttl: int = 30,
+        financial_ttl_days: int = 3,
+        enabled: bool = True,
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.memory_max_entries = max(1, memory_max_entries)
+        self.realtime_ttl = realtime_ttl
+        self.financial_ttl_days = financial_ttl_days
+        self.enabled = enabled
+
+        self._memory: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {
+            policy: {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+            for policy in POLICIES
+        }
+
+    # ------------------------------------------------------------------
+    # Expiry
+    # ------------------------------------------------------------------
+    def expires_at(self, policy: str) -> float:
+        """Absolute expiry timestamp for an entry stored now under ``policy``."""
+        now = time.time()
+        if policy == "realtime":
+            return now + self.realtime_ttl
+        if policy == "daily":
+            return next_market_close().timestamp()
+        if policy == "financial":
+            return now + self.financial_ttl_days * 86400
+        if policy == "permanent":
+            return float("inf")
+        raise ValueError(f"Unknown cache policy: {policy}")
+
+    # ------------------------------------------------------------------
+    # Storage
+    # ------------------------------------------------------------------
+    @staticmethod
+    def make_key(namespace: str, args: tuple, kwargs: dict) -> str:
+        raw = repr((namespace, args, sorted(kwargs.items())))
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _disk_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.pkl"
+
+    def _memory_get(self, key: str) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return False, None
+            expires_at, value = entry
+            if expires_at <= time.time():
+                del self._memory[key]
+                return False, None
+            self._memory.move_to_end(key)
+        return True, _detached(value)
+
+    def _memory_set(self, key: str, expires_at: float, value: Any) -> None:
+        with self._lock:
+            self._memory[key] = (expires_at, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_max_entries:
+                self._memory.popitem(last=False)
+
+    def _disk_get(self, key: str) -> Tuple[bool, float, Any]:
+        path = self._disk_path(key)
+        if not path.exists():
+            return False, 0.0, None
+        try:
+            with path.open("rb") as f:
+                expires_at, value = pickle.load(f)
+        except Exception as e:
+            logger.warning(f"Discarding unreadable cache file {path}: {e}")
+            path.unlink(missing_ok=True)
+            return False, 0.0, None
+
+        if expires_at <= time.time():
+            path.unlink(missing_ok=True)
+            return False, 0.0, None
+        return True, expires_at, value
+
+    def _disk_set(self, key: str, expires_at: float, value: Any) -> None:
+        path = self._disk_path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            with tmp_path.open("wb") as f:
+                pickle.dump((expires_at, value), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Failed to write cache file {path}: {e}")
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+    def get(self, key: str, policy: str) -> Tuple[bool, Any]:
+        hit, value = self._memory_get(key)
+        if hit:
+            self._count(policy, "memory_hits")
+            return True, value
+
+        hit, expires_at, value = self._disk_get(key)
+        if hit:
+            self._memory_set(key, expires_at, _detached(value))
+            self._count(policy, "disk_hits")
+            return True, value
+
+        self._count(policy, "misses")
+        return False, None
+
+    def set(self, key: str, policy: str, value: Any) -> None:
+        expires_at = self.expires_at(policy)
+        self._memory_set(key, expires_at, _detached(value))
+        self._disk_set(key, expires_at, value)
+
+    def clear(self) -> None:
+        """Drop the memory tier and every on-disk entry."""
+        with self._lock:
+            self._memory.clear()
+        if self.cache_dir.exists():
+            for path in self.cache_dir.glob("*/*.pkl"):
+                path.unlink(missing_ok=True)
+
+    def _count(self, policy: str, counter: str) -> None:
+        with self._lock:
+            self._stats.setdefault(
+                policy, {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+            )[counter] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters, per policy and in total."""
+        with self._lock:
+            by_policy = {policy: dict(counts) for policy, counts in self._stats.items()}
+            memory_entries = len(self._memory)
+
+        total = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        for counts in by_policy.values():
+            for name, value in counts.items():
+                total[name] += value
+        lookups = sum(total.values())
+        hits = total["memory_hits"] + total["disk_hits"]
+
+        return {
+            "enabled": self.enabled,
+            "memory_entries": memory_entries,
+            "total": total,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "by_policy": by_policy,
+        }
+
+    def cached(self, policy: str, namespace: Optional[str] = None) -> Callable:
+        """Decorator caching a synchronous fetch function under ``policy``."""
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown cache policy: {policy}")
+
+        def decorator(func: Callable) -> Callable:
+            name = namespace or f"{func.__module__}.{func.__qualname__}"
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+
+                key = self.make_key(name, args, kwargs)
+                hit, value = self.get(key, policy)
+                if hit:
+                    logger.debug(f"Data cache hit: {name}")
+                    return value
+
+                value = func(*args, **kwargs)
+                if is_cacheable(value):
+                    self.set(key, policy, value)
+                return value
+
+            wrapper.uncached = func
+            return wrapper
+
+        return decorator
+
+
+def _create_data_cache() -> DataCache:
+    settings = config.data_cache_config
+    cache_dir = Path(settings.cache_dir)
+    if not cache_dir.is_absolute():
+        cache_dir = PROJECT_ROOT / cache_dir
+    return DataCache(
+        cache_dir=cache_dir,
+        memory_max_entries=settings.memory_max_entries,
+        realtime_ttl=settings.realtime_ttl,
+        financial_ttl_days=settings.financial_ttl_days,
+        enabled=settings.enabled,
+    )
+
+
+# 全局数据缓存实例
+data_cache = _create_data_cache()
@@ -0,0 +1,122 @@
+"""
+同步数据接口的异步执行器
+
+akshare/efinance and the eastmoney scrapers are blocking. Every data tool
+runs them through the shared DataExecutor, which offloads calls to a bounded
+thread pool, applies a per-call timeout and retries with asyncio backoff so
+the event loop never sleeps or blocks on I/O.
+"""
+
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from src.config import config
+from src.logger import logger
+
+
+class DataExecutor:
+    """Bounded thread pool adapter for blocking data fetch functions."""
+
+    def __init__(
+        self,
+        max_workers: int = 16,
+        default_timeout: Optional[float] = 60.0,
+        default_backoff: float = 1.0,
+        max_backoff: float = 10.0,
+    ):
+        self.max_workers = max(1, max_workers)
+        self.default_timeout = default_timeout
+        self.default_backoff = default_backoff
+        self.max_backoff = max_backoff
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="data-io"
+            )
+        return self._pool
+
+    async def _run_once(
+        self, func: Callable, args: tuple, kwargs: dict, timeout: Optional[float]
+    ) -> Any:
+        loop = asyncio.get_running_loop()
+        # Copy the caller's context so per-run context variables reach the worker
+        ctx = contextvars.copy_context()
+        call = functools.partial(ctx.run, func, *args, **kwargs)
+        future = loop.run_in_executor(self.pool, call)
+        if timeout:
+            return await asyncio.wait_for(future, timeout=timeout)
+        return await future
+
+    async def run(
+        self,
+        func: Callable,
+        *args,
+        retries: int = 1,
+        timeout: Optional[float] = None,
+        backoff: Optional[float] = None,
+        name: Optional[str] = None,
+        **kwargs,
+    ) -> Any:
+        """Run a blocking function in the pool and await its result.
+
+        Args:
+            func: Blocking callable
+            retries: Total attempts, including the first one
+            timeout: Seconds allowed per attempt, defaults to the executor timeout
+            backoff: Base delay between attempts, doubled after each failure
+            name: Name used in log messages, defaults to the function name
+
+        Raises:
+            The last exception (asyncio.TimeoutError on timeout) once all
+            attempts have failed.
+        """
+        attempts = max(1, retries)
+        timeout = self.default_timeout if timeout is None else timeout
+        delay = self.default_backoff if backoff is None else backoff
+        name = name or getattr(func, "__name__", "call")
+
+        for attempt in range(1, attempts + 1):
+            try:
+                return await self._run_once(func, args, kwargs, timeout)
+            except Exception as e:
+                if isinstance(e, asyncio.TimeoutError):
+                    # The worker thread cannot be interrupted; it finishes in the background
+                    logger.warning(
+                        f"[{name}][Attempt {attempt}] Timed out after {timeout}s"
+                    )
+                else:
+                    logger.warning(f"[{name}][Attempt {attempt}] Failed: {e}")
+                if attempt >= attempts:
+                    raise
+                await asyncio.sleep(min(delay, self.max_backoff))
+                delay *= 2
+
+    async def run_safe(
+        self, func: Callable, *args, default: Any = None, **kwargs
+    ) -> Any:
+        """Like run, but return ``default`` instead of raising after the last attempt."""
+        try:
+            return await self.run(func, *args, **kwargs)
+        except Exception as e:
+            name = kwargs.get("name") or getattr(func, "__name__", "call")
+            logger.error(f"[{name}] Giving up: {e}")
+            return default
+
+    def shutdown(self, wait: bool = False) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait, cancel_futures=True)
+            self._pool = None
+
+
+# 全局数据执行器实例
+data_executor = DataExecutor(
+    max_workers=config.executor_config.max_workers,
+    default_timeout=config.executor_config.timeout,
+    default_backoff=config.executor_config.backoff,
+)
@@ -1,4 +1,5 @@
 from src.tool.financial_deep_search.get_section_data import get_all_section
+from src.tool.financial_deep_search.http_client import http_client
 from src.tool.financial_deep_search.index_capital import get_index_capital_flow
 from src.tool.financial_deep_search.risk_control_data import (
     get_announcements_with_detail,
@@ -23,4 +24,5 @@ __all__ = [
     "get_company_name_for_stock",
     "get_index_capital_flow",
     "get_all_section",
+    "http_client",
 ]
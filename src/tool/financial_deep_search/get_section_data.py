@@ -1,9 +1,9 @@
+import asyncio
 import json
-import time
 import traceback
 from datetime import datetime
 
-import requests
+from src.tool.financial_deep_search.http_client import http_client
 
 
 ### 每日热门板块爬取
@@ -30,12 +30,11 @@ def parse_jsonp(jsonp_str):
     return None
 
 
-def fetch_data(sector_type, url, max_retries=3, retry_delay=2):
+async def fetch_data_async(sector_type, url, max_retries=3, retry_delay=2):
     for attempt in range(1, max_retries + 1):
         try:
-            resp = requests.get(url, headers=HEADERS, timeout=15)
-            resp.raise_for_status()
-            data = parse_jsonp(resp.text)
+            text = await http_client.get_text(url, headers=HEADERS, timeout=15)
+            data = parse_jsonp(text)
             if not data:
                 print(f"解析{sector_type}数据失败")
                 return []
@@ -43,11 +42,25 @@ def fetch_data(sector_type, url, max_retries=3, retry_delay=2):
         except Exception as e:
             print(f"获取{sector_type}数据失败: {e} (第{attempt}次尝试)")
             if attempt < max_retries:
-                time.sleep(retry_delay)
+                await asyncio.sleep(retry_delay)
             else:
                 return []
 
 
+def fetch_data(sector_type, url, max_retries=3, retry_delay=2):
+    """fetch_data_async 的同步包装"""
+    return http_client.run_sync(
+        fetch_data_async(sector_type, url, max_retries, retry_delay)
+    )
+
+
+async def _fetch_sections_async(sector_types):
+    """并发获取多个板块类型的数据"""
+    return await asyncio.gather(
+        *(fetch_data_async(t, API_URLS[t]) for t in sector_types)
+    )
+
+
 def simplify_sector_item(item):
     def to_float(val):
         try:
@@ -106,11 +119,10 @@ def get_all_section(sector_types=None):
         if not valid_types:
             return {"success": False, "message": "没有提供有效的板块类型", "data": {}}
 
-        # 获取数据
+        # 并发获取数据
+        raw_lists = http_client.run_sync(_fetch_sections_async(valid_types))
         all_data = {}
-        for sector_type in valid_types:
-            url = API_URLS[sector_type]
-            raw_list = fetch_data(sector_type, url)
+        for sector_type, raw_list in zip(valid_types, raw_lists):
             all_data[sector_type] = [
                 simplify_sector_item(item) for item in raw_list if item
             ]
@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+东方财富爬虫共享 HTTP 客户端
+
+All financial_deep_search scrapers share one httpx.AsyncClient with
+keep-alive pooling, a per-host concurrency limit and HTTP/2 when the ``h2``
+package is installed. The client lives on a dedicated background event loop,
+so it can be used from any caller:
+
+- ``await http_client.get_text(...)`` from async code on any event loop
+- ``http_client.run_sync(coro)`` from synchronous code (CLI entry points,
+  executor threads)
+"""
+
+import asyncio
+import json
+import threading
+import time
+from typing import Any, Coroutine, Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from src.config import config
+from src.logger import logger
+
+
+try:
+    import h2  # noqa: F401  # type: ignore
+
+    HAS_H2 = True
+except ImportError:
+    HAS_H2 = False
+
+
+class TokenBucket:
+    """Token-bucket rate limiter usable from any event loop or thread.
+
+    Each acquire reserves a token immediately (the balance may go negative)
+    and sleeps until that token would have been refilled, so concurrent
+    callers are spaced evenly at ``rate`` per second after an initial burst.
+    """
+
+    def __init__(self, rate: float, capacity: int = 1):
+        self.rate = max(rate, 1e-6)
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._tokens -= 1
+            return max(0.0, -self._tokens / self.rate)
+
+    async def acquire(self) -> None:
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class SharedHttpClient:
+    """Pooled async HTTP client running on its own event loop thread."""
+
+    def __init__(
+        self,
+        max_connections: int = 20,
+        max_per_host: int = 6,
+        timeout: float = 15.0,
+        http2: bool = True,
+    ):
+        self.max_connections = max_connections
+        self.max_per_host = max(1, max_per_host)
+        self.timeout = timeout
+        self.http2 = http2 and HAS_H2
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+        self._start_lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Background loop
+    # ------------------------------------------------------------------
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is not None:
+            return self._loop
+
+        with self._start_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(
+                    target=loop.run_forever, name="http-client-loop", daemon=True
+                )
+                thread.start()
+                self._thread = thread
+                self._loop = loop
+        return self._loop
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Create the client lazily; only called on the background loop."""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=self.http2,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+                follow_redirects=True,
+            )
+            logger.info(
+                f"Shared HTTP client created (http2={self.http2}, "
+                f"max_connections={self.max_connections}, max_per_host={self.max_per_host})"
+            )
+        return self._client
+
+    def _host_slot(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        slot = self._host_slots.get(host)
+        if slot is None:
+            slot = self._host_slots[host] = asyncio.Semaphore(self.max_per_host)
+        return slot
+
+    async def _call(self, coro: Coroutine) -> Any:
+        """Run a coroutine on the background loop and await it from any loop."""
+        loop = self._ensure_loop()
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+
+        if running is loop:
+            return await coro
+        future = asyncio.run_coroutine_threadsafe(coro, loop)
+        return await asyncio.wrap_future(future)
+
+    def run_sync(self, coro: Coroutine) -> Any:
+        """Run a coroutine on the background loop and block until it finishes.
+
+        Must not be called from the background loop itself.
+        """
+        loop = self._ensure_loop()
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+    # ------------------------------------------------------------------
+    # Requests
+    # ------------------------------------------------------------------
+    async def _get_text(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]],
+        headers: Optional[Dict[str, str]],
+        timeout: Optional[float],
+        retries: int,
+        retry_delay: float,
+    ) -> str:
+        client = self._get_client()
+        attempts = max(1, retries)
+        for attempt in range(1, attempts + 1):
+            try:
+                async with self._host_slot(url):
+                    resp = await client.get(
+                        url,
+                        params=params,
+                        headers=headers,
+                        timeout=timeout if timeout is not None else self.timeout,
+                    )
+                resp.raise_for_status()
+                return resp.text
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                if attempt >= attempts:
+                    raise
+                logger.warning(
+                    f"GET {urlsplit(url).netloc} failed: {e} (attempt {attempt})"
+                )
+                await asyncio.sleep(retry_delay * attempt)
+
+    async def get_text(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+        retries: int = 1,
+        retry_delay: float = 1.0,
+    ) -> str:
+        """GET a URL through the shared pool and return the response body."""
+        return await self._call(
+            self._get_text(url, params, headers, timeout, retries, retry_delay)
+        )
+
+    async def get_json(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+        retries: int = 1,
+        retry_delay: float = 1.0,
+    ) -> Any:
+        """GET a URL through the shared pool and decode the JSON body."""
+        text = await self.get_text(url, params, headers, timeout, retries, retry_delay)
+        return json.loads(text)
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            client, self._client = self._client, None
+            await self._call(client.aclose())
+
+
+# 全局共享 HTTP 客户端
+http_client = SharedHttpClient(
+    max_connections=config.http_config.max_connections,
+    max_per_host=config.http_config.max_per_host,
+    timeout=config.http_config.timeout,
+    http2=config.http_config.http2,
+)
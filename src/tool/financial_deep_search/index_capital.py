@@ -6,6 +6,7 @@
 API: https://push2.eastmoney.com/api/qt/stock/get
 """
 
+import asyncio
 import json
 import os
 import re
@@ -13,7 +14,7 @@ import time
 import traceback
 from datetime import datetime
 
-import requests
+from src.tool.financial_deep_search.http_client import http_client
 
 
 # API URL - 上证指数(000001)资金流向
@@ -82,7 +83,9 @@ def parse_jsonp(jsonp_str):
         return None
 
 
-def fetch_index_capital_flow(index_code="000001", max_retries=3, retry_delay=2):
+async def fetch_index_capital_flow_async(
+    index_code="000001", max_retries=3, retry_delay=2
+):
     """
     获取指数资金流向数据
 
@@ -113,15 +116,14 @@ def fetch_index_capital_flow(index_code="000001", max_retries=3, retry_delay=2):
     # 请求数据
     for attempt in range(1, max_retries + 1):
         try:
-            resp = requests.get(url, headers=HEADERS, timeout=15)
-            resp.raise_for_status()
+            text = await http_client.get_text(url, headers=HEADERS, timeout=15)
 
             # 解析响应数据
-            data = parse_jsonp(resp.text)
+            data = parse_jsonp(text)
             if not data:
                 print(f"解析指数资金流向数据失败 (第{attempt}次尝试)")
                 if attempt < max_retries:
-                    time.sleep(retry_delay)
+                    await asyncio.sleep(retry_delay)
                     continue
                 return None
 
@@ -130,7 +132,7 @@ def fetch_index_capital_flow(index_code="000001", max_retries=3, retry_delay=2):
             if not flow_data:
                 print(f"未获取到指数资金流向数据 (第{attempt}次尝试)")
                 if attempt < max_retries:
-                    time.sleep(retry_delay)
+                    await asyncio.sleep(retry_delay)
                     continue
                 return None
 
@@ -140,11 +142,18 @@ def fetch_index_capital_flow(index_code="000001", max_retries=3, retry_delay=2):
         except Exception as e:
             print(f"获取指数资金流向数据失败: {e} (第{attempt}次尝试)")
             if attempt < max_retries:
-                time.sleep(retry_delay)
+                await asyncio.sleep(retry_delay)
             else:
                 return None
 
 
+def fetch_index_capital_flow(index_code="000001", max_retries=3, retry_delay=2):
+    """fetch_index_capital_flow_async 的同步包装"""
+    return http_client.run_sync(
+        fetch_index_capital_flow_async(index_code, max_retries, retry_delay)
+    )
+
+
 def process_flow_data(data, index_code):
     """
     处理资金流向数据
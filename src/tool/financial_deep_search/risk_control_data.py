@@ -7,6 +7,7 @@
 支持一次性爬取所有股票的公告和财务数据
 """
 
+import asyncio
 import os
 import time
 import traceback
@@ -14,6 +15,10 @@ from datetime import datetime
 
 import pandas as pd
 
+from src.config import config
+from src.tool.data_cache import data_cache, is_cacheable
+from src.tool.financial_deep_search.http_client import TokenBucket, http_client
+
 
 # 股票代码到公司名称的缓存字典
 STOCK_NAME_CACHE = {}
@@ -34,10 +39,14 @@ HEADERS = {
     "Accept": "application/json, text/javascript, */*; q=0.01",
 }
 
-import requests
+# 公告正文请求限速（令牌桶），替代逐条固定休眠
+ANNOUNCEMENT_RATE_LIMITER = TokenBucket(
+    rate=config.http_config.announcement_rate,
+    capacity=config.http_config.announcement_burst,
+)
 
 
-def get_eastmoney_announcements(
+async def get_eastmoney_announcements_async(
     stock_code, page_size=50, page_index=1, max_retries=3, retry_delay=2
 ):
     """获取东方财富公告列表"""
@@ -57,15 +66,15 @@ def get_eastmoney_announcements(
     # 请求数据
     for attempt in range(1, max_retries + 1):
         try:
-            resp = requests.get(api_url, params=params, headers=HEADERS, timeout=15)
-            resp.raise_for_status()
-            data = resp.json()
+            data = await http_client.get_json(
+                api_url, params=params, headers=HEADERS, timeout=15
+            )
 
             # 检查数据
             if not data or "data" not in data or "list" not in data["data"]:
                 print(f"未获取到公告数据 (第{attempt}次尝试): {data}")
                 if attempt < max_retries:
-                    time.sleep(retry_delay)
+                    await asyncio.sleep(retry_delay)
                     continue
                 return []
 
@@ -74,12 +83,26 @@ def get_eastmoney_announcements(
         except Exception as e:
             print(f"获取公告列表失败: {e} (第{attempt}次尝试)")
             if attempt < max_retries:
-                time.sleep(retry_delay)
+                await asyncio.sleep(retry_delay)
             else:
                 return []
 
 
-def get_eastmoney_announcement_detail(art_code, max_retries=3, retry_delay=2):
+@data_cache.cached("daily")
+def get_eastmoney_announcements(
+    stock_code, page_size=50, page_index=1, max_retries=3, retry_delay=2
+):
+    """get_eastmoney_announcements_async 的同步包装"""
+    return http_client.run_sync(
+        get_eastmoney_announcements_async(
+            stock_code, page_size, page_index, max_retries, retry_delay
+        )
+    )
+
+
+async def get_eastmoney_announcement_detail_async(
+    art_code, max_retries=3, retry_delay=2
+):
     """获取东方财富公告详情"""
     detail_url = "https://np-cnotice-stock.eastmoney.com/api/content/ann"
     params = {"art_code": art_code, "client_source": "web", "page_index": 1}
@@ -87,9 +110,9 @@ def get_eastmoney_announcement_detail(art_code, max_retries=3, retry_delay=2):
     # 请求数据
     for attempt in range(1, max_retries + 1):
         try:
-            resp = requests.get(detail_url, params=params, headers=HEADERS, timeout=15)
-            resp.raise_for_status()
-            data = resp.json()
+            data = await http_client.get_json(
+                detail_url, params=params, headers=HEADERS, timeout=15
+            )
 
             if "data" in data:
                 content = data["data"].get("content")
@@ -100,18 +123,51 @@ def get_eastmoney_announcement_detail(art_code, max_retries=3, retry_delay=2):
             else:
                 print(f"未获取到公告详情 (第{attempt}次尝试)")
                 if attempt < max_retries:
-                    time.sleep(retry_delay)
+                    await asyncio.sleep(retry_delay)
                     continue
                 return None
 
         except Exception as e:
             print(f"公告详情解析失败 art_code={art_code}: {e} (第{attempt}次尝试)")
             if attempt < max_retries:
-                time.sleep(retry_delay)
+                await asyncio.sleep(retry_delay)
             else:
                 return None
 
 
+def get_eastmoney_announcement_detail(art_code, max_retries=3, retry_delay=2):
+    """get_eastmoney_announcement_detail_async 的同步包装"""
+    return http_client.run_sync(
+        get_eastmoney_announcement_detail_async(art_code, max_retries, retry_delay)
+    )
+
+
+async def get_announcement_detail_cached_async(art_code):
+    """获取公告正文，已发布公告不会变化，按 art_code 永久缓存"""
+    key = data_cache.make_key("eastmoney.announcement_detail", (art_code,), {})
+    if data_cache.enabled:
+        hit, detail = data_cache.get(key, "permanent")
+        if hit:
+            return detail
+
+    await ANNOUNCEMENT_RATE_LIMITER.acquire()
+    detail = await get_eastmoney_announcement_detail_async(art_code)
+    if data_cache.enabled and is_cacheable(detail):
+        data_cache.set(key, "permanent", detail)
+    return detail
+
+
+async def fetch_announcement_details_async(art_codes):
+    """并发获取多条公告正文，顺序与 art_codes 一致"""
+
+    async def _fetch(art_code):
+        if not art_code:
+            return None
+        return await get_announcement_detail_cached_async(art_code)
+
+    return await asyncio.gather(*(_fetch(art_code) for art_code in art_codes))
+
+
 def get_announcements_with_detail(stock_code, max_count=30):
     """获取指定股票公告的标题列表, 只保留标题, 并限制至最多50条"""
     # 强制限制 max_count 不超过 10
@@ -119,23 +175,25 @@ def get_announcements_with_detail(stock_code, max_count=30):
 
     try:
         # 只抓取第一页公告，page_size 同步为 max_count 以减少无用数据
-        anns = get_eastmoney_announcements(stock_code, page_size=max_count)
-        result = []
+        anns = get_eastmoney_announcements(stock_code, page_size=max_count)[:max_count]
+
+        # 并发获取公告正文（令牌桶限速，已缓存的正文不再请求）
+        details = http_client.run_sync(
+            fetch_announcement_details_async([ann.get("art_code") for ann in anns])
+        )
 
-        for i, ann in enumerate(anns[:max_count]):
-            art_code = ann.get("art_code")
+        result = []
+        for i, (ann, detail) in enumerate(zip(anns, details)):
             title = ann.get("title")
             notice_date = ann.get("notice_date", "").split("T")[0]
 
-            # 获取公告正文并截断至前 1000 字，避免超长文本导致上下文溢出
+            # 截断公告正文至前 1000 字，避免超长文本导致上下文溢出
             content = ""
-            if art_code:
-                detail = get_eastmoney_announcement_detail(art_code)
-                if isinstance(detail, str):
-                    content = detail[:1000]
-                elif isinstance(detail, dict):
-                    raw_content = detail.get("content") or detail.get("notice_content") or ""
-                    content = raw_content[:1000]
+            if isinstance(detail, str):
+                content = detail[:1000]
+            elif isinstance(detail, dict):
+                raw_content = detail.get("content") or detail.get("notice_content") or ""
+                content = raw_content[:1000]
 
             # 打印简单调试信息
             print(f"[{i + 1}] {title} {notice_date}")
@@ -149,9 +207,6 @@ def get_announcements_with_detail(stock_code, max_count=30):
                 }
             )
 
-            # 适当休眠，避免过快请求被限速
-            time.sleep(0.3)
-
         return result
 
     except Exception as e:
@@ -212,6 +267,7 @@ def get_cash_flow(stock_code, period="按年度"):
         return pd.DataFrame()
 
 
+@data_cache.cached("financial")
 def get_financial_reports(stock_code, period="按年度"):
     """获取财务报表数据（资产负债表、利润表、现金流量表）"""
     if not HAS_AKSHARE:
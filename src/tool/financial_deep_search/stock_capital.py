@@ -6,13 +6,14 @@
 API: https://push2.eastmoney.com/api/qt/clist/get
 """
 
+import asyncio
 import json
 import re
 import time
 import traceback
 from datetime import datetime
 
-import requests
+from src.tool.financial_deep_search.http_client import http_client
 
 
 # API URL - 个股资金流向
@@ -43,7 +44,7 @@ def parse_jsonp(jsonp_str):
         return None
 
 
-def fetch_stock_list_capital_flow(
+async def fetch_stock_list_capital_flow_async(
     page_size=50, page_num=1, max_retries=3, retry_delay=2
 ):
     """
@@ -73,15 +74,14 @@ def fetch_stock_list_capital_flow(
     # 请求数据
     for attempt in range(1, max_retries + 1):
         try:
-            resp = requests.get(url, headers=HEADERS, timeout=15)
-            resp.raise_for_status()
+            text = await http_client.get_text(url, headers=HEADERS, timeout=15)
 
             # 解析响应数据
-            data = parse_jsonp(resp.text)
+            data = parse_jsonp(text)
             if not data:
                 print(f"解析个股资金流向数据失败 (第{attempt}次尝试)")
                 if attempt < max_retries:
-                    time.sleep(retry_delay)
+                    await asyncio.sleep(retry_delay)
                     continue
                 return None
 
@@ -90,7 +90,7 @@ def fetch_stock_list_capital_flow(
             if not stock_list:
                 print(f"未获取到个股资金流向数据 (第{attempt}次尝试)")
                 if attempt < max_retries:
-                    time.sleep(retry_delay)
+                    await asyncio.sleep(retry_delay)
                     continue
                 return None
 
@@ -102,12 +102,25 @@ def fetch_stock_list_capital_flow(
         except Exception as e:
             print(f"获取个股资金流向数据失败: {e} (第{attempt}次尝试)")
             if attempt < max_retries:
-                time.sleep(retry_delay)
+                await asyncio.sleep(retry_delay)
             else:
                 return None
 
 
-def fetch_single_stock_capital_flow(stock_code, max_retries=3, retry_delay=2):
+def fetch_stock_list_capital_flow(
+    page_size=50, page_num=1, max_retries=3, retry_delay=2
+):
+    """fetch_stock_list_capital_flow_async 的同步包装"""
+    return http_client.run_sync(
+        fetch_stock_list_capital_flow_async(
+            page_size, page_num, max_retries, retry_delay
+        )
+    )
+
+
+async def fetch_single_stock_capital_flow_async(
+    stock_code, max_retries=3, retry_delay=2
+):
     """
     获取单个股票的资金流向数据
 
@@ -121,7 +134,9 @@ def fetch_single_stock_capital_flow(stock_code, max_retries=3, retry_delay=2):
     """
     # 获取股票列表数据（多页搜索需要实现分页循环）
     for page in range(1, 10):  # 最多查找10页
-        stock_list = fetch_stock_list_capital_flow(50, page)
+        stock_list = await fetch_stock_list_capital_flow_async(
+            50, page, max_retries, retry_delay
+        )
         if not stock_list:
             break
 
@@ -141,6 +156,13 @@ def fetch_single_stock_capital_flow(stock_code, max_retries=3, retry_delay=2):
     return {"success": False, "message": f"未找到股票{stock_code}的资金流向数据", "data": {}}
 
 
+def fetch_single_stock_capital_flow(stock_code, max_retries=3, retry_delay=2):
+    """fetch_single_stock_capital_flow_async 的同步包装"""
+    return http_client.run_sync(
+        fetch_single_stock_capital_flow_async(stock_code, max_retries, retry_delay)
+    )
+
+
 def process_stock_list_data(stock_list, total_count):
     """
     处理股票列表资金流向数据
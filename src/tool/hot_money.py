@@ -9,9 +9,8 @@ from pydantic import Field
 
 from src.logger import logger
 from src.tool.base import BaseTool, ToolResult, get_recent_trading_day
-from src.tool.financial_deep_search.get_section_data import get_all_section
-from src.tool.financial_deep_search.index_capital import get_index_capital_flow
-from src.tool.financial_deep_search.stock_capital import get_stock_capital_flow
+from src.tool.executor import data_executor
+from src.tool.market_data import all_section, index_capital_flow, stock_capital_flow
 
 
 _HOT_MONEY_DESCRIPTION = """
@@ -116,22 +115,21 @@ class HotMoneyTool(BaseTool):
                     "daily_top_list": lambda: ef.stock.get_daily_billboard(
                         start_date=date, end_date=date
                     ),
-                    "hot_section_data": lambda: get_all_section(
-                        sector_types=sector_types
-                    ),
-                    "stock_net_flow": lambda: get_stock_capital_flow(
-                        stock_code=stock_code
-                    ),
-                    "index_net_flow": lambda: get_index_capital_flow(
+                    "hot_section_data": lambda: all_section(sector_types=sector_types),
+                    "stock_net_flow": lambda: stock_capital_flow(stock_code=stock_code),
+                    "index_net_flow": lambda: index_capital_flow(
                         index_code=actual_index_code
                     ),
                 }
 
-                # Retrieve each data source
-                for key, func in data_sources.items():
-                    result[key] = await self._get_data_with_retry(
-                        func, key, max_retry, sleep_seconds
+                # Retrieve all data sources concurrently
+                values = await asyncio.gather(
+                    *(
+                        self._get_data_with_retry(func, key, max_retry, sleep_seconds)
+                        for key, func in data_sources.items()
                     )
+                )
+                result.update(zip(data_sources.keys(), values))
 
                 return ToolResult(output=result)
 
@@ -154,35 +152,28 @@ class HotMoneyTool(BaseTool):
         Returns:
             Function return data or None
         """
-        last_error = None
-        for attempt in range(1, max_retry + 1):
-            try:
-                # Use asyncio.to_thread for synchronous operations
-                data = await asyncio.to_thread(func)
-
-                # Convert data based on type
-                if isinstance(data, pd.DataFrame):
-                    return data.to_dict(orient="records")
-                elif isinstance(data, pd.Series):
-                    return data.to_dict()
-                elif hasattr(data, "to_json"):
-                    return json.loads(data.to_json())
-
-                logger.info(f"[{data_name}] Data retrieved successfully")
-                return data
+        try:
+            # Blocking fetch runs in the shared data executor with async backoff
+            data = await data_executor.run(
+                func, retries=max_retry, backoff=sleep_seconds, name=data_name
+            )
 
-            except Exception as e:
-                last_error = str(e)
-                logger.warning(f"[{data_name}][Attempt {attempt}] Failed: {e}")
+            # Convert data based on type
+            if isinstance(data, pd.DataFrame):
+                return data.to_dict(orient="records")
+            elif isinstance(data, pd.Series):
+                return data.to_dict()
+            elif hasattr(data, "to_json"):
+                return json.loads(data.to_json())
 
-                if attempt < max_retry:
-                    await asyncio.sleep(sleep_seconds)
-                    logger.info(f"[{data_name}] Preparing attempt {attempt+1}...")
+            logger.info(f"[{data_name}] Data retrieved successfully")
+            return data
 
-        logger.error(
-            f"[{data_name}] Max retries ({max_retry}) reached, failed: {last_error}"
-        )
-        return None
+        except Exception as e:
+            logger.error(
+                f"[{data_name}] Max retries ({max_retry}) reached, failed: {e}"
+            )
+            return None
 
 
 if __name__ == "__main__":
@@ -0,0 +1,416 @@
+"""Technical indicator engine over OHLCV bars.
+
+Computes MA, EMA/MACD, RSI, KDJ, BOLL, ATR and volume ratios with the
+formulas used by A-share charting software (通达信 conventions: MACD bar is
+2 * (DIF - DEA), RSI/KDJ smooth with SMA(X, N, 1), BOLL uses the sample
+standard deviation, ATR is MA(TR, N)).
+
+The full history is computed at once with NumPy sliding windows and pandas'
+C-level exponential smoothing. New bars are added with ``append``, which
+computes only the new row from the previous row's smoothing state and the
+trailing windows; ``replace_last`` re-computes the current (still forming)
+bar. ``summary`` condenses the latest values and recent signals into a small
+dict for the LLM instead of raw bar rows.
+"""
+
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+MA_PERIODS = (5, 10, 20, 60)
+MACD_FAST, MACD_SLOW, MACD_SIGNAL = 12, 26, 9
+RSI_PERIODS = (6, 12, 24)
+KDJ_N, KDJ_M1, KDJ_M2 = 9, 3, 3
+BOLL_N, BOLL_K = 20, 2
+ATR_N = 14
+VOLUME_N = 5
+
+# Column names of efinance / akshare K-line frames
+BAR_COLUMNS = {"open": "开盘", "high": "最高", "low": "最低", "close": "收盘", "volume": "成交量"}
+
+_INPUTS = ("open", "high", "low", "close", "volume")
+
+
+# ----------------------------------------------------------------------
+# Vectorized primitives
+# ----------------------------------------------------------------------
+def _ma(x: np.ndarray, n: int) -> np.ndarray:
+    out = np.full(len(x), np.nan)
+    if len(x) >= n:
+        out[n - 1 :] = sliding_window_view(x, n).mean(axis=1)
+    return out
+
+
+def _std(x: np.ndarray, n: int) -> np.ndarray:
+    out = np.full(len(x), np.nan)
+    if len(x) >= n:
+        out[n - 1 :] = sliding_window_view(x, n).std(axis=1, ddof=1)
+    return out
+
+
+def _rolling_extreme(x: np.ndarray, n: int, ufunc: np.ufunc) -> np.ndarray:
+    """HHV/LLV; the first bars use the bars available so far."""
+    if len(x) == 0:
+        return x.copy()
+    padded = np.concatenate((np.full(n - 1, np.nan), x))
+    return ufunc.reduce(sliding_window_view(padded, n), axis=1)
+
+
+def _smooth(x: np.ndarray, alpha: float) -> np.ndarray:
+    """y[t] = alpha * x[t] + (1 - alpha) * y[t-1], starting at y[0] = x[0]."""
+    if len(x) == 0:
+        return x.copy()
+    return pd.Series(x).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+
+
+def _ema_alpha(n: int) -> float:
+    return 2 / (n + 1)
+
+
+def _rsv(close: np.ndarray, hhv: np.ndarray, llv: np.ndarray) -> np.ndarray:
+    span = hhv - llv
+    return np.where(span > 0, (close - llv) / np.where(span > 0, span, 1) * 100, 50.0)
+
+
+def _ratio(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(b > 0, a / b, np.nan)
+
+
+class IndicatorEngine:
+    """Indicator columns over a growing series of bars."""
+
+    def __init__(self, capacity: int = 256):
+        self._capacity = max(16, capacity)
+        self._length = 0
+        self._columns: Dict[str, np.ndarray] = {}
+
+    # ------------------------------------------------------------------
+    # Construction
+    # ------------------------------------------------------------------
+    @classmethod
+    def from_arrays(
+        cls,
+        open_: Sequence[float],
+        high: Sequence[float],
+        low: Sequence[float],
+        close: Sequence[float],
+        volume: Sequence[float],
+    ) -> "IndicatorEngine":
+        data = {
+            name: np.asarray(values, dtype=float)
+            for name, values in zip(_INPUTS, (open_, high, low, close, volume))
+        }
+        engine = cls(capacity=len(data["close"]) * 2)
+        engine._load(engine._compute(data))
+        return engine
+
+    @classmethod
+    def from_frame(
+        cls, df: pd.DataFrame, columns: Optional[Dict[str, str]] = None
+    ) -> "IndicatorEngine":
+        """Build from a K-line DataFrame with Chinese OHLCV column names."""
+        columns = columns or BAR_COLUMNS
+        return cls.from_arrays(
+            *(
+                pd.to_numeric(df[columns[name]], errors="coerce").to_numpy(dtype=float)
+                for name in _INPUTS
+            )
+        )
+
+    @staticmethod
+    def _compute(data: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        high, low = data["high"], data["low"]
+        close, volume = data["close"], data["volume"]
+        cols = dict(data)
+
+        for n in MA_PERIODS:
+            cols[f"ma{n}"] = _ma(close, n)
+
+        cols["ema_fast"] = _smooth(close, _ema_alpha(MACD_FAST))
+        cols["ema_slow"] = _smooth(close, _ema_alpha(MACD_SLOW))
+        cols["dif"] = cols["ema_fast"] - cols["ema_slow"]
+        cols["dea"] = _smooth(cols["dif"], _ema_alpha(MACD_SIGNAL))
+        cols["macd"] = 2 * (cols["dif"] - cols["dea"])
+
+        change = np.diff(close, prepend=close[:1]) if len(close) else close.copy()
+        for n in RSI_PERIODS:
+            cols[f"_rsi_up{n}"] = _smooth(np.maximum(change, 0), 1 / n)
+            cols[f"_rsi_abs{n}"] = _smooth(np.abs(change), 1 / n)
+            cols[f"rsi{n}"] = np.where(
+                cols[f"_rsi_abs{n}"] > 0,
+                _ratio(cols[f"_rsi_up{n}"], cols[f"_rsi_abs{n}"]) * 100,
+                50.0,
+            )
+
+        rsv = _rsv(
+            close,
+            _rolling_extreme(high, KDJ_N, np.fmax),
+            _rolling_extreme(low, KDJ_N, np.fmin),
+        )
+        cols["k"] = _smooth(rsv, 1 / KDJ_M1)
+        cols["d"] = _smooth(cols["k"], 1 / KDJ_M2)
+        cols["j"] = 3 * cols["k"] - 2 * cols["d"]
+
+        cols["boll_mid"] = _ma(close, BOLL_N)
+        width = BOLL_K * _std(close, BOLL_N)
+        cols["boll_upper"] = cols["boll_mid"] + width
+        cols["boll_lower"] = cols["boll_mid"] - width
+
+        prev_close = (
+            np.concatenate((close[:1], close[:-1])) if len(close) else close.copy()
+        )
+        true_range = np.fmax.reduce(
+            [high - low, np.abs(high - prev_close), np.abs(low - prev_close)]
+        )
+        cols["tr"] = true_range
+        cols["atr"] = _ma(true_range, ATR_N)
+
+        cols[f"vma{VOLUME_N}"] = _ma(volume, VOLUME_N)
+        # Volume against the average of the previous bars (量比)
+        previous = (
+            np.concatenate(([np.nan], cols[f"vma{VOLUME_N}"][:-1]))
+            if len(volume)
+            else volume.copy()
+        )
+        cols["volume_ratio"] = _ratio(volume, previous)
+        return cols
+
+    def _load(self, cols: Dict[str, np.ndarray]) -> None:
+        length = len(cols["close"])
+        self._capacity = max(self._capacity, length * 2)
+        self._columns = {}
+        for name, values in cols.items():
+            buffer = np.full(self._capacity, np.nan)
+            buffer[:length] = values
+            self._columns[name] = buffer
+        self._length = length
+
+    # ------------------------------------------------------------------
+    # Access
+    # ------------------------------------------------------------------
+    def __len__(self) -> int:
+        return self._length
+
+    def column(self, name: str) -> np.ndarray:
+        """View of one column over the bars so far."""
+        return self._columns[name][: self._length]
+
+    def latest(self, name: str, offset: int = 0) -> float:
+        index = self._length - 1 - offset
+        if index < 0:
+            return float("nan")
+        return float(self._columns[name][index])
+
+    def frame(self, tail: Optional[int] = None) -> pd.DataFrame:
+        """Public indicator columns as a DataFrame (copies)."""
+        start = 0 if tail is None else max(0, self._length - tail)
+        return pd.DataFrame(
+            {
+                name: values[start : self._length]
+                for name, values in self._columns.items()
+                if not name.startswith("_")
+            }
+        )
+
+    # ------------------------------------------------------------------
+    # Incremental updates
+    # ------------------------------------------------------------------
+    def append(
+        self, open_: float, high: float, low: float, close: float, volume: float
+    ) -> None:
+        """Add a new bar, computing only its row."""
+        bar = dict(zip(_INPUTS, (open_, high, low, close, volume)))
+        if self._length == 0:
+            first = {
+                name: np.array([value], dtype=float) for name, value in bar.items()
+            }
+            self._load(self._compute(first))
+            return
+        if self._length == self._capacity:
+            self._grow()
+
+        t = self._length
+        cols = self._columns
+        for name, value in bar.items():
+            cols[name][t] = value
+        self._length = t + 1
+
+        def window(name: str, n: int) -> Optional[np.ndarray]:
+            return cols[name][t - n + 1 : t + 1] if t + 1 >= n else None
+
+        def smooth(name: str, value: float, alpha: float) -> float:
+            cols[name][t] = cols[name][t - 1] + alpha * (value - cols[name][t - 1])
+            return cols[name][t]
+
+        for n in MA_PERIODS:
+            w = window("close", n)
+            cols[f"ma{n}"][t] = w.mean() if w is not None else np.nan
+
+        fast = smooth("ema_fast", close, _ema_alpha(MACD_FAST))
+        slow = smooth("ema_slow", close, _ema_alpha(MACD_SLOW))
+        cols["dif"][t] = fast - slow
+        dea = smooth("dea", cols["dif"][t], _ema_alpha(MACD_SIGNAL))
+        cols["macd"][t] = 2 * (cols["dif"][t] - dea)
+
+        change = close - cols["close"][t - 1]
+        for n in RSI_PERIODS:
+            up = smooth(f"_rsi_up{n}", max(change, 0.0), 1 / n)
+            total = smooth(f"_rsi_abs{n}", abs(change), 1 / n)
+            cols[f"rsi{n}"][t] = up / total * 100 if total > 0 else 50.0
+
+        start = max(0, t - KDJ_N + 1)
+        hhv = np.fmax.reduce(cols["high"][start : t + 1])
+        llv = np.fmin.reduce(cols["low"][start : t + 1])
+        rsv = (close - llv) / (hhv - llv) * 100 if hhv - llv > 0 else 50.0
+        k = smooth("k", rsv, 1 / KDJ_M1)
+        d = smooth("d", k, 1 / KDJ_M2)
+        cols["j"][t] = 3 * k - 2 * d
+
+        w = window("close", BOLL_N)
+        if w is not None:
+            mid, width = w.mean(), BOLL_K * w.std(ddof=1)
+            cols["boll_mid"][t] = mid
+            cols["boll_upper"][t] = mid + width
+            cols["boll_lower"][t] = mid - width
+        else:
+            cols["boll_mid"][t] = cols["boll_upper"][t] = cols["boll_lower"][t] = np.nan
+
+        prev_close = cols["close"][t - 1]
+        cols["tr"][t] = np.fmax.reduce(
+            [high - low, abs(high - prev_close), abs(low - prev_close)]
+        )
+        w = window("tr", ATR_N)
+        cols["atr"][t] = w.mean() if w is not None else np.nan
+
+        w = window("volume", VOLUME_N)
+        cols[f"vma{VOLUME_N}"][t] = w.mean() if w is not None else np.nan
+        previous = cols[f"vma{VOLUME_N}"][t - 1]
+        cols["volume_ratio"][t] = volume / previous if previous > 0 else np.nan
+
+    def replace_last(
+        self, open_: float, high: float, low: float, close: float, volume: float
+    ) -> None:
+        """Update the last bar (a bar still forming), re-computing only its row."""
+        if self._length == 0:
+            raise IndexError("no bar to replace")
+        self._length -= 1
+        if self._length == 0:
+            self._columns = {}
+        self.append(open_, high, low, close, volume)
+
+    def _grow(self) -> None:
+        self._capacity *= 2
+        for name, values in self._columns.items():
+            buffer = np.full(self._capacity, np.nan)
+            buffer[: self._length] = values[: self._length]
+            self._columns[name] = buffer
+
+    # ------------------------------------------------------------------
+    # Summary
+    # ------------------------------------------------------------------
+    def _cross(self, fast: str, slow: str, lookback: int) -> Optional[Dict[str, Any]]:
+        """Most recent crossing of two columns within ``lookback`` bars."""
+        a, b = self.column(fast), self.column(slow)
+        count = min(lookback + 1, len(a))
+        if count < 2:
+            return None
+        diff = np.sign(a[-count:] - b[-count:])
+        changes = np.flatnonzero(diff[1:] * diff[:-1] < 0)
+        if len(changes) == 0:
+            return None
+        index = changes[-1] + 1
+        return {
+            "type": "金叉" if diff[index] > 0 else "死叉",
+            "bars_ago": int(count - 1 - index),
+        }
+
+    def _change(self, bars: int) -> Optional[float]:
+        if self._length <= bars:
+            return None
+        base = self.latest("close", bars)
+        return round((self.latest("close") / base - 1) * 100, 2) if base > 0 else None
+
+    def summary(self, lookback: int = 5) -> Dict[str, Any]:
+        """Latest indicator values and signals of the last ``lookback`` bars."""
+        if self._length == 0:
+            return {}
+
+        def value(name: str, digits: int = 2) -> Optional[float]:
+            v = self.latest(name)
+            return None if np.isnan(v) else round(v, digits)
+
+        close = self.latest("close")
+        mas = {f"ma{n}": value(f"ma{n}") for n in MA_PERIODS}
+        ma_values = [mas[f"ma{n}"] for n in MA_PERIODS]
+        if None in ma_values:
+            alignment = "数据不足"
+        elif all(a > b for a, b in zip(ma_values, ma_values[1:])):
+            alignment = "多头排列"
+        elif all(a < b for a, b in zip(ma_values, ma_values[1:])):
+            alignment = "空头排列"
+        else:
+            alignment = "均线交织"
+
+        rsi = {f"rsi{n}": value(f"rsi{n}") for n in RSI_PERIODS}
+        rsi_short = rsi[f"rsi{RSI_PERIODS[0]}"]
+        rsi_state = (
+            "超买"
+            if rsi_short and rsi_short > 80
+            else "超卖"
+            if rsi_short is not None and rsi_short < 20
+            else "中性"
+        )
+
+        upper, lower = self.latest("boll_upper"), self.latest("boll_lower")
+        percent_b = (close - lower) / (upper - lower) if upper - lower > 0 else None
+        histogram = self.column("macd")[-3:]
+        atr = self.latest("atr")
+
+        recent = slice(max(0, self._length - 20), self._length)
+        return {
+            "close": round(close, 2),
+            "change_pct": {f"{n}d": self._change(n) for n in (1, 5, 20)},
+            "range_20": {
+                "high": round(float(np.nanmax(self.column("high")[recent])), 2),
+                "low": round(float(np.nanmin(self.column("low")[recent])), 2),
+            },
+            "ma": {**mas, "alignment": alignment},
+            "macd": {
+                "dif": value("dif", 3),
+                "dea": value("dea", 3),
+                "macd": value("macd", 3),
+                "cross": self._cross("dif", "dea", lookback),
+                "histogram": "放大"
+                if len(histogram) > 1 and abs(histogram[-1]) > abs(histogram[-2])
+                else "收缩",
+            },
+            "rsi": {**rsi, "state": rsi_state},
+            "kdj": {
+                "k": value("k"),
+                "d": value("d"),
+                "j": value("j"),
+                "cross": self._cross("k", "d", lookback),
+            },
+            "boll": {
+                "upper": value("boll_upper"),
+                "mid": value("boll_mid"),
+                "lower": value("boll_lower"),
+                "percent_b": None
+                if percent_b is None or np.isnan(percent_b)
+                else round(float(percent_b), 2),
+            },
+            "atr": {
+                "atr": value("atr", 3),
+                "atr_pct": None
+                if np.isnan(atr) or close <= 0
+                else round(atr / close * 100, 2),
+            },
+            "volume": {
+                f"vma{VOLUME_N}": value(f"vma{VOLUME_N}", 0),
+                "volume_ratio": value("volume_ratio"),
+            },
+        }
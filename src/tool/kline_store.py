@@ -0,0 +1,377 @@
+"""
+本地K线存储
+
+Append-only columnar store of K-line bars per symbol, period and adjustment
+(``cache/klines/<period>_<adjust>/<symbol>/``). Every column is a raw
+little-endian file (dates as int64 days, prices and volumes as float64) plus
+a ``meta.json`` holding the row count and until when the data is fresh.
+
+The first read of a symbol downloads its full history once. Later syncs
+fetch only from the second-to-last stored bar onwards:
+
+- the second-to-last bar is final and must come back unchanged; if it does
+  not (a forward-adjusted history shifted after a dividend) the history is
+  downloaded again in full;
+- the last stored bar may have been still forming and is overwritten, and
+  newer bars are appended.
+
+Reads map the column files with ``np.memmap`` and return slices of the
+mapping, so repeat reads copy nothing until a DataFrame is built.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.config import PROJECT_ROOT, config
+from src.logger import logger
+from src.tool.data_cache import data_cache
+
+
+try:
+    import akshare as ak  # type: ignore
+except ImportError:
+    ak = None  # type: ignore
+
+try:
+    import efinance as ef  # type: ignore
+except ImportError:
+    ef = None  # type: ignore
+
+
+# Stored columns: file name -> column of the akshare/efinance K-line frame
+COLUMNS = {
+    "open": "开盘",
+    "close": "收盘",
+    "high": "最高",
+    "low": "最低",
+    "volume": "成交量",
+    "amount": "成交额",
+    "amplitude": "振幅",
+    "pct_change": "涨跌幅",
+    "change": "涨跌额",
+    "turnover": "换手率",
+}
+DATE_COLUMN = "日期"
+
+PERIODS = {"daily": 101, "weekly": 102, "monthly": 103}
+ADJUSTS = {"": 0, "qfq": 1, "hfq": 2}
+
+# Series whose column mappings are kept open, least recently used dropped first
+MAX_OPEN_SERIES = 64
+# An open series: (version, rows, column mappings)
+_OpenSeries = Tuple[int, int, Dict[str, np.ndarray]]
+
+_EPOCH_START = "19700101"
+_FAR_END = "20500101"
+
+
+def _fetch_upstream(
+    symbol: str, period: str, adjust: str, start_date: str
+) -> pd.DataFrame:
+    """Bars from ``start_date`` (YYYYMMDD) onwards; akshare first, then efinance."""
+    if ak is not None:
+        try:
+            return ak.stock_zh_a_hist(
+                symbol=symbol,
+                period=period,
+                start_date=start_date,
+                end_date=_FAR_END,
+                adjust=adjust,
+            )
+        except Exception as e:
+            if ef is None:
+                raise
+            logger.warning(f"stock_zh_a_hist failed for {symbol}, trying efinance: {e}")
+    if ef is None:
+        raise RuntimeError("Neither akshare nor efinance is installed")
+    return ef.stock.get_quote_history(
+        symbol, beg=start_date, klt=PERIODS[period], fqt=ADJUSTS[adjust]
+    )
+
+
+@data_cache.cached("daily", namespace="akshare.stock_zh_a_hist")
+def _fetch_full_history(**kwargs) -> pd.DataFrame:
+    # Used when the store is disabled: the whole history, cached until the next close
+    return ak.stock_zh_a_hist(**kwargs)
+
+
+def _to_days(dates) -> np.ndarray:
+    return (
+        pd.to_datetime(pd.Series(dates), errors="coerce")
+        .to_numpy("datetime64[D]")
+        .astype(np.int64)
+    )
+
+
+def _day_of(date: Optional[str]) -> Optional[int]:
+    """YYYYMMDD (or any pandas-parsable date) to days since the epoch."""
+    if not date:
+        return None
+    return int(np.datetime64(pd.Timestamp(date).date(), "D").astype(np.int64))
+
+
+def _normalize(df: Optional[pd.DataFrame]) -> Dict[str, np.ndarray]:
+    """Upstream frame to column arrays, sorted by date, one row per date."""
+    if df is None or df.empty or DATE_COLUMN not in df.columns:
+        return {}
+    days = _to_days(df[DATE_COLUMN])
+    valid = days > np.iinfo(np.int64).min
+    order = np.argsort(days[valid], kind="stable")
+    data = {"date": days[valid][order]}
+    for name, column in COLUMNS.items():
+        values = (
+            pd.to_numeric(df[column], errors="coerce").to_numpy(dtype=np.float64)
+            if column in df.columns
+            else np.full(len(df), np.nan)
+        )
+        data[name] = values[valid][order]
+    # Keep the last row of duplicated dates
+    keep = (
+        np.append(data["date"][1:] != data["date"][:-1], True)
+        if len(order)
+        else np.array([], dtype=bool)
+    )
+    return {name: values[keep] for name, values in data.items()}
+
+
+class KlineStore:
+    """Local append-only K-line store with memory-mapped reads."""
+
+    def __init__(
+        self,
+        root: Path,
+        enabled: bool = True,
+        fetcher: Callable[[str, str, str, str], pd.DataFrame] = _fetch_upstream,
+    ):
+        self.root = Path(root)
+        self.enabled = enabled
+        self.fetcher = fetcher
+        self._lock = threading.Lock()
+        self._key_locks: Dict[Tuple[str, str, str], threading.Lock] = {}
+        # Open mappings per series, least recently used first
+        self._maps: "OrderedDict[Tuple[str, str, str], _OpenSeries]" = OrderedDict()
+
+    # ------------------------------------------------------------------
+    # Layout
+    # ------------------------------------------------------------------
+    def _dir(self, key: Tuple[str, str, str]) -> Path:
+        symbol, period, adjust = key
+        return self.root / f"{period}_{adjust or 'none'}" / symbol
+
+    def _key_lock(self, key: Tuple[str, str, str]) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    @staticmethod
+    def _read_meta(path: Path) -> Dict:
+        try:
+            with open(path / "meta.json", "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"rows": 0, "version": 0, "fresh_until": 0}
+
+    @staticmethod
+    def _write_meta(path: Path, meta: Dict) -> None:
+        tmp = path / f"meta.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, path / "meta.json")
+
+    @staticmethod
+    def _column_path(path: Path, name: str) -> Path:
+        return path / f"{name}.bin"
+
+    @staticmethod
+    def _dtype(name: str) -> np.dtype:
+        return np.dtype("<i8") if name == "date" else np.dtype("<f8")
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+    def _rewrite(self, path: Path, data: Dict[str, np.ndarray], meta: Dict) -> None:
+        """Replace the whole series; open mappings keep the old files."""
+        path.mkdir(parents=True, exist_ok=True)
+        for name, values in data.items():
+            target = self._column_path(path, name)
+            tmp = target.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_bytes(values.astype(self._dtype(name)).tobytes())
+            os.replace(tmp, target)
+        meta.update(rows=len(data["date"]), version=meta.get("version", 0) + 1)
+
+    def _write_from(
+        self, path: Path, data: Dict[str, np.ndarray], offset: int, meta: Dict
+    ) -> None:
+        """Write rows at ``offset``; the series never shrinks, so mappings stay valid."""
+        for name, values in data.items():
+            with open(self._column_path(path, name), "r+b") as f:
+                f.seek(offset * self._dtype(name).itemsize)
+                f.write(values.astype(self._dtype(name)).tobytes())
+        meta["rows"] = offset + len(data["date"])
+
+    def sync(self, symbol: str, period: str = "daily", adjust: str = "") -> int:
+        """Bring a series up to date; returns the number of rows fetched."""
+        key = (symbol, period, adjust)
+        path = self._dir(key)
+        with self._key_lock(key):
+            meta = self._read_meta(path)
+            if time.time() < meta.get("fresh_until", 0):
+                return 0
+
+            rows = meta.get("rows", 0)
+            stored = self._open(key, meta) if rows >= 2 else None
+            fetched: Dict[str, np.ndarray] = {}
+            if stored is not None:
+                anchor = rows - 2
+                anchor_day = int(stored["date"][anchor])
+                start = str(np.datetime64(anchor_day, "D")).replace("-", "")
+                fetched = _normalize(self.fetcher(symbol, period, adjust, start))
+                consistent = (
+                    len(fetched.get("date", ())) >= 2
+                    and fetched["date"][0] == anchor_day
+                    and np.isclose(
+                        fetched["close"][0],
+                        stored["close"][anchor],
+                        rtol=1e-9,
+                        atol=1e-9,
+                    )
+                )
+                if consistent:
+                    self._write_from(path, fetched, anchor, meta)
+                else:
+                    logger.info(
+                        f"K-line history of {symbol} ({period}/{adjust or 'none'}) changed, refetching"
+                    )
+                    fetched = {}
+
+            if not fetched:
+                fetched = _normalize(self.fetcher(symbol, period, adjust, _EPOCH_START))
+                if not fetched:
+                    return 0
+                self._rewrite(path, fetched, meta)
+                # The old mapping points at the replaced files
+                with self._lock:
+                    self._maps.pop(key, None)
+
+            meta["fresh_until"] = data_cache.expires_at("daily")
+            meta["synced_at"] = time.time()
+            self._write_meta(path, meta)
+            return len(fetched["date"])
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+    def _open(self, key: Tuple[str, str, str], meta: Dict) -> Dict[str, np.ndarray]:
+        rows, version = meta.get("rows", 0), meta.get("version", 0)
+        with self._lock:
+            cached = self._maps.get(key)
+            if cached is not None and cached[0] == version and cached[1] >= rows:
+                self._maps.move_to_end(key)
+                return {name: values[:rows] for name, values in cached[2].items()}
+
+        path = self._dir(key)
+        columns = {
+            name: np.memmap(
+                self._column_path(path, name),
+                dtype=self._dtype(name),
+                mode="r",
+                shape=(rows,),
+            )
+            for name in ("date", *COLUMNS)
+        }
+        with self._lock:
+            self._maps[key] = (version, rows, columns)
+            self._maps.move_to_end(key)
+            while len(self._maps) > MAX_OPEN_SERIES:
+                self._maps.popitem(last=False)
+        return columns
+
+    def columns(
+        self,
+        symbol: str,
+        period: str = "daily",
+        adjust: str = "",
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        count: Optional[int] = None,
+    ) -> Dict[str, np.ndarray]:
+        """Read-only column views (``date`` as datetime64[D]) without copying.
+
+        Dates use akshare's YYYYMMDD format; ``count`` keeps the last bars of
+        the range. When the sync fails, stored bars are served; the error is
+        raised only if nothing is stored yet.
+        """
+        key = (symbol, period, adjust)
+        try:
+            self.sync(symbol, period, adjust)
+        except Exception as e:
+            if self._read_meta(self._dir(key)).get("rows", 0) == 0:
+                raise
+            logger.warning(f"K-line sync failed for {symbol}, using stored bars: {e}")
+        meta = self._read_meta(self._dir(key))
+        if meta.get("rows", 0) == 0:
+            return {
+                "date": np.array([], dtype="datetime64[D]"),
+                **{name: np.array([]) for name in COLUMNS},
+            }
+
+        data = self._open(key, meta)
+        dates = data["date"]
+        first, last = _day_of(start_date), _day_of(end_date)
+        lo = int(np.searchsorted(dates, first, side="left")) if first is not None else 0
+        hi = (
+            int(np.searchsorted(dates, last, side="right"))
+            if last is not None
+            else len(dates)
+        )
+        if count is not None:
+            lo = max(lo, hi - count)
+        views = {name: values[lo:hi] for name, values in data.items()}
+        views["date"] = views["date"].view("datetime64[D]")
+        return views
+
+    def frame(
+        self,
+        symbol: str,
+        period: str = "daily",
+        adjust: str = "",
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        count: Optional[int] = None,
+    ) -> pd.DataFrame:
+        """Bars as an ``ak.stock_zh_a_hist`` style DataFrame (dates as datetime.date)."""
+        if not self.enabled:
+            kwargs = {"symbol": symbol, "period": period, "adjust": adjust}
+            if start_date:
+                kwargs["start_date"] = start_date
+            if end_date:
+                kwargs["end_date"] = end_date
+            df = _fetch_full_history(**kwargs)
+            return df.tail(count).reset_index(drop=True) if count is not None else df
+
+        views = self.columns(symbol, period, adjust, start_date, end_date, count)
+        df = pd.DataFrame(
+            {column: np.asarray(views[name]) for name, column in COLUMNS.items()}
+        )
+        df.insert(0, DATE_COLUMN, pd.to_datetime(views["date"]).date)
+        df.insert(1, "股票代码", symbol)
+        return df
+
+
+def _create_kline_store() -> KlineStore:
+    settings = config.kline_store_config
+    store_dir = Path(settings.store_dir)
+    if not store_dir.is_absolute():
+        store_dir = PROJECT_ROOT / store_dir
+    return KlineStore(store_dir, enabled=settings.enabled)
+
+
+# 全局K线存储实例
+kline_store = _create_kline_store()
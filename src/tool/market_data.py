@@ -0,0 +1,344 @@
+"""Per-run market data snapshot shared by the specialist tools.
+
+ResearchEnvironment prefetches the datasets that several tools need (stock
+capital flow, sector boards, index capital flow and daily K-line history)
+once per stock and installs the result in a context variable. Tools read
+through the accessors below, which serve from the snapshot when it holds the
+requested data and fall back to a live fetch otherwise, so every tool keeps
+working when it is called outside a research run. Live fetches go through
+the data cache, so a repeat analysis on the same day reuses fetched data;
+daily bars come from the local K-line store, which only downloads new bars.
+
+Batch runs additionally install a market-wide snapshot (sector boards, index
+flows, the big-deal tape, the fund-flow ranking and the spot table) fetched
+once for the whole batch; per-stock snapshots are seeded from it.
+"""
+
+import asyncio
+import time
+from contextvars import ContextVar, Token
+from typing import Any, Callable, Dict, Iterable, Optional
+
+import pandas as pd
+
+from src.logger import logger
+from src.tool.data_cache import data_cache, is_cacheable
+from src.tool.executor import data_executor
+from src.tool.financial_deep_search.get_section_data import get_all_section
+from src.tool.financial_deep_search.index_capital import get_index_capital_flow
+from src.tool.financial_deep_search.stock_capital import get_stock_capital_flow
+from src.tool.kline_store import kline_store
+from src.tool.spot_snapshot import spot_snapshot
+
+
+try:
+    import akshare as ak  # type: ignore
+except ImportError:
+    ak = None  # type: ignore
+
+
+DEFAULT_INDEX_CODES = ("000001",)
+# Adjustments of the daily history prefetched per stock
+HIST_ADJUSTS = ("", "qfq")
+
+# Cached live fetchers; intraday data only briefly, daily bars until the next close
+_fetch_stock_capital_flow = data_cache.cached("realtime")(get_stock_capital_flow)
+_fetch_index_capital_flow = data_cache.cached("realtime")(get_index_capital_flow)
+_fetch_all_section = data_cache.cached("realtime")(get_all_section)
+
+
+@data_cache.cached("realtime", namespace="akshare.stock_fund_flow_big_deal")
+def _fetch_big_deal() -> pd.DataFrame:
+    return ak.stock_fund_flow_big_deal()
+
+
+@data_cache.cached("realtime", namespace="akshare.stock_fund_flow_individual")
+def _fetch_fund_flow_rank(symbol: str) -> pd.DataFrame:
+    return ak.stock_fund_flow_individual(symbol=symbol)
+
+
+class MarketDataSnapshot:
+    """Datasets fetched once for a single stock analysis run."""
+
+    def __init__(self, stock_code: str):
+        self.stock_code = stock_code
+        self.created_at = time.time()
+        self._data: Dict[str, Any] = {}
+
+    def has(self, key: str) -> bool:
+        return key in self._data
+
+    def get(self, key: str) -> Any:
+        return self._data.get(key)
+
+    def set(self, key: str, value: Any) -> None:
+        self._data[key] = value
+
+    def keys(self) -> list:
+        return list(self._data.keys())
+
+
+_current_snapshot: ContextVar[Optional[MarketDataSnapshot]] = ContextVar(
+    "market_data_snapshot", default=None
+)
+
+
+def get_current_snapshot() -> Optional[MarketDataSnapshot]:
+    """Return the snapshot installed for the current run, if any."""
+    return _current_snapshot.get()
+
+
+def set_current_snapshot(snapshot: Optional[MarketDataSnapshot]) -> Token:
+    """Install a snapshot for the current context; returns a token for reset."""
+    return _current_snapshot.set(snapshot)
+
+
+def reset_current_snapshot(token: Token) -> None:
+    """Restore the snapshot that was active before set_current_snapshot."""
+    _current_snapshot.reset(token)
+
+
+_market_snapshot: ContextVar[Optional[MarketDataSnapshot]] = ContextVar(
+    "market_wide_snapshot", default=None
+)
+
+
+def get_market_snapshot() -> Optional[MarketDataSnapshot]:
+    """Return the market-wide snapshot installed for the current batch, if any."""
+    return _market_snapshot.get()
+
+
+def set_market_snapshot(snapshot: Optional[MarketDataSnapshot]) -> Token:
+    """Install a market-wide snapshot; analyses started afterwards inherit it."""
+    return _market_snapshot.set(snapshot)
+
+
+def reset_market_snapshot(token: Token) -> None:
+    _market_snapshot.reset(token)
+
+
+def _lookup(key: str) -> Optional[Any]:
+    """Find a dataset in the per-stock snapshot, then in the market-wide one."""
+    for snapshot in (get_current_snapshot(), get_market_snapshot()):
+        if snapshot is not None and snapshot.has(key):
+            logger.debug(f"Serving {key} from market data snapshot")
+            return snapshot.get(key)
+    return None
+
+
+def _capital_flow_key(stock_code: str) -> str:
+    return f"stock_capital_flow:{stock_code}"
+
+
+def _index_flow_key(index_code: str) -> str:
+    return f"index_capital_flow:{index_code}"
+
+
+def _hist_key(symbol: str, period: str, adjust: str) -> str:
+    return f"stock_hist:{symbol}:{period}:{adjust}"
+
+
+def _fund_flow_rank_key(symbol: str) -> str:
+    return f"fund_flow_rank:{symbol}"
+
+
+_SECTION_KEY = "all_section"
+_BIG_DEAL_KEY = "big_deal"
+
+
+async def _gather_into(
+    snapshot: MarketDataSnapshot, fetchers: Dict[str, Callable[[], Any]]
+) -> None:
+    outcomes = await asyncio.gather(
+        *(data_executor.run(func, name=key) for key, func in fetchers.items()),
+        return_exceptions=True,
+    )
+    for key, outcome in zip(fetchers.keys(), outcomes):
+        if isinstance(outcome, BaseException):
+            logger.warning(f"Prefetch of {key} failed: {outcome}")
+        elif is_cacheable(outcome):
+            snapshot.set(key, outcome)
+        else:
+            logger.warning(f"Prefetch of {key} returned no data")
+
+
+async def prefetch_market_wide(
+    index_codes: Iterable[str] = DEFAULT_INDEX_CODES, rank_symbol: str = "即时"
+) -> MarketDataSnapshot:
+    """Fetch the datasets that do not depend on the stock, once per batch."""
+    snapshot = MarketDataSnapshot("*")
+
+    fetchers: Dict[str, Callable[[], Any]] = {
+        _SECTION_KEY: lambda: _fetch_all_section(sector_types="all"),
+    }
+    for index_code in index_codes:
+        key = _index_flow_key(index_code)
+        fetchers[key] = lambda code=index_code: _fetch_index_capital_flow(
+            index_code=code
+        )
+    if ak is not None:
+        fetchers[_BIG_DEAL_KEY] = _fetch_big_deal
+        fetchers[_fund_flow_rank_key(rank_symbol)] = lambda: _fetch_fund_flow_rank(
+            rank_symbol
+        )
+
+    start = time.monotonic()
+    spot_refresh = data_executor.run_safe(
+        spot_snapshot.refresh, force=True, name="spot_snapshot_refresh"
+    )
+    await asyncio.gather(_gather_into(snapshot, fetchers), spot_refresh)
+
+    logger.info(
+        f"Prefetched {len(snapshot.keys())}/{len(fetchers)} market-wide datasets "
+        f"in {time.monotonic() - start:.2f}s"
+    )
+    return snapshot
+
+
+async def prefetch_market_data(
+    stock_code: str, index_codes: Iterable[str] = DEFAULT_INDEX_CODES
+) -> MarketDataSnapshot:
+    """Fetch the shared datasets for a stock concurrently.
+
+    Failures are logged and simply left out of the snapshot; the tools then
+    fetch those datasets themselves.
+    """
+    snapshot = MarketDataSnapshot(stock_code)
+
+    # Market-wide datasets already fetched for the batch are shared, not refetched
+    market = get_market_snapshot()
+    if market is not None:
+        for key in market.keys():
+            snapshot.set(key, market.get(key))
+
+    fetchers: Dict[str, Callable[[], Any]] = {
+        _capital_flow_key(stock_code): lambda: _fetch_stock_capital_flow(
+            stock_code=stock_code
+        ),
+        _SECTION_KEY: lambda: _fetch_all_section(sector_types="all"),
+    }
+    for index_code in index_codes:
+        key = _index_flow_key(index_code)
+        fetchers[key] = lambda code=index_code: _fetch_index_capital_flow(
+            index_code=code
+        )
+    if ak is not None:
+        # Unadjusted bars for price levels, forward-adjusted ones for indicators
+        for adjust in HIST_ADJUSTS:
+            key = _hist_key(stock_code, "daily", adjust)
+            fetchers[key] = lambda adjust=adjust: kline_store.frame(
+                stock_code, "daily", adjust
+            )
+
+    fetchers = {key: func for key, func in fetchers.items() if not snapshot.has(key)}
+
+    start = time.monotonic()
+    await _gather_into(snapshot, fetchers)
+
+    logger.info(
+        f"Prefetched {len(snapshot.keys())} market datasets for {stock_code} "
+        f"({len(fetchers)} fetched) in {time.monotonic() - start:.2f}s"
+    )
+    return snapshot
+
+
+def stock_capital_flow(stock_code: str) -> Dict[str, Any]:
+    """get_stock_capital_flow(stock_code=...) served from the snapshot when possible."""
+    data = _lookup(_capital_flow_key(stock_code))
+    if data is not None:
+        return data
+    return _fetch_stock_capital_flow(stock_code=stock_code)
+
+
+def index_capital_flow(index_code: str = "000001") -> Dict[str, Any]:
+    """get_index_capital_flow served from the snapshot when possible."""
+    data = _lookup(_index_flow_key(index_code))
+    if data is not None:
+        return data
+    return _fetch_index_capital_flow(index_code=index_code)
+
+
+def market_big_deal(copy: bool = True) -> pd.DataFrame:
+    """ak.stock_fund_flow_big_deal served from the snapshot when possible.
+
+    Returns a copy unless ``copy`` is False, for callers that only read it.
+    """
+    df = _lookup(_BIG_DEAL_KEY)
+    if df is None:
+        df = _fetch_big_deal()
+    return df.copy() if df is not None and copy else df
+
+
+def fund_flow_rank(symbol: str = "即时") -> pd.DataFrame:
+    """ak.stock_fund_flow_individual served from the snapshot when possible."""
+    df = _lookup(_fund_flow_rank_key(symbol))
+    if df is None:
+        df = _fetch_fund_flow_rank(symbol)
+    return df.copy() if df is not None else None
+
+
+def all_section(sector_types: Optional[str] = "all") -> Dict[str, Any]:
+    """get_all_section served from the snapshot when possible.
+
+    The snapshot holds every board type, so a request for a subset such as
+    'hot' or 'concept,industry' is answered by filtering it.
+    """
+    full = _lookup(_SECTION_KEY)
+    if full is None:
+        return _fetch_all_section(sector_types=sector_types)
+
+    if sector_types is None or sector_types == "all":
+        return full
+
+    if isinstance(sector_types, str):
+        requested = [t.strip() for t in sector_types.split(",")]
+    elif isinstance(sector_types, list):
+        requested = sector_types
+    else:
+        return _fetch_all_section(sector_types=sector_types)
+
+    available = full.get("data", {})
+    if not all(t in available for t in requested):
+        return _fetch_all_section(sector_types=sector_types)
+
+    return {
+        **full,
+        "message": f"成功获取板块数据: {', '.join(requested)}",
+        "data": {t: available[t] for t in requested},
+    }
+
+
+def stock_hist(
+    symbol: str,
+    period: str = "daily",
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    adjust: str = "",
+    count: Optional[int] = None,
+) -> pd.DataFrame:
+    """ak.stock_zh_a_hist served from the snapshot when possible.
+
+    Dates use akshare's YYYYMMDD format; the snapshot holds the full history
+    and is sliced to the requested range. ``count`` keeps the last bars of
+    the range. Outside a snapshot the bars come from the local K-line store.
+    """
+    snapshot = get_current_snapshot()
+    key = _hist_key(symbol, period, adjust)
+    if snapshot is None or not snapshot.has(key):
+        return kline_store.frame(symbol, period, adjust, start_date, end_date, count)
+
+    df = snapshot.get(key)
+    if not start_date and not end_date:
+        df = df.tail(count) if count is not None else df
+        return df.reset_index(drop=True)
+
+    dates = pd.to_datetime(df["日期"])
+    mask = pd.Series(True, index=df.index)
+    if start_date:
+        mask &= dates >= pd.to_datetime(start_date, format="%Y%m%d")
+    if end_date:
+        mask &= dates <= pd.to_datetime(end_date, format="%Y%m%d")
+    df = df.loc[mask]
+    if count is not None:
+        df = df.tail(count)
+    return df.reset_index(drop=True)
@@ -0,0 +1,305 @@
+"""
+分钟K线存储
+
+Intraday 1-minute bars kept per symbol and trading day
+(``cache/minutes/<symbol>/<YYYYMMDD>/``) as fixed-width column files: the bar
+time as int64 minutes since the epoch, prices and rates as float32, volume
+as int64 and amount as float64. Every file is preallocated for a full
+session, so a sync writes the new minutes in place and memory maps opened by
+readers stay valid while the day fills up.
+
+``columns`` returns read-only NumPy views of one day, which the indicator
+engine consumes directly; no per-bar Python objects are built.
+"""
+
+import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.config import PROJECT_ROOT, config
+from src.logger import logger
+from src.tool.data_cache import data_cache, next_market_close
+
+
+try:
+    import efinance as ef  # type: ignore
+except ImportError:
+    ef = None  # type: ignore
+
+
+# Column file name -> (dtype, column of the efinance minute frame)
+COLUMNS = {
+    "time": ("<i8", "日期"),
+    "open": ("<f4", "开盘"),
+    "close": ("<f4", "收盘"),
+    "high": ("<f4", "最高"),
+    "low": ("<f4", "最低"),
+    "volume": ("<i8", "成交量"),
+    "amount": ("<f8", "成交额"),
+    "pct_change": ("<f4", "涨跌幅"),
+    "turnover": ("<f4", "换手率"),
+}
+
+# 09:30-11:30 and 13:01-15:00 give 241 bars; the rest is headroom
+SESSION_CAPACITY = 256
+# Days whose column mappings are kept open, least recently used dropped first
+MAX_OPEN_DAYS = 64
+# An open day: (capacity, column mappings)
+_OpenDay = Tuple[int, Dict[str, np.ndarray]]
+# Minutes from the 15:00 close back to the 09:30 open of the same day
+_CLOSE_TO_OPEN = timedelta(hours=5, minutes=30)
+
+
+def _fetch_upstream(symbol: str) -> pd.DataFrame:
+    """The latest trading day of 1-minute bars."""
+    if ef is None:
+        raise RuntimeError("efinance is not installed")
+    return ef.stock.get_quote_history(symbol, klt=1)
+
+
+def _normalize(df: Optional[pd.DataFrame]) -> Dict[str, np.ndarray]:
+    """Upstream frame to column arrays sorted by time, one row per minute."""
+    if df is None or df.empty or "日期" not in df.columns:
+        return {}
+    minutes = (
+        pd.to_datetime(df["日期"], errors="coerce")
+        .to_numpy("datetime64[m]")
+        .astype(np.int64)
+    )
+    valid = minutes > np.iinfo(np.int64).min
+    order = np.argsort(minutes[valid], kind="stable")
+    data = {"time": minutes[valid][order]}
+    for name, (dtype, column) in COLUMNS.items():
+        if name == "time":
+            continue
+        values = (
+            pd.to_numeric(df[column], errors="coerce").to_numpy(dtype=np.float64)
+            if column in df.columns
+            else np.full(len(df), np.nan)
+        )
+        if np.dtype(dtype).kind == "i":
+            values = np.nan_to_num(values)
+        data[name] = values[valid][order].astype(dtype)
+    keep = (
+        np.append(data["time"][1:] != data["time"][:-1], True)
+        if len(order)
+        else np.array([], dtype=bool)
+    )
+    return {name: values[keep] for name, values in data.items()}
+
+
+def to_frame(bars: Dict[str, np.ndarray]) -> pd.DataFrame:
+    """Column views as an efinance style minute frame (prices rounded back to 3 decimals)."""
+    df = pd.DataFrame(
+        {
+            column: np.round(bars[name].astype(np.float64), 3)
+            if np.dtype(dtype).kind == "f"
+            else np.asarray(bars[name])
+            for name, (dtype, column) in COLUMNS.items()
+            if name != "time"
+        }
+    )
+    df.insert(
+        0,
+        "日期",
+        pd.to_datetime(bars["time"].view("datetime64[m]")).strftime("%Y-%m-%d %H:%M"),
+    )
+    return df
+
+
+class MinuteBarStore:
+    """Per-day memory-mapped store of intraday minute bars."""
+
+    def __init__(
+        self,
+        root: Path,
+        keep_days: int = 5,
+        fetcher: Callable[[str], pd.DataFrame] = _fetch_upstream,
+    ):
+        self.root = Path(root)
+        self.keep_days = max(1, keep_days)
+        self.fetcher = fetcher
+        self._lock = threading.Lock()
+        self._symbol_locks: Dict[str, threading.Lock] = {}
+        # Open mappings per (symbol, day), least recently used first
+        self._maps: "OrderedDict[Tuple[str, str], _OpenDay]" = OrderedDict()
+
+    def _symbol_lock(self, symbol: str) -> threading.Lock:
+        with self._lock:
+            return self._symbol_locks.setdefault(symbol, threading.Lock())
+
+    @staticmethod
+    def _read_json(path: Path, default: Dict) -> Dict:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return default
+
+    @staticmethod
+    def _write_json(path: Path, data: Dict) -> None:
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+
+    def days(self, symbol: str) -> List[str]:
+        """Stored trading days of a symbol (YYYYMMDD), oldest first."""
+        path = self.root / symbol
+        if not path.is_dir():
+            return []
+        return sorted(
+            p.name for p in path.iterdir() if p.is_dir() and (p / "meta.json").exists()
+        )
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+    def _write_day(self, symbol: str, day: str, data: Dict[str, np.ndarray]) -> None:
+        """Write a day's bars from the last stored minute on (it may have been forming)."""
+        path = self.root / symbol / day
+        path.mkdir(parents=True, exist_ok=True)
+        meta = self._read_json(path / "meta.json", {"rows": 0})
+        rows = len(data["time"])
+        if rows > SESSION_CAPACITY:
+            # The files grow past the mapped capacity; reopen on the next read
+            with self._lock:
+                self._maps.pop((symbol, day), None)
+        offset = max(0, min(meta["rows"], rows) - 1)
+        for name, (dtype, _) in COLUMNS.items():
+            itemsize = np.dtype(dtype).itemsize
+            file_path = path / f"{name}.bin"
+            mode = "r+b" if file_path.exists() else "w+b"
+            with open(file_path, mode) as f:
+                # Preallocate a full session; days with more bars grow the file
+                size = max(SESSION_CAPACITY, rows) * itemsize
+                if os.fstat(f.fileno()).st_size < size:
+                    f.truncate(size)
+                f.seek(offset * itemsize)
+                f.write(data[name][offset:].astype(dtype).tobytes())
+        self._write_json(path / "meta.json", {"rows": rows})
+
+    def _prune(self, symbol: str) -> None:
+        for day in self.days(symbol)[: -self.keep_days]:
+            shutil.rmtree(self.root / symbol / day, ignore_errors=True)
+            with self._lock:
+                self._maps.pop((symbol, day), None)
+
+    def sync(self, symbol: str) -> Optional[str]:
+        """Fetch the latest minutes unless still fresh; returns the latest stored day."""
+        with self._symbol_lock(symbol):
+            state_path = self.root / symbol / "latest.json"
+            state = self._read_json(state_path, {"day": None, "fresh_until": 0})
+            if time.time() < state["fresh_until"]:
+                return state["day"]
+
+            data = _normalize(self.fetcher(symbol))
+            if not data:
+                return state["day"]
+
+            day_index = data["time"] // (24 * 60)
+            for day_number in np.unique(day_index):
+                selected = day_index == day_number
+                day = str(np.datetime64(int(day_number), "D")).replace("-", "")
+                self._write_day(
+                    symbol,
+                    day,
+                    {name: values[selected] for name, values in data.items()},
+                )
+
+            last_bar = pd.Timestamp(np.datetime64(int(data["time"][-1]), "m"))
+            if last_bar.hour >= 15:
+                # A finished session does not change until the next open
+                fresh_until = (next_market_close() - _CLOSE_TO_OPEN).timestamp()
+            else:
+                fresh_until = data_cache.expires_at("realtime")
+            state = {"day": last_bar.strftime("%Y%m%d"), "fresh_until": fresh_until}
+            self._write_json(state_path, state)
+            self._prune(symbol)
+            return state["day"]
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+    def _open(self, symbol: str, day: str) -> Dict[str, np.ndarray]:
+        path = self.root / symbol / day
+        capacity = (
+            os.path.getsize(path / "time.bin") // np.dtype(COLUMNS["time"][0]).itemsize
+        )
+        key = (symbol, day)
+        with self._lock:
+            cached = self._maps.get(key)
+            if cached is not None and cached[0] == capacity:
+                self._maps.move_to_end(key)
+                return cached[1]
+        columns = {
+            name: np.memmap(
+                path / f"{name}.bin", dtype=dtype, mode="r", shape=(capacity,)
+            )
+            for name, (dtype, _) in COLUMNS.items()
+        }
+        with self._lock:
+            self._maps[key] = (capacity, columns)
+            self._maps.move_to_end(key)
+            while len(self._maps) > MAX_OPEN_DAYS:
+                self._maps.popitem(last=False)
+        return columns
+
+    def columns(
+        self, symbol: str, trading_day: Optional[str] = None
+    ) -> Dict[str, np.ndarray]:
+        """Read-only views of one day's bars (``time`` as datetime64[m]).
+
+        ``trading_day`` (YYYYMMDD) defaults to the latest day, which is synced
+        first; stored past days are read without any fetch.
+        """
+        if trading_day is None:
+            try:
+                trading_day = self.sync(symbol)
+            except Exception as e:
+                logger.warning(
+                    f"Minute bar sync failed for {symbol}, using stored bars: {e}"
+                )
+                stored = self.days(symbol)
+                trading_day = stored[-1] if stored else None
+        else:
+            trading_day = trading_day.replace("-", "")
+
+        path = self.root / symbol / trading_day if trading_day else None
+        if path is None or not (path / "meta.json").exists():
+            return {
+                name: np.array([], dtype="datetime64[m]" if name == "time" else dtype)
+                for name, (dtype, _) in COLUMNS.items()
+            }
+
+        rows = self._read_json(path / "meta.json", {"rows": 0})["rows"]
+        views = {
+            name: values[:rows]
+            for name, values in self._open(symbol, trading_day).items()
+        }
+        views["time"] = views["time"].view("datetime64[m]")
+        return views
+
+    def frame(self, symbol: str, trading_day: Optional[str] = None) -> pd.DataFrame:
+        return to_frame(self.columns(symbol, trading_day))
+
+
+def _create_minute_bar_store() -> MinuteBarStore:
+    settings = config.kline_store_config
+    store_dir = Path(settings.minute_store_dir)
+    if not store_dir.is_absolute():
+        store_dir = PROJECT_ROOT / store_dir
+    return MinuteBarStore(store_dir, keep_days=settings.minute_keep_days)
+
+
+# 全局分钟K线存储实例
+minute_bar_store = _create_minute_bar_store()
@@ -2,6 +2,7 @@ import asyncio
 
 from src.logger import logger
 from src.tool.base import BaseTool, ToolResult
+from src.tool.executor import data_executor
 from src.tool.financial_deep_search.risk_control_data import get_risk_control_data
 
 
@@ -68,8 +69,8 @@ class RiskControlTool(BaseTool):
             ToolResult: Result containing risk control data
         """
         try:
-            # Execute synchronous operation in thread pool to avoid blocking event loop
-            result = await asyncio.to_thread(
+            # Execute synchronous operation in the data executor to avoid blocking event loop
+            result = await data_executor.run(
                 get_risk_control_data,
                 stock_code=stock_code,
                 max_count=max_count,
@@ -5,8 +5,8 @@ from typing import Any, Dict
 
 from src.logger import logger
 from src.tool.base import BaseTool, ToolResult
-from src.tool.financial_deep_search.get_section_data import get_all_section
-from src.tool.financial_deep_search.index_capital import get_index_capital_flow
+from src.tool.executor import data_executor
+from src.tool.market_data import all_section, index_capital_flow
 
 
 class SentimentTool(BaseTool):
@@ -57,9 +57,7 @@ class SentimentTool(BaseTool):
             ToolResult: Result containing market data
         """
         try:
-            # Execute synchronous operation in thread pool to avoid blocking event loop
-            result = await asyncio.to_thread(
-                self._get_market_data,
+            result = await self._get_market_data(
                 index_code=index_code,
                 sector_types=sector_types,
                 max_retry=max_retry,
@@ -77,7 +75,7 @@ class SentimentTool(BaseTool):
             logger.error(error_msg)
             return ToolResult(error=error_msg)
 
-    def _get_market_data(
+    async def _get_market_data(
         self,
         index_code: str,
         sector_types: str = "all",
@@ -86,35 +84,39 @@ class SentimentTool(BaseTool):
     ) -> Dict[str, Any]:
         """
         Get market data including hot sectors and index capital flow.
-        Supports maximum retry mechanism.
+        Both sources are fetched concurrently in the data executor with retries.
         """
-        for attempt in range(1, max_retry + 1):
-            try:
-                # 1. Get hot sector data
-                section_data = get_all_section(sector_types=sector_types)
-                logger.info(f"[Attempt {attempt}] Retrieved hot sector data")
-
-                # 2. Get index capital flow
-                index_flow = get_index_capital_flow(index_code=index_code)
-                logger.info(f"[Attempt {attempt}] Retrieved index capital flow data")
-
-                # 3. Combine data and return
-                return {
-                    "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
-                    "index_code": index_code,
-                    "sector_types": sector_types,
-                    "hot_section_data": section_data,
-                    "index_net_flow": index_flow,
-                }
-
-            except Exception as e:
-                logger.warning(f"[Attempt {attempt}] Failed to get market data: {e}")
-                if attempt < max_retry:
-                    logger.info(f"Waiting {sleep_seconds} seconds before retry...")
-                    time.sleep(sleep_seconds)
-                else:
-                    logger.error(f"Max retries ({max_retry}) reached, failed")
-                    return {"error": f"Failed to get market data: {str(e)}"}
+        try:
+            section_data, index_flow = await asyncio.gather(
+                data_executor.run(
+                    all_section,
+                    sector_types=sector_types,
+                    retries=max_retry,
+                    backoff=sleep_seconds,
+                    name="hot_section_data",
+                ),
+                data_executor.run(
+                    index_capital_flow,
+                    index_code=index_code,
+                    retries=max_retry,
+                    backoff=sleep_seconds,
+                    name="index_net_flow",
+                ),
+            )
+            logger.info(
+                f"Retrieved hot sector and index capital flow data for {index_code}"
+            )
+        except Exception as e:
+            logger.error(f"Max retries ({max_retry}) reached, failed: {e}")
+            return {"error": f"Failed to get market data: {str(e)}"}
+
+        return {
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "index_code": index_code,
+            "sector_types": sector_types,
+            "hot_section_data": section_data,
+            "index_net_flow": index_flow,
+        }
 
 
 if __name__ == "__main__":
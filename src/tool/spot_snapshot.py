@@ -0,0 +1,117 @@
+"""
+全市场实时行情快照
+
+Downloads the whole A-share spot table (ak.stock_zh_a_spot_em) at most once
+per refresh interval and answers single-code lookups from an index keyed by
+stock code. Concurrent callers that find the snapshot stale share a single
+refresh. After a failed refresh the stale table keeps being served for
+``retry_interval`` seconds before the next download attempt.
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+import pandas as pd
+
+from src.config import config
+from src.logger import logger
+from src.tool.executor import data_executor
+
+
+try:
+    import akshare as ak  # type: ignore
+except ImportError:
+    ak = None  # type: ignore
+
+
+class SpotSnapshotService:
+    """Process-wide cache of the A-share spot table indexed by code."""
+
+    def __init__(
+        self,
+        refresh_interval: float = 60.0,
+        fetcher: Optional[Callable[[], pd.DataFrame]] = None,
+        retry_interval: float = 15.0,
+    ):
+        self.refresh_interval = refresh_interval
+        self.retry_interval = retry_interval
+        self._fetcher = fetcher
+        self._rows: Dict[str, Dict[str, Any]] = {}
+        self._fetched_at: float = 0.0
+        self._failed_at: float = 0.0
+        self._refresh_lock = threading.Lock()
+        self.refresh_count = 0
+
+    @property
+    def age(self) -> float:
+        """Seconds since the last successful refresh."""
+        return time.time() - self._fetched_at if self._fetched_at else float("inf")
+
+    def is_stale(self) -> bool:
+        return not self._rows or self.age >= self.refresh_interval
+
+    def needs_refresh(self) -> bool:
+        """Stale and not within the back-off interval after a failed refresh."""
+        return self.is_stale() and time.time() - self._failed_at >= self.retry_interval
+
+    def _fetch(self) -> pd.DataFrame:
+        if self._fetcher is not None:
+            return self._fetcher()
+        if ak is None:
+            raise RuntimeError("akshare library not installed")
+        return ak.stock_zh_a_spot_em()
+
+    def refresh(self, force: bool = False) -> None:
+        """Refresh the table if stale; only one caller downloads at a time."""
+        if not force and not self.needs_refresh():
+            return
+
+        with self._refresh_lock:
+            # Another caller may have refreshed (or failed) while we waited
+            if not force and not self.needs_refresh():
+                return
+
+            start = time.monotonic()
+            try:
+                df = self._fetch()
+            except Exception as e:
+                self._failed_at = time.time()
+                if self._rows:
+                    logger.warning(
+                        f"Spot snapshot refresh failed, keeping stale table: {e}"
+                    )
+                    return
+                raise
+
+            if df is None or df.empty or "代码" not in df.columns:
+                self._failed_at = time.time()
+                logger.warning("Spot snapshot refresh returned no data")
+                return
+
+            codes = df["代码"].astype(str).tolist()
+            self._rows = dict(zip(codes, df.to_dict(orient="records")))
+            self._fetched_at = time.time()
+            self._failed_at = 0.0
+            self.refresh_count += 1
+            logger.info(
+                f"Spot snapshot refreshed: {len(self._rows)} stocks in "
+                f"{time.monotonic() - start:.2f}s"
+            )
+
+    def get(self, stock_code: str) -> Optional[Dict[str, Any]]:
+        """Return the spot row for a stock code, refreshing the table if stale."""
+        self.refresh()
+        return self._rows.get(stock_code)
+
+    async def aget(self, stock_code: str) -> Optional[Dict[str, Any]]:
+        """Async variant of get; a refresh runs off the event loop."""
+        if self.needs_refresh():
+            await data_executor.run(self.refresh, name="spot_snapshot_refresh")
+        return self._rows.get(stock_code)
+
+
+# 全局行情快照实例
+spot_snapshot = SpotSnapshotService(
+    refresh_interval=config.data_cache_config.spot_refresh_interval
+)
@@ -7,6 +7,7 @@ import pandas as pd
 from pydantic import Field
 
 from src.tool.base import BaseTool, ToolResult, get_recent_trading_day
+from src.tool.executor import data_executor
 
 
 class StockInfoResponse(ToolResult):
@@ -49,31 +50,34 @@ class StockInfoRequest(BaseTool):
         Returns:
             StockInfoResponse containing stock information and current trading date
         """
-        for attempt in range(1, self.MAX_RETRIES + 1):
-            try:
-                # Get current trading day
-                trading_day = get_recent_trading_day()
-
-                # Fetch stock information
-                data = ef.stock.get_base_info(stock_code)
-
-                # Convert data to dict format based on its type
-                basic_info = self._format_data(data)
-
-                # Create and return the response
-                return StockInfoResponse(
-                    output={
-                        "current_trading_day": trading_day,
-                        "basic_info": basic_info,
-                    }
-                )
-
-            except Exception as e:
-                if attempt < self.MAX_RETRIES:
-                    await asyncio.sleep(float(self.RETRY_DELAY))
-                return StockInfoResponse(
-                    error=f"获取股票信息失败 ({self.MAX_RETRIES}次尝试): {str(e)}"
-                )
+        try:
+            # Get current trading day
+            trading_day = get_recent_trading_day()
+
+            # Fetch stock information off the event loop
+            data = await data_executor.run(
+                ef.stock.get_base_info,
+                stock_code,
+                retries=self.MAX_RETRIES,
+                backoff=float(self.RETRY_DELAY),
+                name="get_base_info",
+            )
+
+            # Convert data to dict format based on its type
+            basic_info = self._format_data(data)
+
+            # Create and return the response
+            return StockInfoResponse(
+                output={
+                    "current_trading_day": trading_day,
+                    "basic_info": basic_info,
+                }
+            )
+
+        except Exception as e:
+            return StockInfoResponse(
+                error=f"获取股票信息失败 ({self.MAX_RETRIES}次尝试): {str(e)}"
+            )
 
     @staticmethod
     def _format_data(data: Any) -> Dict[str, Any]:
@@ -2,13 +2,63 @@ import asyncio
 import json
 import sys
 import time
+from datetime import datetime, timedelta
 from typing import Any, Dict
 
 import efinance as ef
+import numpy as np
+import pandas as pd
 
 from src.logger import logger
-from src.tool.base import BaseTool, ToolResult
-from src.tool.financial_deep_search.stock_capital import get_stock_capital_flow
+from src.tool.base import BaseTool, ToolResult, get_recent_trading_day
+from src.tool.executor import data_executor
+from src.tool.indicator_engine import IndicatorEngine
+from src.tool.market_data import stock_capital_flow, stock_hist
+from src.tool.minute_bar_store import minute_bar_store, to_frame
+
+
+# 日K线回溯的自然日数（约270个交易日，足够让EMA/MACD等指标收敛）
+DAILY_HISTORY_DAYS = 400
+
+# 返回给模型的K线字段（其余字段由指标摘要概括）
+BAR_FIELDS = ("日期", "开盘", "收盘", "最高", "最低", "成交量", "涨跌幅", "换手率")
+
+
+def _fetch_daily_history(stock_code: str, beg: str) -> pd.DataFrame:
+    # Forward-adjusted bars (efinance's default), from the run snapshot or the K-line store
+    df = stock_hist(stock_code, "daily", start_date=beg, adjust="qfq")
+    df["日期"] = df["日期"].astype(str)
+    return df
+
+
+def _kline_summary(kline_df: pd.DataFrame, count: int) -> Dict[str, Any]:
+    """Indicator summary over the whole history plus the last ``count`` bars."""
+    if kline_df is None or kline_df.empty:
+        return {}
+    recent = kline_df.tail(count)
+    fields = [field for field in BAR_FIELDS if field in recent.columns]
+    return {
+        "bar_count": len(kline_df),
+        "indicators": IndicatorEngine.from_frame(kline_df).summary(),
+        "recent_bars": recent[fields].to_dict(orient="records"),
+    }
+
+
+def _minute_summary(bars: Dict[str, np.ndarray], count: int) -> Dict[str, Any]:
+    """Same summary from the minute store's column views; only ``count`` bars become dicts."""
+    bar_count = len(bars["close"])
+    if bar_count == 0:
+        return {}
+    engine = IndicatorEngine.from_arrays(
+        bars["open"], bars["high"], bars["low"], bars["close"], bars["volume"]
+    )
+    recent = to_frame({name: values[-count:] for name, values in bars.items()})
+    fields = [field for field in BAR_FIELDS if field in recent.columns]
+    return {
+        "bar_count": bar_count,
+        "indicators": engine.summary(),
+        "recent_bars": recent[fields].to_dict(orient="records"),
+    }
 
 
 class TechnicalAnalysisTool(BaseTool):
@@ -45,8 +95,8 @@ class TechnicalAnalysisTool(BaseTool):
             },
             "kline_count": {
                 "type": "integer",
-                "description": "K线数据获取条数，范围10-200，控制历史数据回溯深度",
-                "default": 30,
+                "description": "返回的最近K线条数，范围5-60；MA/MACD/RSI/KDJ/BOLL/ATR/量比等指标基于完整历史计算，以摘要形式返回",
+                "default": 10,
             },
             "max_retry": {
                 "type": "integer",
@@ -64,7 +114,7 @@ class TechnicalAnalysisTool(BaseTool):
         need_daily_kline: bool = True,
         need_minute_kline: bool = True,
         need_capital_flow: bool = True,
-        kline_count: int = 30,
+        kline_count: int = 10,
         max_retry: int = 3,
         sleep_seconds: int = 1,
         **kwargs,
@@ -78,7 +128,7 @@ class TechnicalAnalysisTool(BaseTool):
             need_daily_kline: Whether to get daily K-line data
             need_minute_kline: Whether to get minute K-line data
             need_capital_flow: Whether to get capital flow data
-            kline_count: Number of K-line data points to retrieve
+            kline_count: Number of recent K-line bars returned with the indicator summary
             max_retry: Maximum retry attempts
             sleep_seconds: Seconds to wait between retries
             **kwargs: Additional parameters
@@ -87,9 +137,7 @@ class TechnicalAnalysisTool(BaseTool):
             ToolResult: Result containing technical data
         """
         try:
-            # Execute synchronous operation in thread pool to avoid blocking event loop
-            result = await asyncio.to_thread(
-                self._get_tech_data,
+            result = await self._get_tech_data(
                 stock_code=stock_code,
                 need_realtime=need_realtime,
                 need_daily_kline=need_daily_kline,
@@ -112,73 +160,55 @@ class TechnicalAnalysisTool(BaseTool):
             logger.error(error_msg)
             return ToolResult(error=error_msg)
 
-    def _get_tech_data(
+    async def _get_tech_data(
         self,
         stock_code: str,
         need_realtime: bool = True,
         need_daily_kline: bool = True,
         need_minute_kline: bool = True,
         need_capital_flow: bool = True,
-        kline_count: int = 30,
+        kline_count: int = 10,
         max_retry: int = 3,
         sleep_seconds: int = 1,
     ):
         """
         Get technical data including real-time quotes, K-line data and capital flow.
-        Supports maximum retry mechanism.
+        The requested sources are fetched concurrently in the data executor with retries.
         """
-        for attempt in range(1, max_retry + 1):
-            try:
-                # Build result dictionary
-                result = {
-                    "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
-                    "stock_code": stock_code,
-                }
-
-                # 1. Get real-time quotes
-                if need_realtime:
-                    realtime_data = self._get_realtime_quotes(stock_code)
-                    result["realtime_quotes"] = realtime_data
-                    logger.info(
-                        f"[Attempt {attempt}] Retrieved real-time quotes for {stock_code}"
-                    )
-
-                # 2. Get daily K-line data
-                if need_daily_kline:
-                    daily_kline = self._get_daily_kline(stock_code, count=kline_count)
-                    result["daily_kline"] = daily_kline
-                    logger.info(
-                        f"[Attempt {attempt}] Retrieved daily K-line data for {stock_code}"
-                    )
-
-                # 3. Get minute K-line data
-                if need_minute_kline:
-                    minute_kline = self._get_minute_kline(stock_code, count=kline_count)
-                    result["minute_kline"] = minute_kline
-                    logger.info(
-                        f"[Attempt {attempt}] Retrieved minute K-line data for {stock_code}"
-                    )
+        result = {
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "stock_code": stock_code,
+        }
+
+        fetchers = {}
+        if need_realtime:
+            fetchers["realtime_quotes"] = (self._get_realtime_quotes, (stock_code,))
+        if need_daily_kline:
+            fetchers["daily_kline"] = (self._get_daily_kline, (stock_code, kline_count))
+        if need_minute_kline:
+            fetchers["minute_kline"] = (
+                self._get_minute_kline,
+                (stock_code, kline_count),
+            )
+        if need_capital_flow:
+            fetchers["capital_flow"] = (self._get_capital_flow, (stock_code,))
 
-                # 4. Get stock capital flow data
-                if need_capital_flow:
-                    capital_flow = self._get_capital_flow(stock_code)
-                    result["capital_flow"] = capital_flow
-                    logger.info(
-                        f"[Attempt {attempt}] Retrieved capital flow data for {stock_code}"
+        try:
+            values = await asyncio.gather(
+                *(
+                    data_executor.run(
+                        func, *args, retries=max_retry, backoff=sleep_seconds, name=key
                     )
-
-                return result
-
-            except Exception as e:
-                logger.warning(
-                    f"[Attempt {attempt}] Failed to get technical data for {stock_code}: {e}"
+                    for key, (func, args) in fetchers.items()
                 )
-                if attempt < max_retry:
-                    logger.info(f"Waiting {sleep_seconds} seconds before retry...")
-                    time.sleep(sleep_seconds)
-                else:
-                    logger.error(f"Max retries ({max_retry}) reached, failed")
-                    return {"error": f"Failed to get technical data: {str(e)}"}
+            )
+        except Exception as e:
+            logger.error(f"Max retries ({max_retry}) reached, failed: {e}")
+            return {"error": f"Failed to get technical data: {str(e)}"}
+
+        result.update(zip(fetchers.keys(), values))
+        logger.info(f"Retrieved {', '.join(fetchers.keys())} for {stock_code}")
+        return result
 
     @staticmethod
     def _get_realtime_quotes(stock_code: str) -> Dict[str, Any]:
@@ -211,48 +241,32 @@ class TechnicalAnalysisTool(BaseTool):
             return {"error": str(e)}
 
     @staticmethod
-    def _get_daily_kline(stock_code: str, count: int = 30) -> list:
-        """Get daily K-line data"""
+    def _get_daily_kline(stock_code: str, count: int = 10) -> Dict[str, Any]:
+        """Get daily K-line indicators and the most recent bars"""
         try:
-            kline_df = ef.stock.get_quote_history(stock_code, klt=101)
-
-            if kline_df is not None and not kline_df.empty:
-                # Keep only the most recent count records
-                if len(kline_df) > count:
-                    kline_df = kline_df.tail(count)
-
-                # Convert to list of dictionaries
-                if hasattr(kline_df, "to_dict"):
-                    return kline_df.to_dict(orient="records")
-            return []
+            # Only the last ~year of bars instead of the full listing history
+            recent_trading_day = datetime.strptime(get_recent_trading_day(), "%Y-%m-%d")
+            start = recent_trading_day - timedelta(days=DAILY_HISTORY_DAYS)
+            beg = start.strftime("%Y%m%d")
+            return _kline_summary(_fetch_daily_history(stock_code, beg), count)
         except Exception as e:
             logger.error(f"Failed to get daily K-line data: {e}")
-            return []
+            return {}
 
     @staticmethod
-    def _get_minute_kline(stock_code: str, count: int = 30) -> list:
-        """Get minute K-line data"""
+    def _get_minute_kline(stock_code: str, count: int = 10) -> Dict[str, Any]:
+        """Get minute K-line indicators and the most recent bars"""
         try:
-            kline_df = ef.stock.get_quote_history(stock_code, klt=1)
-
-            if kline_df is not None and not kline_df.empty:
-                # Keep only the most recent count records
-                if len(kline_df) > count:
-                    kline_df = kline_df.tail(count)
-
-                # Convert to list of dictionaries
-                if hasattr(kline_df, "to_dict"):
-                    return kline_df.to_dict(orient="records")
-            return []
+            return _minute_summary(minute_bar_store.columns(stock_code), count)
         except Exception as e:
             logger.error(f"Failed to get minute K-line data: {e}")
-            return []
+            return {}
 
     @staticmethod
     def _get_capital_flow(stock_code: str) -> Dict[str, Any]:
         """Get stock capital flow data"""
         try:
-            return get_stock_capital_flow(stock_code=stock_code)
+            return stock_capital_flow(stock_code=stock_code)
         except Exception as e:
             logger.error(f"Failed to get capital flow data: {e}")
             return {}
@@ -278,9 +292,9 @@ if __name__ == "__main__":
         for key in ["realtime_quotes", "daily_kline", "minute_kline", "capital_flow"]:
             if key in output:
                 item_count = 0
-                if isinstance(output[key], list):
-                    item_count = len(output[key])
-                    status = f"Retrieved ({item_count} items)"
+                if isinstance(output[key], dict) and "bar_count" in output[key]:
+                    item_count = output[key]["bar_count"]
+                    status = f"Retrieved ({item_count} bars)"
                 else:
                     status = "Retrieved" if output[key] else "Not Retrieved"
                 print(f"- {key}: {status}")
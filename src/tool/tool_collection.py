@@ -1,5 +1,5 @@
 """Collection classes for managing multiple tools."""
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Tuple
 
 from src.exceptions import ToolError
 from src.logger import logger
@@ -15,12 +15,32 @@ class ToolCollection:
     def __init__(self, *tools: BaseTool):
         self.tools = tools
         self.tool_map = {tool.name: tool for tool in tools}
+        # Schemas and their token counts, rebuilt when self.tools is replaced
+        self._params_for: Optional[tuple] = None
+        self._params: List[Dict[str, Any]] = []
+        self._tool_tokens: Dict[Tuple[str, str], int] = {}
 
     def __iter__(self):
         return iter(self.tools)
 
     def to_params(self) -> List[Dict[str, Any]]:
-        return [tool.to_param() for tool in self.tools]
+        if self._params_for is not self.tools:
+            self._params = [tool.to_param() for tool in self.tools]
+            self._params_for = self.tools
+            self._tool_tokens.clear()
+        return self._params
+
+    def count_tokens(self, token_counter) -> int:
+        """Token count of the tool schemas, each encoded once per tokenizer."""
+        params = self.to_params()
+        total = 0
+        for tool, param in zip(self.tools, params):
+            key = (token_counter.name, tool.name)
+            tokens = self._tool_tokens.get(key)
+            if tokens is None:
+                tokens = self._tool_tokens[key] = token_counter.count_text(str(param))
+            total += tokens
+        return total
 
     async def execute(
         self, *, name: str, tool_input: Dict[str, Any] = None
@@ -0,0 +1,299 @@
+"""
+报告目录索引
+
+A SQLite catalog of the generated reports, written by the report writers when
+a file is saved. It is indexed by report type, stock code and timestamp and
+stores the vote summary computed at write time, so the history page is one
+indexed query instead of globbing the report directories and parsing every
+debate/vote/data file. Reports that predate the catalog are indexed once by
+``backfill``.
+"""
+
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from src.config import PROJECT_ROOT
+from src.logger import logger
+from src.utils.report_storage import report_storage
+
+
+SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    path TEXT PRIMARY KEY,
+    report_type TEXT NOT NULL,
+    stock_code TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    data_path TEXT,
+    final_decision TEXT,
+    bullish INTEGER,
+    bearish INTEGER,
+    summary TEXT,
+    recommendation TEXT,
+    file_size INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_reports_type_time
+    ON reports (report_type, timestamp DESC);
+CREATE INDEX IF NOT EXISTS idx_reports_stock_time
+    ON reports (stock_code, report_type, timestamp DESC);
+"""
+
+_COLUMNS = (
+    "path",
+    "report_type",
+    "stock_code",
+    "timestamp",
+    "created_at",
+    "data_path",
+    "final_decision",
+    "bullish",
+    "bearish",
+    "summary",
+    "recommendation",
+    "file_size",
+)
+
+_RECOMMENDATIONS = {"bullish": "看涨", "bearish": "看跌"}
+
+
+def summarize_votes(results: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Summary fields shown in the history list, from battle or vote results."""
+    summary = {
+        "final_decision": None,
+        "bullish": None,
+        "bearish": None,
+        "summary": "股票分析报告",
+        "recommendation": "分析中",
+    }
+    if not isinstance(results, dict):
+        return summary
+
+    final_decision = results.get("final_decision")
+    vote_count = results.get("vote_count") or {}
+    bullish = vote_count.get("bullish", 0)
+    bearish = vote_count.get("bearish", 0)
+
+    summary["final_decision"] = final_decision
+    summary["bullish"] = bullish
+    summary["bearish"] = bearish
+    summary["recommendation"] = _RECOMMENDATIONS.get(final_decision, "分析中")
+    if bullish + bearish > 0:
+        summary["summary"] = f"专家投票: {bullish}票看涨, {bearish}票看跌"
+    return summary
+
+
+def parse_report_filename(filename: str) -> Tuple[Optional[str], str]:
+    """Stock code and YYYYMMDD_HHMMSS timestamp from '<type>_<code>_<date>_<time>.<ext>'."""
+    parts = filename.split(".", 1)[0].split("_")
+    stock_code = parts[1] if len(parts) >= 2 and parts[1] else None
+    timestamp = ""
+    if len(parts) >= 4 and parts[2].isdigit() and parts[3].isdigit():
+        timestamp = f"{parts[2]}_{parts[3]}"
+    return stock_code, timestamp
+
+
+def _relative(path: Any) -> str:
+    """Store paths relative to the project root so the catalog survives a move."""
+    resolved = Path(path).resolve()
+    try:
+        return resolved.relative_to(PROJECT_ROOT.resolve()).as_posix()
+    except ValueError:
+        return str(resolved)
+
+
+class ReportCatalog:
+    """SQLite index of report files with precomputed summary fields."""
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # One short-lived connection per operation: safe across threads and
+        # processes (the CLI and the web backend may write at the same time)
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _ensure_schema(self) -> None:
+        if self._initialized:
+            return
+        with self._init_lock:
+            if self._initialized:
+                return
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            with self._connect() as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(_SCHEMA)
+                version = conn.execute("PRAGMA user_version").fetchone()[0]
+            self._initialized = True
+            if version < SCHEMA_VERSION:
+                self.backfill(self.db_path.parent)
+                with self._connect() as conn:
+                    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+    def add(
+        self,
+        report_type: str,
+        stock_code: str,
+        path: Any,
+        timestamp: str,
+        results: Optional[Dict[str, Any]] = None,
+        data_path: Any = None,
+        created_at: Optional[float] = None,
+    ) -> None:
+        """Index a report file; ``results`` holds final_decision and vote_count."""
+        try:
+            self._ensure_schema()
+            file_path = Path(path)
+            row = {
+                "path": _relative(file_path),
+                "report_type": report_type,
+                "stock_code": stock_code,
+                "timestamp": timestamp,
+                "created_at": created_at or time.time(),
+                "data_path": _relative(data_path) if data_path else None,
+                "file_size": file_path.stat().st_size if file_path.exists() else None,
+                **summarize_votes(results),
+            }
+            with self._connect() as conn:
+                conn.execute(
+                    f"INSERT OR REPLACE INTO reports ({', '.join(_COLUMNS)}) "
+                    f"VALUES ({', '.join('?' for _ in _COLUMNS)})",
+                    [row[column] for column in _COLUMNS],
+                )
+        except Exception as e:
+            # The report itself is already saved; a missing index entry is not fatal
+            logger.error(f"索引报告失败: {path}, {str(e)}")
+
+    def remove(self, path: Any) -> bool:
+        self._ensure_schema()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "DELETE FROM reports WHERE path = ?", (_relative(path),)
+            )
+        return cursor.rowcount > 0
+
+    def backfill(self, base_dir: Path) -> int:
+        """Index report files written before the catalog existed."""
+        base_dir = Path(base_dir)
+        indexed = 0
+        for report_type, subdir in (
+            ("html", "html"),
+            ("debate", "debate"),
+            ("vote", "vote"),
+        ):
+            extension = "html" if report_type == "html" else "json"
+            for file_path in sorted(
+                (base_dir / subdir).glob(f"{report_type}_*.{extension}")
+            ):
+                if file_path.name.endswith(".meta.json"):
+                    continue
+                stock_code, timestamp = parse_report_filename(file_path.name)
+                if not stock_code:
+                    continue
+
+                results, data_path = None, None
+                try:
+                    if report_type == "html":
+                        candidate = file_path.with_name(
+                            f"data_{stock_code}_{timestamp}.json"
+                        )
+                        if candidate.exists():
+                            data_path = candidate
+                            results = report_storage.read_json(candidate).get(
+                                "battle_results"
+                            )
+                    elif report_type == "vote":
+                        results = report_storage.read_json(file_path)
+                except Exception as e:
+                    logger.warning(f"读取报告数据失败: {file_path}, {str(e)}")
+
+                self.add(
+                    report_type,
+                    stock_code,
+                    file_path,
+                    timestamp,
+                    results=results,
+                    data_path=data_path,
+                    created_at=file_path.stat().st_mtime,
+                )
+                indexed += 1
+
+        if indexed:
+            logger.info(f"报告目录索引完成: {indexed} 个文件")
+        return indexed
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+    def query(
+        self,
+        report_type: str = "html",
+        stock_code: Optional[str] = None,
+        final_decision: Optional[str] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        page: int = 1,
+        page_size: Optional[int] = 20,
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """One page of reports, newest first, and the total matching count.
+
+        Dates use the YYYYMMDD format of the report timestamps; a
+        ``page_size`` of None returns every matching report.
+        """
+        self._ensure_schema()
+        clauses, params = ["report_type = ?"], [report_type]
+        if stock_code:
+            clauses.append("stock_code = ?")
+            params.append(stock_code)
+        if final_decision:
+            clauses.append("final_decision = ?")
+            params.append(final_decision)
+        if start_date:
+            clauses.append("timestamp >= ?")
+            params.append(start_date)
+        if end_date:
+            # Any time on the end date sorts before the next day
+            clauses.append("timestamp < ?")
+            params.append(f"{end_date}_999999")
+        where = " AND ".join(clauses)
+
+        sql = f"SELECT * FROM reports WHERE {where} ORDER BY timestamp DESC, path DESC"
+        with self._connect() as conn:
+            if page_size is None:
+                rows = conn.execute(sql, params).fetchall()
+                return [dict(row) for row in rows], len(rows)
+
+            page, page_size = max(1, page), max(1, page_size)
+            total = conn.execute(
+                f"SELECT COUNT(*) FROM reports WHERE {where}", params
+            ).fetchone()[0]
+            rows = conn.execute(
+                f"{sql} LIMIT ? OFFSET ?", [*params, page_size, (page - 1) * page_size]
+            ).fetchall()
+        return [dict(row) for row in rows], total
+
+    @staticmethod
+    def format_date(row: Dict[str, Any]) -> str:
+        return datetime.fromtimestamp(row["created_at"]).strftime("%Y-%m-%d %H:%M:%S")
+
+
+# 全局报告目录实例
+report_catalog = ReportCatalog(PROJECT_ROOT / "report" / "catalog.db")
@@ -13,6 +13,8 @@ from pathlib import Path
 from typing import Any, Dict, List, Optional
 
 from src.logger import logger
+from src.utils.report_catalog import report_catalog
+from src.utils.report_storage import report_storage
 
 
 class SimpleReportManager:
@@ -62,26 +64,31 @@ class SimpleReportManager:
     def save_debate_report(self, stock_code: str, debate_data: Dict, 
                           metadata: Optional[Dict] = None) -> bool:
         """保存辩论对话JSON"""
-        content = json.dumps(debate_data, ensure_ascii=False, indent=2)
-        return self._save_report("debate", stock_code, content, metadata)
+        return self._save_report("debate", stock_code, debate_data, metadata)
     
     def save_vote_report(self, stock_code: str, vote_data: Dict, 
                         metadata: Optional[Dict] = None) -> bool:
         """保存投票结果JSON"""
-        content = json.dumps(vote_data, ensure_ascii=False, indent=2)
-        return self._save_report("vote", stock_code, content, metadata)
+        return self._save_report("vote", stock_code, vote_data, metadata, results=vote_data)
     
-    def _save_report(self, report_type: str, stock_code: str, content: str, 
-                    metadata: Optional[Dict] = None) -> bool:
-        """通用的报告保存方法"""
+    def _save_report(self, report_type: str, stock_code: str, content: Any, 
+                    metadata: Optional[Dict] = None,
+                    results: Optional[Dict] = None) -> bool:
+        """通用的报告保存方法，保存后写入报告目录索引
+
+        content: HTML 文本，或 JSON 报告的数据（经 report_storage 写入，packed 模式下压缩去重）
+        results: 含 final_decision/vote_count 的结果，用于预先计算历史列表摘要
+        """
         try:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             filename = self.generate_filename(report_type, stock_code, timestamp)
             file_path = self.get_report_path(report_type, filename)
             
             # 保存报告内容
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(content)
+            if isinstance(content, str):
+                report_storage.write_text(file_path, content)
+            else:
+                report_storage.write_json(file_path, content)
             
             # 保存元数据
             if metadata:
@@ -94,10 +101,12 @@ class SimpleReportManager:
                         "report_type": report_type,
                         "stock_code": stock_code,
                         "created_at": datetime.now().isoformat(),
-                        "file_size": len(content.encode('utf-8')),
+                        "file_size": file_path.stat().st_size,
                         "filename": filename
                     }, f, ensure_ascii=False, indent=2)
             
+            report_catalog.add(report_type, stock_code, file_path, timestamp, results=results)
+            
             logger.info(f"保存{report_type}报告成功: {file_path}")
             return True
             
@@ -113,8 +122,7 @@ class SimpleReportManager:
                 return None
             
             # 读取报告内容
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
+            content = report_storage.read_text(file_path)
             
             # 读取元数据
             meta_filename = filename.replace(f".{self.report_types[report_type]['extension']}", ".meta.json")
@@ -208,12 +216,17 @@ class SimpleReportManager:
                             try:
                                 file_size = file_path.stat().st_size
                                 file_path.unlink()
+                                report_catalog.remove(file_path)
                                 cleanup_stats["deleted_files"] += 1
                                 cleanup_stats["saved_space"] += file_size
                             except Exception as e:
                                 logger.warning(f"删除文件失败: {file_path}, {str(e)}")
             
             if cleanup_stats["deleted_files"] > 0:
+                # 删除不再被任何报告引用的压缩数据块
+                report_storage.collect_garbage(
+                    self.base_dir / info["subdir"] for info in self.report_types.values()
+                )
                 logger.info(f"清理完成: 删除 {cleanup_stats['deleted_files']} 个文件, "
                            f"节省 {cleanup_stats['saved_space']} 字节")
             
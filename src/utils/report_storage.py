@@ -0,0 +1,267 @@
+"""
+报告文件存储
+
+Report writers go through ReportStorage instead of writing files directly.
+In ``plain`` mode files are written as before (pretty-printed JSON, full HTML).
+In ``packed`` mode the content lives in a content-addressed store of
+gzip-compressed blobs under ``report/blobs`` and the report path holds a small
+JSON manifest:
+
+- HTML is stored as one blob, so the static report template shared by every
+  run is stored once and can be served as-is with ``Content-Encoding: gzip``.
+- JSON documents are split bottom-up: every object or array whose compact
+  serialization reaches ``blob_min_size`` bytes becomes its own blob, so the
+  debate history or research results repeated across the data, debate and
+  vote files are stored once.
+
+Readers use ``read_text`` / ``read_json``, which accept both formats, so
+reports written before switching modes keep working.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Set, Union
+
+from src.config import PROJECT_ROOT, config
+from src.logger import logger
+
+
+PACKED_KEY = "$packed"
+BLOB_KEY = "$blob"
+STORAGE_MODES = ("plain", "packed")
+# Blobs put this recently are kept by garbage collection: their manifest may
+# not be written yet
+GC_GRACE_SECONDS = 3600
+
+
+class BlobStore:
+    """Content-addressed store of gzip-compressed blobs keyed by sha256."""
+
+    def __init__(self, root: Path, compresslevel: int = 6):
+        self.root = Path(root)
+        self.compresslevel = compresslevel
+
+    def path(self, digest: str) -> Path:
+        return self.root / digest[:2] / f"{digest}.gz"
+
+    def put(self, data: bytes) -> str:
+        """Store bytes once and return their sha256 hex digest."""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest)
+        try:
+            # A reused blob counts as freshly put for garbage collection
+            os.utime(path)
+        except FileNotFoundError:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            # mtime=0 keeps the compressed bytes deterministic
+            tmp.write_bytes(gzip.compress(data, self.compresslevel, mtime=0))
+            os.replace(tmp, path)
+        return digest
+
+    def get(self, digest: str) -> bytes:
+        return gzip.decompress(self.get_compressed(digest))
+
+    def get_compressed(self, digest: str) -> bytes:
+        return self.path(digest).read_bytes()
+
+    def digests(self) -> Iterable[str]:
+        for path in self.root.glob("*/*.gz"):
+            yield path.name[: -len(".gz")]
+
+    def modified_at(self, digest: str) -> float:
+        try:
+            return self.path(digest).stat().st_mtime
+        except FileNotFoundError:
+            return 0.0
+
+    def delete(self, digest: str) -> None:
+        self.path(digest).unlink(missing_ok=True)
+
+
+def _compact(value: Any) -> bytes:
+    # No sort_keys: key order carries meaning (e.g. display order of sections)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class ReportStorage:
+    """Writes and reads report files in plain or packed form."""
+
+    def __init__(self, blob_root: Path, mode: str = "plain", blob_min_size: int = 2048):
+        if mode not in STORAGE_MODES:
+            logger.warning(f"Unknown report storage mode '{mode}', using 'plain'")
+            mode = "plain"
+        self.mode = mode
+        self.blob_min_size = blob_min_size
+        self.blobs = BlobStore(blob_root)
+
+    @property
+    def packed(self) -> bool:
+        return self.mode == "packed"
+
+    # ------------------------------------------------------------------
+    # Packing
+    # ------------------------------------------------------------------
+    def _pack(self, value: Any) -> Any:
+        """Replace large subtrees with blob references, innermost first."""
+        if isinstance(value, dict):
+            value = {key: self._pack(item) for key, item in value.items()}
+        elif isinstance(value, list):
+            value = [self._pack(item) for item in value]
+        else:
+            return value
+
+        encoded = _compact(value)
+        if len(encoded) < self.blob_min_size:
+            return value
+        return {BLOB_KEY: self.blobs.put(encoded)}
+
+    def _unpack(self, value: Any) -> Any:
+        if isinstance(value, dict):
+            if BLOB_KEY in value and len(value) == 1:
+                return self._unpack(json.loads(self.blobs.get(value[BLOB_KEY])))
+            return {key: self._unpack(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self._unpack(item) for item in value]
+        return value
+
+    @staticmethod
+    def _write_manifest(path: Path, manifest: Dict[str, Any]) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({PACKED_KEY: 1, **manifest}, f, ensure_ascii=False)
+
+    @staticmethod
+    def read_manifest(path: Union[str, Path]) -> Optional[Dict[str, Any]]:
+        """The manifest of a packed file, or None for a plain file."""
+        with open(path, "rb") as f:
+            head = f.read(len(PACKED_KEY) + 2)
+            if not head.startswith(b'{"' + PACKED_KEY.encode()):
+                return None
+            f.seek(0)
+            return json.loads(f.read().decode("utf-8"))
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+    def write_text(
+        self, path: Union[str, Path], text: str, media_type: str = "text/html"
+    ) -> None:
+        path = Path(path)
+        if not self.packed:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+            return
+        digest = self.blobs.put(text.encode("utf-8"))
+        self._write_manifest(path, {"media_type": media_type, "blob": digest})
+
+    def write_json(self, path: Union[str, Path], data: Any) -> None:
+        path = Path(path)
+        if not self.packed:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            return
+        self._write_manifest(
+            path, {"media_type": "application/json", "root": self._pack(data)}
+        )
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+    def read_text(self, path: Union[str, Path]) -> str:
+        manifest = self.read_manifest(path)
+        if manifest is None:
+            with open(path, "r", encoding="utf-8") as f:
+                return f.read()
+        if "blob" in manifest:
+            return self.blobs.get(manifest["blob"]).decode("utf-8")
+        return json.dumps(self._unpack(manifest["root"]), ensure_ascii=False, indent=2)
+
+    def read_json(self, path: Union[str, Path]) -> Any:
+        manifest = self.read_manifest(path)
+        if manifest is None:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        if "blob" in manifest:
+            return json.loads(self.blobs.get(manifest["blob"]))
+        return self._unpack(manifest["root"])
+
+    def read_bytes(self, path: Union[str, Path]) -> bytes:
+        """File content as it would be on disk in plain mode."""
+        manifest = self.read_manifest(path)
+        if manifest is None:
+            return Path(path).read_bytes()
+        return self.read_text(path).encode("utf-8")
+
+    def compressed_blob(self, path: Union[str, Path]) -> Optional[bytes]:
+        """Gzip bytes of a packed single-blob file (HTML), ready to serve."""
+        manifest = self.read_manifest(path)
+        if manifest and "blob" in manifest:
+            return self.blobs.get_compressed(manifest["blob"])
+        return None
+
+    # ------------------------------------------------------------------
+    # Maintenance
+    # ------------------------------------------------------------------
+    def _references(self, value: Any, found: Set[str]) -> None:
+        if isinstance(value, dict):
+            if BLOB_KEY in value and len(value) == 1:
+                digest = value[BLOB_KEY]
+                if digest not in found:
+                    found.add(digest)
+                    self._references(json.loads(self.blobs.get(digest)), found)
+                return
+            for item in value.values():
+                self._references(item, found)
+        elif isinstance(value, list):
+            for item in value:
+                self._references(item, found)
+
+    def collect_garbage(
+        self, report_dirs: Iterable[Path], grace_seconds: float = GC_GRACE_SECONDS
+    ) -> int:
+        """Delete blobs no longer referenced by any report file; returns the count.
+
+        Blobs put within ``grace_seconds`` are kept, so a report being written
+        concurrently does not lose blobs its manifest is about to reference.
+        """
+        cutoff = time.time() - grace_seconds
+        referenced: Set[str] = set()
+        for report_dir in report_dirs:
+            for path in Path(report_dir).glob("*"):
+                if not path.is_file():
+                    continue
+                try:
+                    manifest = self.read_manifest(path)
+                except (OSError, ValueError):
+                    continue
+                if manifest is None:
+                    continue
+                if "blob" in manifest:
+                    referenced.add(manifest["blob"])
+                else:
+                    self._references(manifest.get("root"), referenced)
+
+        deleted = 0
+        for digest in list(self.blobs.digests()):
+            if digest not in referenced and self.blobs.modified_at(digest) < cutoff:
+                self.blobs.delete(digest)
+                deleted += 1
+        if deleted:
+            logger.info(f"删除 {deleted} 个未引用的报告数据块")
+        return deleted
+
+
+# 全局报告存储实例
+report_storage = ReportStorage(
+    PROJECT_ROOT / "report" / "blobs",
+    mode=config.report_storage_config.mode,
+    blob_min_size=config.report_storage_config.blob_min_size,
+)
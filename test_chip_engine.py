@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""测试筹码分布引擎的一字板处理"""
+
+import numpy as np
+
+from src.tool.chip_engine import compute_chip_distribution
+
+
+def _bars(prices, highs, lows, turnover):
+    prices = np.asarray(prices, dtype=float)
+    return (
+        prices,
+        np.asarray(highs, dtype=float),
+        np.asarray(lows, dtype=float),
+        prices,
+        np.asarray(turnover, dtype=float),
+    )
+
+
+def test_one_price_day_at_new_high():
+    """新高处的一字涨停：当日换手落在最高价格档，而不是被衰减掉"""
+    days = 20
+    history = _bars(
+        np.full(days, 10.5),
+        np.full(days, 11.0),
+        np.full(days, 10.0),
+        np.full(days, 3.0),
+    )
+    limit_up = _bars(
+        np.r_[history[0], 12.1],
+        np.r_[history[1], 12.1],
+        np.r_[history[2], 12.1],
+        np.r_[history[4], 20.0],
+    )
+
+    before = compute_chip_distribution(*history).density.sum()
+    result = compute_chip_distribution(*limit_up)
+
+    assert result.density[0, -1] > 0
+    assert result.density.sum() > before
+
+
+def test_flat_history_has_stats():
+    """价格始终不变的股票也能算出筹码统计"""
+    result = compute_chip_distribution(
+        *_bars(np.full(5, 10.0), np.full(5, 10.0), np.full(5, 10.0), np.full(5, 5.0))
+    )
+
+    assert result.density.sum() > 0
+    assert result.stats["平均成本"][0, -1] == 10.0
+    assert result.stats["获利比例"][0, -1] == 1.0
+
+
+if __name__ == "__main__":
+    test_one_price_day_at_new_high()
+    test_flat_history_has_stats()
+    print("✅ 筹码分布一字板测试通过")